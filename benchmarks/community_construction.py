@@ -0,0 +1,35 @@
+"""Time the construction of CommunityModels with 2, 10 and 50 members.
+
+Every member is the strep_therm default model with its own model
+identifier, the community does not modify its members so the same model is
+used for all of them. Run from the root of the repository:
+
+    python benchmarks/community_construction.py [sizes ...]
+"""
+import sys
+import time
+
+from dcFBA import DefaultModels
+from dcFBA.Models import CommunityModel
+
+
+def build_time(n: int) -> float:
+    """Build a community of n strep_therm models and return the time in
+    seconds, loading the model is not included."""
+    model = DefaultModels.read_default_model("strep_therm")
+
+    start = time.perf_counter()
+    CommunityModel(
+        [model] * n,
+        ["R_biomass_STR"] * n,
+        [f"strep{i}" for i in range(n)],
+    )
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [2, 10, 50]
+    results = [(n, build_time(n)) for n in sizes]
+
+    for n, seconds in results:
+        print(f"{n:>4} members: {seconds:8.2f} s")
@@ -0,0 +1,65 @@
+"""The default models shipped with dcFBA: e_coli_core and strep_therm.
+
+The SBML files are stored next to this module and are only parsed the first
+time a model is requested. The parsed model is kept in memory and every call
+to ``read_default_model`` returns a new copy of it, so the returned models
+can be modified freely.
+"""
+import os
+
+import cbmpy
+
+from ..Helpers.Serialization import dumps_model, loads_model
+
+default_model_ids = ["e_coli_core", "strep_therm"]
+
+_directory = os.path.dirname(os.path.abspath(__file__))
+
+# The pickled parsed models, unpickling is much faster than cloning a model
+_cache: dict[str, bytes] = {}
+
+
+def default_model_path(mid: str) -> str:
+    """Return the path of the SBML file of a default model.
+
+    Args:
+        mid (str): The id of the default model.
+
+    Raises:
+        Exception: If the model is not a default model.
+
+    Returns:
+        str: The path of the SBML file
+    """
+    if mid not in default_model_ids:
+        raise Exception("Model not in default models")
+    return os.path.join(_directory, f"{mid}.xml")
+
+
+def read_default_model(mid: str) -> cbmpy.CBModel.Model:
+    """Read a default model. The SBML file is only parsed on the first call,
+    later calls return a copy of the parsed model.
+
+    Args:
+        mid (str): The id of the default model, "e_coli_core" or
+            "strep_therm".
+
+    Raises:
+        Exception: If the model is not a default model.
+
+    Returns:
+        cbmpy.CBModel.Model: A new copy of the model
+    """
+    if mid not in _cache:
+        model = cbmpy.CBXML.sbml_readSBML3FBC(default_model_path(mid))
+        _cache[mid] = dumps_model(model)
+
+    return loads_model(_cache[mid])
+
+
+def __getattr__(name: str) -> str:
+    # The SBML strings used to be module attributes
+    if name in default_model_ids:
+        with open(default_model_path(name)) as file:
+            return file.read()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,15 @@
-import cbmpy
 import math
+import numpy
 from cbmpy.CBModel import Reaction
-from ..Models import KineticsStruct, CommunityModel
+from ..Models import KineticsStruct, CommunityModel, Trajectory
+from ..Helpers.SolverSession import SolverSession
+from ..Helpers.StepSizeController import StepSizeController
+from ..Helpers.DepletionEvents import (
+    DEPLETION_TOLERANCE,
+    integrate,
+    next_depletion,
+)
+from ..Exceptions import NoLimitingSubstrateFound
 from .StaticOptimizationModel import StaticOptimizationModelBase
 
 
@@ -34,12 +42,12 @@ class DynamicFBABase(StaticOptimizationModelBase):
 
         model_biomasses = model.get_model_biomass_ids()
 
-        initial_biomasses = [[x] for x in biomasses]
-
-        self._biomasses = dict(zip(model_biomasses.keys(), initial_biomasses))
+        self._biomasses = Trajectory(list(model_biomasses.keys()), biomasses)
 
         self._kinetics = kinetics
         self._set_initial_concentrations(self.model, initial_concentrations)
+        self._metabolites = Trajectory.from_dict(self._metabolites)
+        self._fluxes = Trajectory([])
 
         for rid in self.model.getReactionIds():
             reaction: Reaction = self.model.getReaction(rid)
@@ -48,10 +56,31 @@ class DynamicFBABase(StaticOptimizationModelBase):
                 reaction.getUpperBound(),
             ]
 
+        self._bound_index_key = None
+        self._step_history = []
+
     @property
     def model(self) -> CommunityModel:
         return self._model
 
+    @property
+    def step_history(self) -> list[dict[str, float]]:
+        """Get the accepted time steps of the last simulation.
+
+        Each step is a dictionary with the time at the end of the step, the
+        step size ``dt`` and the number of ``rejected`` attempts before it.
+        """
+        return self._step_history
+
+    @property
+    def fluxes(self):
+        """Get the fluxes of each time point as a sequence of dictionaries.
+
+        The dictionaries are created on access, use ``get_flux_values`` to
+        read the fluxes of a single reaction.
+        """
+        return self._fluxes.rows()
+
     def get_flux_values(self, rid: str) -> list[float]:
         """
         Get the flux values for a specific reaction over time.
@@ -61,9 +90,17 @@ class DynamicFBABase(StaticOptimizationModelBase):
 
         Returns:
             list[float]: List of flux values for the specified reaction over time.
+
+        Raises:
+            KeyError: If the reaction is not part of the simulated fluxes.
         """
+        if rid not in self._fluxes:
+            # Nothing is simulated yet, so there are no values to return
+            if len(self.fluxes) == 0:
+                return []
+            raise KeyError(rid)
 
-        return list(map(lambda d: d[rid], self.fluxes))
+        return self._fluxes[rid].tolist()
 
     def get_fluxes_values(self, rids: list[str]) -> dict[str, list[float]]:
         """
@@ -96,9 +133,9 @@ class DynamicFBABase(StaticOptimizationModelBase):
         if rid in self.model.getExchangeReactionIds():
             print("Exchange has no specific flux")
             return []
-        ls = self.get_flux_values(rid)
+        ls = self._fluxes[rid]
         mid = self.model.identify_model_from_reaction(rid)
-        return [ls[t] / v for t, v in enumerate(self.biomasses[mid][:-1])]
+        return numpy.divide(ls, self.biomasses[mid][:-1]).tolist()
 
     def simulate(
         self,
@@ -107,55 +144,191 @@ class DynamicFBABase(StaticOptimizationModelBase):
         epsilon=1e-6,
         kinetics_func=None,
         deviate=None,
+        step_controller: StepSizeController = None,
+        event_driven: bool = False,
     ) -> None:
         """
         Perform a dynamic joint FBA simulation.
-        """
 
+        The LP is built once and kept in a ``SolverSession``, each step only
+        the changed bounds are passed to the solver which re-solves from the
+        previous optimal basis.
+
+        Args:
+            dt (float): The (initial) time step.
+            n (int, optional): Maximal number of time steps. Defaults to 10000.
+            epsilon (float, optional): The simulation stops when the
+                objective value drops below epsilon. Defaults to 1e-6.
+            kinetics_func (function, optional): Custom function to set the
+                reaction bounds each step. Defaults to None.
+            deviate (function, optional): Function called before each step
+                to change the model or concentrations. Defaults to None.
+            step_controller (StepSizeController, optional): Adapts the time
+                step to the depletion of the external metabolites, if None a
+                fixed time step is used. Defaults to None.
+            event_driven (bool, optional): Integrate the concentrations and
+                biomasses exactly from the current fluxes and end each step at
+                the moment the next external metabolite runs out, dt is then
+                the largest step. Defaults to False.
+
+        Raises:
+            ValueError: If both a step_controller and event_driven are given.
+        """
+        if event_driven and step_controller is not None:
+            raise ValueError("Use either a step_controller or event_driven")
+
+        session = SolverSession(self.model)
+        # The initial bounds or kinetics may have changed since the index
+        # was built
+        self._bound_index_key = None
+        dt_max = dt
         used_time = [0.0]
-        dt_hat = -1
-        dt_save = dt
-        fluxes = []
+        fluxes = None
         run_condition = 0
+        step_history = []
 
-        for _ in range(1, n):
-            if dt_hat != -1:
-                dt = dt_hat
-                dt_hat = -1
-            else:
-                dt = dt_save
+        if step_controller is not None:
+            dt = step_controller.clip(dt)
 
+        for _ in range(1, n):
             if deviate is not None:
                 run_condition += deviate(
                     self,
                     used_time,
                     run_condition,
                 )
+                # The deviate function may change the initial bounds, the
+                # kinetics, the reactions or the constraints, so the index
+                # and the LP are built again
+                self._bound_index_key = None
+                session.invalidate()
 
             self.update_reaction_bounds(kinetics_func)
-            self.update_exchanges(dt)
 
-            solution = cbmpy.doFBA(self.model, quiet=False)
+            rejected = 0
+            while True:
+                self.update_exchanges(None if event_driven else dt)
+                solution = session.solve()
+
+                if (
+                    step_controller is None
+                    or math.isnan(solution)
+                    or solution <= epsilon
+                ):
+                    break
+
+                FBAsol = session.get_solution()
+                depletion = self.relative_depletion(
+                    FBAsol, dt, step_controller.atol
+                )
+                if step_controller.accept(dt, depletion):
+                    break
 
-            if math.isnan(solution) or solution <= epsilon or dt < epsilon:
+                dt = step_controller.next_step(dt, depletion)
+                rejected += 1
+
+            if math.isnan(solution) or solution <= epsilon:
                 break
 
-            FBAsol = self.model.getSolutionVector(names=True)
-            FBAsol = dict(zip(FBAsol[1], FBAsol[0]))
+            FBAsol = session.get_solution()
+
+            if event_driven:
+                dt = self.integrate_to_next_depletion(FBAsol, dt_max)
+            elif dt < epsilon:
+                break
 
             used_time.append(used_time[-1] + dt)
+            step_history.append(
+                {"time": used_time[-1], "dt": dt, "rejected": rejected}
+            )
 
-            fluxes.append(FBAsol)
+            if fluxes is None:
+                fluxes = Trajectory(session.reaction_ids, capacity=min(n, 1024))
+            fluxes.append(session.fluxes, session.reaction_ids)
 
-            self.update_concentrations(FBAsol, dt)
+            if not event_driven:
+                self.update_concentrations(FBAsol, dt)
+                self.update_biomasses(FBAsol, dt)
 
-            for _, rid in self.model.get_model_biomass_ids().items():
-                mid = self.model.identify_model_from_reaction(rid)
-                Xt = self.biomasses[mid][-1] + FBAsol[rid] * dt
-                self.biomasses[mid].append(Xt)
+            if step_controller is not None:
+                dt = step_controller.next_step(dt, depletion)
 
-        self._fluxes = fluxes
+        self._fluxes = fluxes if fluxes is not None else Trajectory([])
         self._times = used_time
+        self._step_history = step_history
+
+    def integrate_to_next_depletion(
+        self, FBAsol: dict[str, float], dt_max: float
+    ) -> float:
+        """
+        Advance the concentrations and biomasses exactly, assuming the fluxes
+        of each organism stay proportional to its biomass, until the next
+        external metabolite runs out or dt_max has passed.
+
+        Args:
+            FBAsol (dict[str, float]): The solution vector of the FBA.
+            dt_max (float): The largest time step.
+
+        Returns:
+            float: The length of the step taken
+        """
+        self._check_bound_index()
+
+        v = numpy.array([FBAsol[rid] for rid in self._uptake_rids])
+        C = numpy.zeros((len(self.metabolites), len(self.biomasses)))
+        numpy.add.at(
+            C,
+            (self._uptake_species, self._uptake_organisms),
+            self._uptake_coefficients * v,
+        )
+
+        X0 = self.biomasses.last().copy()
+        growth = numpy.array(
+            [FBAsol[rid] for rid in self.model.get_model_biomass_ids().values()]
+        )
+        mu = numpy.divide(
+            growth, X0, out=numpy.zeros_like(X0), where=X0 > 0
+        )
+        S0 = self.metabolites.last().copy()
+
+        h, depleted = next_depletion(S0, C, mu, dt_max)
+        S, X = integrate(S0, X0, C, mu, h)
+        S[depleted] = 0.0
+
+        self.metabolites.append(S)
+        self.biomasses.append(X)
+
+        return h
+
+    def relative_depletion(
+        self, FBAsol: dict[str, float], dt: float, atol: float = 0.0
+    ) -> float:
+        """
+        Calculate the largest fraction of its concentration an external
+        metabolite loses in a time step.
+
+        Args:
+            FBAsol (dict[str, float]): The solution vector of the FBA.
+            dt (float): The time step.
+            atol (float, optional): Metabolites with a concentration below
+                atol are considered depleted and ignored. Defaults to 0.0.
+
+        Returns:
+            float: The relative depletion, 0 if nothing is consumed
+        """
+        self._check_bound_index()
+
+        if len(self._exchange_rids) == 0:
+            return 0.0
+
+        v = numpy.array([FBAsol[rid] for rid in self._exchange_rids])
+        S = self.metabolites.last()[self._exchange_species_columns]
+
+        consumed = (v < 0) & (S > atol)
+        if not consumed.any():
+            return 0.0
+
+        return float(numpy.max(-v[consumed] * dt / S[consumed]))
 
     def update_exchanges(self, dt: float) -> None:
         """
@@ -163,17 +336,23 @@ class DynamicFBABase(StaticOptimizationModelBase):
         concentration of the current time step.
 
         Args:
-            dt (float): The time step for the simulation.
+            dt (float): The time step for the simulation. If None, the uptake
+                is only blocked for depleted metabolites, as used by the event
+                driven simulation.
         """
+        self._check_bound_index()
 
-        for rid in self.model.getExchangeReactionIds():
-            reaction: Reaction = self.model.getReaction(rid)
-            # Exchanges only have one species:
-            sid = reaction.getSpeciesIds()[0]
-            # How I explain it: We normalize the exchange flux for how much the exchange can take up
-            # in 1 unit of time. In all other formulas we multiple by dt, making sure that the flux gets scaled to
-            # what it can take up in dt time.
-            reaction.setLowerBound(min(0, -self.metabolites[sid][-1] * (1 / dt)))
+        if dt is None:
+            for bound, sid in self._exchange_bounds:
+                depleted = self.metabolites[sid][-1] <= DEPLETION_TOLERANCE
+                bound.setValue(0 if depleted else -numpy.inf)
+            return
+
+        # How I explain it: We normalize the exchange flux for how much the exchange can take up
+        # in 1 unit of time. In all other formulas we multiple by dt, making sure that the flux gets scaled to
+        # what it can take up in dt time.
+        for bound, sid in self._exchange_bounds:
+            bound.setValue(min(0, -self.metabolites[sid][-1] * (1 / dt)))
 
     def update_concentrations(self, FBAsol: dict[str, float], dt: float) -> None:
         """
@@ -184,74 +363,195 @@ class DynamicFBABase(StaticOptimizationModelBase):
             dt (float): The time step for the simulation.
         """
 
+        concentrations = self.metabolites.last().copy()
         for e in self.model.getExchangeReactionIds():
             exchange: Reaction = self.model.getReaction(e)
 
             sid = exchange.getSpeciesIds()[0]
             if sid not in self.model.single_model_biomass_reaction_ids:
-                self.metabolites[sid].append(self.metabolites[sid][-1] + FBAsol[e] * dt)
+                concentrations[self.metabolites.index(sid)] += FBAsol[e] * dt
+
+        self.metabolites.append(concentrations)
+
+    def update_biomasses(self, FBAsol: dict[str, float], dt: float) -> None:
+        """
+        Update the biomass of each organism after an FBA simulation step.
+
+        Args:
+            FBAsol (dict): The solution vector from the FBA.
+            dt (float): The time step for the simulation.
+        """
+        growth = [
+            FBAsol[rid] for rid in self.model.get_model_biomass_ids().values()
+        ]
+        self.biomasses.append(self.biomasses.last() + numpy.multiply(growth, dt))
 
     def update_reaction_bounds(self, kinetics_func) -> None:
         """
         Update the reaction bounds for the simulation based on either provided
         kinetics or standard bounds.
 
+        Without a kinetics function the new bounds of all non exchange
+        reactions are computed at once from the biomass vector, using the
+        index build by ``_build_bound_index``.
+
         Args:
             kinetics_func (function): A custom function to adjust reaction
                 bounds based on kinetics. Uses standard bounds if None.
         """
-        for rid in self.model.getReactionIds():
+        if kinetics_func is not None:
             # TODO fix this
-            if kinetics_func is not None:
+            for rid in self.model.getReactionIds():
                 kinetics_func(
                     self,
                     rid,
                 )
+            return
+
+        self._check_bound_index()
+
+        # Organism specific biomass at last time point, for each reaction
+        X_k_t = self.biomasses.last()[self._bound_columns]
+
+        lower = self._initial_lb * X_k_t
+        upper = self._initial_ub * X_k_t
+
+        if len(self._kinetic_substrates) > 0:
+            S = numpy.array(
+                [self.metabolites[sid][-1] for sid in self._kinetic_substrates]
+            )
+            upper[self._kinetic_mask] = (
+                self._vmax * (S / (self._km + S)) * X_k_t[self._kinetic_mask]
+            )
+
+        for bound, value in zip(self._lower_bounds, lower.tolist()):
+            bound.setValue(value)
+        for bound, value in zip(self._upper_bounds, upper.tolist()):
+            bound.setValue(value)
+
+    def _check_bound_index(self) -> None:
+        """Rebuild the bound index if reactions or bounds were added or
+        removed, or if it was invalidated, for example after a deviate
+        function."""
+        key = (len(self.model.reactions), len(self.model.flux_bounds))
+        if key != self._bound_index_key:
+            self._build_bound_index()
+
+    def _build_bound_index(self) -> None:
+        """
+        Precompute everything needed to update the reaction bounds in bulk:
+        the flux bound objects of each reaction, the position of the
+        organism each reaction belongs to in the biomass vector, the initial
+        bounds and the reactions that follow Michaelis-Menten kinetics.
+
+        Raises:
+            NoLimitingSubstrateFound: If the limiting substrate of a kinetic
+                reaction is not an external species.
+        """
+        bounds = {}
+        for bound in self.model.flux_bounds:
+            bounds[(bound.reaction, bound.getType())] = bound
+
+        def flux_bound(rid: str, bound_type: str, value: float):
+            if (rid, bound_type) not in bounds:
+                self.model.setReactionBound(rid, value, bound_type)
+                bounds[(rid, bound_type)] = (
+                    self.model.getFluxBoundByReactionID(rid, bound_type)
+                )
+            return bounds[(rid, bound_type)]
+
+        self._lower_bounds = []
+        self._upper_bounds = []
+        exchange_species = {
+            reaction.getSpeciesIds()[0]
+            for reaction in self.model.reactions
+            if reaction.is_exchange
+        }
+        exchange_species &= set(self.metabolites.keys())
+
+        self._exchange_bounds = []
+        self._exchange_rids = []
+        self._uptake_rids = []
+        uptake_species = []
+        uptake_organisms = []
+        uptake_coefficients = []
+        exchange_species_columns = []
+        bound_columns = []
+        initial_lb = []
+        initial_ub = []
+        kinetic_mask = []
+        substrates = []
+        kms = []
+        vmaxs = []
+
+        for reaction in self.model.reactions:
+            rid = reaction.getId()
+            if reaction.is_exchange:
+                lb = reaction.getLowerBound()
+                lb = -numpy.inf if lb is None else lb
+                sid = reaction.getSpeciesIds()[0]
+                self._exchange_bounds.append((flux_bound(rid, "lower", lb), sid))
+                if sid in self.metabolites:
+                    self._exchange_rids.append(rid)
+                    exchange_species_columns.append(self.metabolites.index(sid))
                 continue
-            reaction: Reaction = self.model.getReaction(rid)
 
-            # Don't change the exchange reactions bounds
-            if not reaction.is_exchange:
-                mid_for_reaction = self.model.identify_model_from_reaction(rid)
-                # Organism specific biomass at last time point
-                X_k_t = self.biomasses[mid_for_reaction][-1]
-                reaction.setLowerBound(self.initial_bounds[rid][0] * X_k_t)
-
-                if self.kinetics.exists(rid):
-                    self.mm_kinetics(reaction, X_k_t, self.kinetics)
-
-                else:
-                    reaction.setUpperBound(self.initial_bounds[rid][1] * X_k_t)
-
-    # def reset_dt(self, species_id: str, FBAsol) -> float:
-    #     """
-    #     Adjust the time step if a species becomes infeasible during the simulation.
-
-    #     Args:
-    #         species_id (str): The ID of the infeasible species.
-    #         FBAsol (dict): The solution vector from the FBA.
-
-    #     Returns:
-    #         float: The recalculated time step.
-    #     """
-
-    #     # Remove last metabolite concentration
-    #     self.m_metabolite_concentrations = {
-    #         key: lst[:-1]
-    #         for key, lst in self.m_metabolite_concentrations.items()
-    #     }
-
-    #     # Maybe some metabolite was exported/created, by an organism
-    #     # Unfortunately to check what is create we would
-    #     # have to know the new dt which we don'...
-    #     # So we accept a small error.
-
-    #     total = 0
-    #     for (
-    #         rid,
-    #         species_ids,
-    #     ) in self.m_transporters.get_importers(True):
-    #         if species_id in species_ids:
-    #             total += FBAsol[rid]
-
-    #     return self.m_metabolite_concentrations[species_id][-1] / total
+            if rid not in self.initial_bounds:
+                self._initial_bounds[rid] = [
+                    reaction.getLowerBound(),
+                    reaction.getUpperBound(),
+                ]
+            lb, ub = self.initial_bounds[rid]
+            lb = -numpy.inf if lb is None else lb
+            ub = numpy.inf if ub is None else ub
+
+            self._lower_bounds.append(flux_bound(rid, "lower", lb))
+            self._upper_bounds.append(flux_bound(rid, "upper", ub))
+            column = self.biomasses.index(
+                self.model.identify_model_from_reaction(rid)
+            )
+            bound_columns.append(column)
+
+            # How much each organism changes the external metabolites
+            for reagent in reaction.reagents:
+                sid = reagent.getSpecies()
+                if sid in exchange_species:
+                    self._uptake_rids.append(rid)
+                    uptake_species.append(self.metabolites.index(sid))
+                    uptake_organisms.append(column)
+                    uptake_coefficients.append(reagent.getCoefficient())
+            initial_lb.append(lb)
+            initial_ub.append(ub)
+
+            is_kinetic = bool(self.kinetics.exists(rid))
+            kinetic_mask.append(is_kinetic)
+            if is_kinetic:
+                sid, km, vmax = self.kinetics.get_reactions_kinetics(rid)
+                if sid not in self.metabolites.keys():
+                    raise NoLimitingSubstrateFound(
+                        "The limiting substrate was not an external species"
+                    )
+                substrates.append(sid)
+                kms.append(km)
+                vmaxs.append(vmax)
+
+        self._exchange_species_columns = numpy.array(
+            exchange_species_columns, dtype=int
+        )
+        self._bound_columns = numpy.array(bound_columns, dtype=int)
+        self._uptake_species = numpy.array(uptake_species, dtype=int)
+        self._uptake_organisms = numpy.array(uptake_organisms, dtype=int)
+        self._uptake_coefficients = numpy.array(
+            uptake_coefficients, dtype=float
+        )
+        self._initial_lb = numpy.array(initial_lb, dtype=float)
+        self._initial_ub = numpy.array(initial_ub, dtype=float)
+        self._kinetic_mask = numpy.array(kinetic_mask, dtype=bool)
+        self._kinetic_substrates = substrates
+        self._km = numpy.array(kms, dtype=float)
+        self._vmax = numpy.array(vmaxs, dtype=float)
+
+        self._bound_index_key = (
+            len(self.model.reactions),
+            len(self.model.flux_bounds),
+        )
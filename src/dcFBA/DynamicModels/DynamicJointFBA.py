@@ -78,7 +78,7 @@ class DynamicJointFBA(DynamicFBABase):
         """
         mids = self.model.custom_model_identifiers
 
-        ls = list(map(lambda d: d["X_comm"], self.fluxes))
+        ls = self.get_flux_values("X_comm")
 
         v0 = 0
         for mid in mids:
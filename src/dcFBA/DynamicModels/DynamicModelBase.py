@@ -1,7 +1,14 @@
 # TODO implement this
 # from abc import ABC, abstractmethod
 
+from ..Helpers.ResultsFile import (
+    ResultsFile,
+    build_table,
+    load_results,
+    save_results,
+)
 from ..Models.KineticsStruct import KineticsStruct
+from ..Models.Trajectory import Trajectory
 
 
 class DynamicModelBase:
@@ -51,22 +58,23 @@ class DynamicModelBase:
         """Get the list of time-points used"""
         return self._times
 
-    def get_biomasses(self):
-        """Return the biomasses dictionary.
+    def get_biomasses(self) -> dict[str, list[float]]:
+        """Return a copy of the biomasses as a dictionary of lists. Change
+        ``biomasses`` to change the values of the simulation.
 
         Returns:
-            dict: Dictionary containing biomass information.
+            dict[str, list[float]]: Biomass concentrations over time.
         """
-        return self.biomasses
+        return _as_lists(self.biomasses)
 
-    def get_metabolites(self):
-        """Return the metabolites dictionary.
+    def get_metabolites(self) -> dict[str, list[float]]:
+        """Return a copy of the metabolites as a dictionary of lists. Change
+        ``metabolites`` to change the values of the simulation.
 
         Returns:
-            dict: Dictionary containing metabolite information.
+            dict[str, list[float]]: Metabolite concentrations over time.
         """
-
-        return self.metabolites
+        return _as_lists(self.metabolites)
 
     def get_fluxes(self):
         """Return the fluxes dictionary.
@@ -87,6 +95,54 @@ class DynamicModelBase:
     def get_flux_values(self) -> list[float]:
         pass
 
+    def save_results(self, path, compress: bool = False) -> None:
+        """Save the time points, biomasses, metabolites and fluxes to a
+        columnar ``.npz`` file, see ``dcFBA.Helpers.ResultsFile``.
+
+        Each table stores the values of an id next to each other, so
+        ``load_results`` reads a single flux without reading the others.
+
+        Args:
+            path (str): The file to write, the ``.npz`` extension is
+                added to a file name without it.
+            compress (bool, optional): Compress the file, the tables can
+                then not be memory mapped. Defaults to False.
+        """
+        save_results(
+            self._result_tables(),
+            self.times,
+            path,
+            model=type(self).__name__,
+            compress=compress,
+        )
+
+    @staticmethod
+    def load_results(path) -> ResultsFile:
+        """Open a file written by ``save_results``. The tables are memory
+        mapped and only read from disk when they are accessed.
+
+        Args:
+            path (str): The results file, the ``.npz`` extension is added
+                to a file name without it.
+
+        Returns:
+            ResultsFile: The times, biomasses, metabolites and fluxes
+        """
+        return load_results(path)
+
+    def _result_tables(self) -> dict:
+        """Return the (ids, id x time array) table of the biomasses,
+        metabolites and fluxes for ``save_results``."""
+        return {
+            "biomasses": build_table(self._biomasses),
+            "metabolites": build_table(self._metabolites),
+            "fluxes": self._flux_table(),
+        }
+
+    def _flux_table(self) -> tuple[list, object]:
+        """Return the (ids, id x time array) table of the fluxes."""
+        return build_table(self._fluxes)
+
     def get_fluxes_values(self) -> dict[str, float]:
         """Get the flux values for each time point given a reaction ID.
 
@@ -119,3 +175,10 @@ class DynamicModelBase:
             list[float]: list containing the relative abundance of each species for each time point.
         """
         pass
+
+
+def _as_lists(values) -> dict[str, list[float]]:
+    """Copy a Trajectory or a dictionary of lists to a dictionary of lists"""
+    if isinstance(values, Trajectory):
+        return values.to_dict()
+    return {id: list(v) for id, v in values.items()}
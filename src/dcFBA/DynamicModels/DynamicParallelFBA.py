@@ -1,8 +1,16 @@
+import os
 import numpy
-import cbmpy
 from cbmpy.CBModel import Model, Reaction
 from .StaticOptimizationModel import StaticOptimizationModelBase
 from ..Models.KineticsStruct import KineticsStruct
+from ..Helpers.SolverSession import SolverSession
+from ..Helpers.SolverPool import SolverPool
+from ..Helpers.ResultsFile import build_table
+from ..Helpers.DepletionEvents import (
+    DEPLETION_TOLERANCE,
+    integrate,
+    next_depletion,
+)
 
 
 class DynamicParallelFBA(StaticOptimizationModelBase):
@@ -67,6 +75,17 @@ class DynamicParallelFBA(StaticOptimizationModelBase):
     def models(self) -> dict[str, Model]:
         return self._models
 
+    def _flux_table(self) -> tuple[list, numpy.ndarray]:
+        """Return the flux table for ``save_results``, the fluxes are
+        stored by (model id, reaction id)."""
+        fluxes = {}
+        for mid, solutions in self.fluxes.items():
+            for rid in self.models[mid].getReactionIds():
+                fluxes[(mid, rid)] = [
+                    solution.get(rid, numpy.nan) for solution in solutions
+                ]
+        return build_table(fluxes)
+
     def get_flux_values(self, mid: str, rid: str) -> list[float]:
         """Returns the aggregated flux values for each time point given a
         reaction ID.
@@ -147,7 +166,65 @@ class DynamicParallelFBA(StaticOptimizationModelBase):
         epsilon: float = 1e-6,
         kinetics_func=None,
         deviate=None,
+        event_driven: bool = False,
+        processes: int = 1,
+    ) -> None:
+        """Perform a dynamic parallel FBA simulation.
+
+        Every model keeps its LP in a ``SolverSession`` for the whole
+        simulation. With more than one process the models are divided over
+        a ``SolverPool`` of worker processes that solve them concurrently.
+
+        Args:
+            dt (float): The time step, the largest time step if event_driven.
+            n (int, optional): Maximal number of time steps. Defaults to 10000.
+            epsilon (float, optional): The simulation stops when the solution
+                of all models drops below epsilon. Defaults to 1e-6.
+            kinetics_func (function, optional): Custom function to set the
+                reaction bounds each step. Defaults to None.
+            deviate (function, optional): Function called before each step
+                to change the models or concentrations. Defaults to None.
+            event_driven (bool, optional): Integrate the concentrations and
+                biomasses exactly from the current fluxes and end each step at
+                the moment the next external metabolite runs out.
+                Defaults to False.
+            processes (int, optional): Number of worker processes solving the
+                models of a time step concurrently, None uses the number of
+                CPUs. Defaults to 1, all models are solved in this process.
+        """
+        if processes is None:
+            processes = os.cpu_count()
+
+        if processes > 1 and len(self.models) > 1:
+            with SolverPool(self.models, processes) as pool:
+                self._simulate(
+                    dt,
+                    n,
+                    epsilon,
+                    kinetics_func,
+                    deviate,
+                    event_driven,
+                    pool.solve,
+                )
+            return
+
+        sessions = {mid: SolverSession(m) for mid, m in self.models.items()}
+
+        def solve_models():
+            return {
+                mid: (session.solve(), session.get_solution())
+                for mid, session in sessions.items()
+            }
+
+        self._simulate(
+            dt, n, epsilon, kinetics_func, deviate, event_driven, solve_models
+        )
+
+    def _simulate(
+        self, dt, n, epsilon, kinetics_func, deviate, event_driven, solve_models
     ) -> None:
+        """The simulation loop, solve_models returns the objective value and
+        fluxes of each model with its current bounds."""
         final_fluxes = {m: [] for m in self.models.keys()}
         used_times = [0]
 
@@ -161,7 +238,7 @@ class DynamicParallelFBA(StaticOptimizationModelBase):
                 dt = dt_save
 
             self.update_reaction_bounds(kinetics_func)
-            self.update_exchanges(dt)
+            self.update_exchanges(None if event_driven else dt)
             temp_fluxes = {m: {} for m in self.models.keys()}
             if deviate is not None:
                 run_condition += deviate(
@@ -172,9 +249,7 @@ class DynamicParallelFBA(StaticOptimizationModelBase):
 
             # Perform FBA foreach model
             step = 0
-            for mid, model in self.models.items():
-                solution = cbmpy.doFBA(model, quiet=True)
-
+            for mid, (solution, FBAsol) in solve_models().items():
                 if numpy.isnan(solution):
                     print(f"model: {mid} had an infeasible solution")
                     self._times = used_times
@@ -184,8 +259,6 @@ class DynamicParallelFBA(StaticOptimizationModelBase):
                 if solution <= epsilon:
                     step += 1
 
-                FBAsol = model.getSolutionVector(names=True)
-                FBAsol = dict(zip(FBAsol[1], FBAsol[0]))
                 temp_fluxes[mid] = FBAsol
 
             if step == len(self.models.keys()):
@@ -194,6 +267,13 @@ class DynamicParallelFBA(StaticOptimizationModelBase):
                 self._fluxes = final_fluxes
                 return
 
+            if event_driven:
+                h = self.integrate_to_next_depletion(temp_fluxes, dt_save)
+                for mid, fbasol in temp_fluxes.items():
+                    final_fluxes[mid].append(fbasol)
+                used_times.append(used_times[-1] + h)
+                continue
+
             self.update_concentrations(temp_fluxes, dt)
             species_id = self.check_solution_feasibility()
 
@@ -259,14 +339,66 @@ class DynamicParallelFBA(StaticOptimizationModelBase):
         concentrations.
 
         Args:
-            dt (float):time step size
+            dt (float):time step size. If None, the uptake is only blocked
+                for depleted metabolites, as used by the event driven
+                simulation.
         """
 
         for model in self.models.values():
             for rid in model.getExchangeReactionIds():
                 reaction: Reaction = model.getReaction(rid)
                 sid = reaction.getSpeciesIds()[0]
-                reaction.setLowerBound(-self.metabolites[sid][-1] * (1 / dt))
+                if dt is None:
+                    depleted = self.metabolites[sid][-1] <= DEPLETION_TOLERANCE
+                    reaction.setLowerBound(0 if depleted else -numpy.inf)
+                else:
+                    reaction.setLowerBound(-self.metabolites[sid][-1] * (1 / dt))
+
+    def integrate_to_next_depletion(
+        self, fluxes: dict[str, dict[str, float]], dt_max: float
+    ) -> float:
+        """Advance the concentrations and biomasses exactly, assuming the
+        fluxes of each model stay proportional to its biomass, until the next
+        external metabolite runs out or dt_max has passed.
+
+        Args:
+            fluxes (dict[str, dict[str, float]]): FBA solution of each model
+            dt_max (float): The largest time step
+
+        Returns:
+            float: The length of the step taken
+        """
+        sids = list(self.metabolites.keys())
+        mids = list(self.models.keys())
+        rows = {sid: i for i, sid in enumerate(sids)}
+
+        C = numpy.zeros((len(sids), len(mids)))
+        X0 = numpy.array([self.biomasses[mid][-1] for mid in mids])
+        mu = numpy.zeros(len(mids))
+
+        for k, mid in enumerate(mids):
+            model = self.models[mid]
+            fbasol = fluxes[mid]
+            for eid in model.getExchangeReactionIds():
+                sid = model.getReaction(eid).getSpeciesIds()[0]
+                C[rows[sid], k] += fbasol[eid]
+
+            growth = fbasol[model.getActiveObjectiveReactionIds()[0]]
+            if X0[k] > 0:
+                mu[k] = growth / X0[k]
+
+        S0 = numpy.array([self.metabolites[sid][-1] for sid in sids])
+
+        h, depleted = next_depletion(S0, C, mu, dt_max)
+        S, X = integrate(S0, X0, C, mu, h)
+        S[depleted] = 0.0
+
+        for sid, value in zip(sids, S.tolist()):
+            self.metabolites[sid].append(value)
+        for mid, value in zip(mids, X.tolist()):
+            self.biomasses[mid].append(value)
+
+        return h
 
     def update_concentrations(
         self, fluxes: dict[str, dict[str, float]], dt: float
@@ -50,5 +50,4 @@ class DynamicSingleFBA(DynamicFBABase):
         Returns:
             list[float]: Biomass concentration over time
         """
-        biomasses = super().get_biomasses()
-        return biomasses[""]
+        return super().get_biomasses()[""]
@@ -1,11 +1,26 @@
 import cbmpy
 import numpy
-import re
-from cbmpy.CBModel import Reaction, Species
+import os
+from cbmpy.CBModel import Reaction
 
-from ..Exceptions import SpeciesNotFound
+from ..Exceptions import MatrixTooLarge, SpeciesNotFound
 from ..Models.CommunityModel import CommunityModel
-from ..Helpers.BuildEndPointModel import build_time_model
+from ..Helpers.SolverSession import SolverSession, read_bounds
+from ..Helpers.CompressModel import compress_model
+from ..Helpers.BuildEndPointModel import (
+    add_time_points,
+    build_bound_constraints,
+    build_constraint_matrix,
+    build_initial_model,
+    build_time_matrix,
+    build_time_model,
+    estimate_matrix_memory,
+    extend_time_model,
+    move_final_time_point,
+    set_reaction_bounds,
+    time_ids,
+    truncate_time_model,
+)
 from .DynamicModelBase import DynamicModelBase
 from ..Models import KineticsStruct
 
@@ -15,8 +30,15 @@ class EndPointFBA(DynamicModelBase):
 
     This class provides the blueprint and functionality to perform EndPointFBA
     on a CommunityModel. Inherits from the DynamicModelBase class.
+
+    Attributes:
+        dense_matrix_limit (int): Estimated size in bytes of the dense LP
+            matrices above which ``simulate`` builds sparse matrices, unless
+            the matrix type is given. Defaults to 512 MiB.
     """
 
+    dense_matrix_limit: int = 512 * 1024**2
+
     def __init__(
         self,
         community_model: CommunityModel,
@@ -25,6 +47,7 @@ class EndPointFBA(DynamicModelBase):
         initial_concentrations: dict[str, float] = {},
         dt: float = 0.1,
         kinetics: KineticsStruct = None,
+        compress: bool = False,
     ) -> None:
         """Initializes the EndPointFBA class
 
@@ -42,14 +65,41 @@ class EndPointFBA(DynamicModelBase):
             kinetics (KineticsStruct, optional): Kinetic information for the
                 model. Defaults to None.
             dt (float, optional): Size of the time step. Defaults to 0.1.
+            compress (bool, optional): Compress the community model before
+                it is expanded in time, see Helpers.CompressModel. Blocked
+                reactions are removed and linear chains of reactions are
+                merged, the flux values of all reactions are still
+                available after the simulation. The model and its
+                constraints, e.g. constrain_rates and set_qp, only contain
+                the remaining reactions. Defaults to False.
         """
         super().__init__()
 
-        width = len(str(n))
-        self._times = [f"time{i:0{width}d}" for i in range(n)]
-        self._dt = dt
+        # Removed and merged reactions mapped to the reaction representing
+        # them in the compressed model and the factor of their flux
+        self._reaction_map: dict[str, tuple[str, float]] = {}
+        if compress:
+            community_model, self._reaction_map = compress_model(
+                community_model
+            )
 
-        self._model = build_time_model(community_model, self.times)
+        self._times = time_ids(n, len(str(n)))
+        self._dt = dt
+        self._community_model = community_model
+        self._initial_biomasses = dict(initial_biomasses)
+        self._initial_concentrations = dict(initial_concentrations)
+
+        # The LP is built from the time matrix, the model only contains the
+        # exchanges and the community biomass until it is accessed
+        self._initial_model = build_initial_model(community_model)
+        self._model = build_time_model(
+            community_model,
+            self.times,
+            self._initial_model,
+            time_points=False,
+        )
+        self._expanded = False
+        self._time_matrix = build_time_matrix(community_model, self.times)
 
         self._kinetics = kinetics
 
@@ -61,80 +111,173 @@ class EndPointFBA(DynamicModelBase):
             initial_biomasses, initial_concentrations
         )
 
+        self._session: SolverSession = None
+        self._constraints = 0
+        self._balanced_growth: dict[str, float] = {}
+
+        # The fluxes of the community model reactions for each time point
+        # and the concentration of each exchanged species
+        self._flux_matrix = numpy.zeros((n, 0))
+        self._trajectories = numpy.zeros((0, n + 1))
+        self._build_result_index()
+
     @property
     def model(self) -> CommunityModel:
-        """Returns the community model used in the simulation."""
+        """Returns the time-dependent community model used in the simulation.
+
+        The simulation does not need the reactions and species of the time
+        points, they are created when the model is accessed for the first
+        time. From then on the LP is built from the model, so changes to
+        these reactions, e.g. to their bounds or reagents, are part of the
+        simulation. Deleted reactions have a flux of zero in the results.
+        """
+        if not self._expanded:
+            self._expand_model()
         return self._model
 
+    def _expand_model(self) -> None:
+        """Add the reactions and species of every time point to the model,
+        the bounds that are scaled by the bound constraints are removed."""
+        add_time_points(self._initial_model, self._model, self.times)
+        self._expanded = True
+
+        # Keep the reactions that are not part of the time matrix, e.g. the
+        # community biomass, after the reactions of the time points
+        columns = self._time_matrix.col_index
+        reactions = self._model.reactions
+        self._model.reactions = [
+            r for r in reactions if r.getId() in columns
+        ] + [r for r in reactions if r.getId() not in columns]
+        self._scale_model_bounds(self.times)
+
     @property
     def dt(self) -> float:
         """Returns the size of the time step."""
         return self._dt
 
-    def _set_fluxes(self) -> None:
-        """Private method to set the fluxes from the model solution."""
-
-        solution_vector = self.model.getSolutionVector(names=True)
-        self._fluxes = dict(zip(solution_vector[1], solution_vector[0]))
-
-    def _set_biomasses(self) -> None:
-        """Private method to set the concentrations of Biomasses over time."""
-        mids = self.model.custom_model_identifiers
-        temp_biomasses: dict[str, list[float]] = {}
-        for mid in mids:
-            temp_biomasses[mid] = [-1 * self.fluxes[f"BM_{mid}_exchange"]]
-
-        for mid in self.model.custom_model_identifiers:
-            for i in range(len(self.times[:-1])):
-                temp_biomasses[mid].append(
-                    self.fluxes[f"BM_{mid}_{self.times[i]}_{self.times[i+1]}"]
-                )
-            temp_biomasses[mid].append(self.fluxes[f"BM_{mid}_exchange_final"])
-
-        self._biomasses = dict(temp_biomasses)
-        del temp_biomasses
-
-    def _set_metabolites(self) -> None:
-        """Private method to set the metabolite concentrations."""
-
-        pattern = rf"^(.*?)_{self.times[0]}"
-        regex = re.compile(pattern)
-        temp_metabolites: dict[str, list[float]] = {}
+    def _build_result_index(self) -> None:
+        """Index the columns of the time matrix, so the results are sliced
+        from the solution instead of looked up by id.
 
-        # Iterate through exchange reaction IDs
-        for eid in self.model.getExchangeReactionIds():
-            # Get the species ID for the reaction
-            species_id: str = self.model.getReaction(eid).getSpeciesIds()[0]
-
-            # Search for the pattern in the species ID
-            match = regex.search(species_id)
-            if match is None:
+        The reactions of the time matrix are stored in the column order of
+        the time matrix: the reactions of the community model for each time
+        point, the first and final exchanges and the links between the time
+        points, see ``TimeMatrix``.
+        """
+        matrix = self._time_matrix
+        n = len(self.times)
+
+        self._reaction_index = {
+            rid: i for i, rid in enumerate(matrix.reaction_ids)
+        }
+
+        # The exchanged species of which the concentrations are tracked,
+        # with the position of their exchange and link columns
+        linked = {sid: i for i, sid in enumerate(matrix.linked_ids)}
+        self._trajectory_ids: list[str] = []
+        exchanges, links = [], []
+        for i, (_, sid) in enumerate(matrix.exchanges):
+            if n > 1 and sid not in linked:
                 continue
+            self._trajectory_ids.append(sid)
+            exchanges.append(i)
+            links.append(linked.get(sid, 0))
+        self._trajectory_exchanges = numpy.array(exchanges, dtype=int)
+        self._trajectory_links = numpy.array(links, dtype=int)
 
-            # Extract the old species ID from the match
-            old_species_id = match.group(1)
+    @property
+    def fluxes(self) -> dict[str, float]:
+        """Get the fluxes dictionary, it is created on first access."""
+        if self._fluxes is None:
+            ids, solution, extra = self._solution
+            self._fluxes = dict(zip(ids, solution.tolist()))
+            self._fluxes.update(extra)
 
-            # Check if the old species ID has the desired prefix and update the metabolites dictionary if not
-            if not old_species_id.startswith("BM_c"):
-                temp_metabolites[old_species_id] = [-1 * self.fluxes[eid]]
+            # Expand the fluxes of the reactions removed by the compression
+            for rid in self._reaction_map.keys():
+                values = self._mapped_flux_values(rid).tolist()
+                for tid, value in zip(self.times, values):
+                    self._fluxes[f"{rid}_{tid}"] = value
 
-        for sid in temp_metabolites.keys():
-            for i in range(len(self.times[:-1])):
-                temp_metabolites[sid].append(
-                    self.fluxes[f"{sid}_{self.times[i]}_{self.times[i+1]}"]
-                )
-            temp_metabolites[sid].append(self.fluxes[f"{sid}_exchange_final"])
+        return self._fluxes
 
-        keys_to_delete = [
-            k for k, v in temp_metabolites.items() if sum(v) == 0
-        ]
+    def _set_fluxes(self, fluxes: numpy.ndarray) -> None:
+        """Private method to set the fluxes from the solution of the LP.
 
-        for key in keys_to_delete:
-            del temp_metabolites[key]
+        Args:
+            fluxes (numpy.ndarray): The solution in the column order of the
+                matrices set by ``_build_matrices``.
+        """
+        matrix = self._time_matrix
+        n = len(self.times)
+        n_reactions = len(matrix.reaction_ids)
+        n_exchanges = len(matrix.exchanges)
+
+        # Reorder the solution to the column order of the time matrix, the
+        # reactions deleted from the model have no flux
+        solution = numpy.where(
+            self._time_columns >= 0, fluxes[self._time_columns], 0.0
+        )
+        values = fluxes.tolist()
+        extra = {rid: values[i] for rid, i in self._extra_columns.items()}
+        self._solution = (matrix.col_ids, solution, extra)
+        self._fluxes = None
+
+        diagonal = n * n_reactions
+        self._flux_matrix = solution[:diagonal].reshape(n, n_reactions)
+
+        # The concentrations are the first exchange, the links between the
+        # time points and the final exchange of each species
+        exchanges = solution[diagonal : diagonal + 2 * n_exchanges]
+        exchanges = exchanges.reshape(n_exchanges, 2)
+        links = solution[diagonal + 2 * n_exchanges :]
+        links = links.reshape(n - 1, len(matrix.linked_ids))
+
+        trajectories = numpy.empty((len(self._trajectory_ids), n + 1))
+        trajectories[:, 0] = -1 * exchanges[self._trajectory_exchanges, 0]
+        trajectories[:, 1:n] = links[:, self._trajectory_links].T
+        trajectories[:, n] = exchanges[self._trajectory_exchanges, 1]
+        self._trajectories = trajectories
 
-        self._metabolites = dict(temp_metabolites)
+    def _set_biomasses(self) -> None:
+        """Private method to set the concentrations of Biomasses over time."""
+        index = {sid: i for i, sid in enumerate(self._trajectory_ids)}
+        self._biomasses = {
+            mid: self._trajectories[index[f"BM_{mid}"]].tolist()
+            for mid in self._model.custom_model_identifiers
+        }
 
-        del temp_metabolites
+    def _set_metabolites(self) -> None:
+        """Private method to set the metabolite concentrations."""
+        # Metabolites that are never present are left out
+        present = self._trajectories.sum(axis=1) != 0
+        self._metabolites = {
+            sid: self._trajectories[i].tolist()
+            for i, sid in enumerate(self._trajectory_ids)
+            if present[i] and not sid.startswith("BM_c")
+        }
+
+    def _mapped_flux_values(self, rid: str) -> numpy.ndarray:
+        """The flux values of a reaction removed by the compression."""
+        representative, factor = self._reaction_map[rid]
+        if representative is None:
+            return numpy.zeros(len(self.times))
+        column = self._reaction_index[representative]
+        return factor * self._flux_matrix[:, column]
+
+    def _flux_table(self) -> tuple[list[str], numpy.ndarray]:
+        """Return the flux table for ``save_results``, the fluxes of the
+        reactions of the original model for each time point."""
+        if self._flux_matrix.shape[1] == 0:
+            return [], numpy.zeros((0, len(self.times)))
+
+        ids = list(self._reaction_index.keys())
+        fluxes = self._flux_matrix.T
+        if len(self._reaction_map) > 0:
+            ids += list(self._reaction_map.keys())
+            mapped = [self._mapped_flux_values(r) for r in self._reaction_map]
+            fluxes = numpy.vstack([fluxes, mapped])
+        return ids, fluxes
 
     def get_flux_values(self, rid: str) -> list[float]:
         """Returns the flux values for each time point given a reaction ID.
@@ -145,6 +288,11 @@ class EndPointFBA(DynamicModelBase):
         Returns:
             list[float]: aggregated flux values for each time point
         """
+        if rid in self._reaction_index:
+            return self._flux_matrix[:, self._reaction_index[rid]].tolist()
+        if rid in self._reaction_map:
+            return self._mapped_flux_values(rid).tolist()
+
         fluxes: list[float] = []
         for tid in self.times:
             full_id = f"{rid}_{tid}"
@@ -179,7 +327,7 @@ class EndPointFBA(DynamicModelBase):
             list[float]: specific flux values
         """
         values = self.get_flux_values(rid)
-        mid = self.model.identify_model_from_reaction(rid)
+        mid = self._model.identify_model_from_reaction(rid)
 
         return [
             v / (self.dt * self.biomasses[mid][i])
@@ -195,7 +343,7 @@ class EndPointFBA(DynamicModelBase):
         total_flux = numpy.zeros(len(self.times))
         total_mass = numpy.zeros(len(self.times))
 
-        for mid, bid in self.model.get_model_biomass_ids().items():
+        for mid, bid in self._model.get_model_biomass_ids().items():
             total_flux = numpy.add(total_flux, self.get_flux_values(bid))
             total_mass = numpy.add(total_mass, self.biomasses[mid][:-1])
 
@@ -211,7 +359,7 @@ class EndPointFBA(DynamicModelBase):
         Returns:
             dict[str, list[float]]: model_id : relative abundance over time
         """
-        mids = self.model.custom_model_identifiers
+        mids = self._model.custom_model_identifiers
         total = [0] * (len(self.times) + 1)
 
         for mid in mids:
@@ -219,12 +367,29 @@ class EndPointFBA(DynamicModelBase):
 
         return {mid: numpy.divide(self.biomasses[mid], total) for mid in mids}
 
-    def simulate(self, sparse=False) -> float:
+    def simulate(self, sparse: bool = None, warm_start=False) -> float:
         """Performs FBA (Flux Balance Analysis) on the EndPointFBA matrix.
 
+        The LP is built from the time matrix, the bound constraints and the
+        reactions and constraints of the model. Before the matrices are built
+        their memory is estimated and reported, a warm started simulation
+        only builds them when the LP of the solver is created. Dense matrices
+        that do not fit in the available memory are replaced by sparse
+        matrices.
+
         Args:
-            sparse (False): Set to true if you want to use a sparse matrix
-                Sparse matrix decreases the amount of memory required
+            sparse (bool, optional): Set to true if you want to use a sparse
+                matrix, sparse matrices decrease the amount of memory
+                required. Defaults to None, use sparse matrices if the
+                dense matrices are larger than ``dense_matrix_limit``.
+            warm_start (False): Keep the LP of the solver between simulations
+                and only send the changed bounds and balanced growth
+                parameters, so the solver starts from the previous optimal
+                basis. Use this when simulating the same model many times.
+
+        Raises:
+            MatrixTooLarge: If even the sparse matrices do not fit in the
+                available memory.
 
          Returns:
             float: Final community flux value,
@@ -233,35 +398,172 @@ class EndPointFBA(DynamicModelBase):
                 To find the total community biomass you have to add
                 the initial amount of biomass.
         """
-
-        matrix_type = "scipy_csr" if sparse else "numpy"
-        self.model.buildStoichMatrix(matrix_type=matrix_type)
-        solution = cbmpy.doFBA(self.model, quiet=False, build_n=False)
-
-        self._set_fluxes()
+        if warm_start:
+            # Constraints added since the last simulation are not part of
+            # the LP of the session
+            constraints = len(self._model.user_defined_constraints)
+            if self._session is None or constraints != self._constraints:
+                self._session = self._create_session(sparse)
+                self._constraints = constraints
+            session = self._session
+        else:
+            session = self._create_session(sparse)
+        solution = session.solve()
+
+        self._set_fluxes(session.fluxes)
         self._set_biomasses()
         self._set_metabolites()
 
         return solution
 
+    def _create_session(self, sparse: bool = None) -> SolverSession:
+        """Create a solver session that builds the LP with
+        ``_build_matrices`` and takes the bounds from ``_lp_bounds``."""
+        return SolverSession(
+            self._model,
+            build_matrices=lambda: self._build_matrices(sparse),
+            bounds=self._lp_bounds,
+        )
+
     def _set_objective(self) -> None:
         """Creates the community biomass reaction and sets it
         to be the objective of the model"""
 
-        self.model.createReaction("X_comm", silent=True)
-        out: Reaction = self.model.getReaction("X_comm")
+        self._model.createReaction("X_comm", silent=True)
+        out: Reaction = self._model.getReaction("X_comm")
         out.is_exchange = True
         out.setUpperBound(cbmpy.INF)
         out.setLowerBound(0)
         out.createReagent("BM_c_" + self.times[-1], -1)
 
-        self.model.createObjectiveFunction("X_comm")
+        self._model.createObjectiveFunction("X_comm")
+
+        self._model.setActiveObjective("X_comm_objective")
+
+    def fva(self, selected_reactions=None, sparse: bool = None) -> None:
+        model = self.model
+        self._build_matrices(sparse)
+        return cbmpy.doFVA(model, selected_reactions=selected_reactions)
+
+    def _choose_sparse(self, sparse: bool = None) -> bool:
+        """Choose between sparse and dense matrices based on their estimated
+        memory, see ``simulate``.
+
+        Args:
+            sparse (bool, optional): The requested matrix type, None chooses
+                sparse matrices above ``dense_matrix_limit``.
+
+        Raises:
+            MatrixTooLarge: If even the sparse matrices do not fit in the
+                available memory.
 
-        self.model.setActiveObjective("X_comm_objective")
+        Returns:
+            bool: True if sparse matrices should be built
+        """
+        blocks = [self._bound_constraints]
+        dense = estimate_matrix_memory(
+            self._model,
+            self._time_matrix,
+            blocks,
+            sparse=False,
+            time_points=self._expanded,
+        )
+        available = _available_memory()
+
+        if sparse is None:
+            sparse = dense > self.dense_matrix_limit
+        if not sparse and available is not None and dense > available:
+            print(
+                f"Dense matrices need an estimated {_mib(dense)}, "
+                f"only {_mib(available)} is available: using sparse matrices"
+            )
+            sparse = True
+
+        memory = (
+            estimate_matrix_memory(
+                self._model,
+                self._time_matrix,
+                blocks,
+                sparse=True,
+                time_points=self._expanded,
+            )
+            if sparse
+            else dense
+        )
+        if available is not None and memory > available:
+            raise MatrixTooLarge(
+                f"The sparse matrices need an estimated {_mib(memory)}, "
+                f"only {_mib(available)} is available"
+            )
 
-    def fva(self, selected_reactions=None) -> None:
-        self.model.buildStoichMatrix()
-        return cbmpy.doFVA(self.model, selected_reactions=selected_reactions)
+        kind = "sparse" if sparse else "dense"
+        print(f"Building {kind} matrices, estimated memory {_mib(memory)}")
+        return sparse
+
+    def _build_matrices(self, sparse: bool = None) -> None:
+        """Set the stoichiometric and constraint matrix of the model from the
+        block structured time matrix and the bound constraints, instead of
+        walking every reaction of the time expanded model with
+        ``buildStoichMatrix``. The columns are the reactions of the model
+        followed by the reactions of the time points that the model does not
+        contain, see ``TimeMatrix.lp_ids``. Once the model is expanded, see
+        ``model``, the stoichiometry is read from its reactions. The matrix
+        type is chosen by
+        ``_choose_sparse``, which estimates and reports the memory.
+
+        Args:
+            sparse (bool, optional): Use SciPy sparse matrices instead of
+                NumPy arrays, None chooses by the estimated memory.
+        """
+        sparse = self._choose_sparse(sparse)
+        model = self._model
+        model.N = self._time_matrix.struct_matrix(
+            model, sparse, time_points=self._expanded
+        )
+        model.CM = build_constraint_matrix(
+            model, sparse, [self._bound_constraints], model.N.col
+        )
+
+        # The position of the time matrix columns and of the other reactions
+        # of the model in the solution
+        rids = model.N.col
+        columns = self._time_matrix.col_index
+        index = {rid: i for i, rid in enumerate(rids)}
+        self._time_columns = numpy.array(
+            [index.get(rid, -1) for rid in self._time_matrix.col_ids],
+            dtype=int,
+        )
+        self._extra_columns = {
+            rid: i for i, rid in enumerate(rids) if rid not in columns
+        }
+
+        # The columns after the reactions of the model take the bounds of
+        # the time matrix
+        n_reactions = len(model.reactions)
+        self._default_bounds = numpy.array(
+            [columns[rid] for rid in rids[n_reactions:]], dtype=int
+        )
+
+    def _lp_bounds(
+        self, index: dict[str, int]
+    ) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """Return the bounds of the columns of the matrices set by
+        ``_build_matrices``: the flux bounds of the reactions of the model
+        followed by the bounds of the time matrix.
+
+        Args:
+            index (dict[str, int]): The position of each reaction id.
+
+        Returns:
+            tuple[numpy.ndarray, numpy.ndarray]: lower and upper bounds in the
+                order of the index
+        """
+        lb, ub = read_bounds(self._model, index)
+
+        start = len(index) - len(self._default_bounds)
+        lb[start:] = self._time_matrix.lower[self._default_bounds]
+        ub[start:] = self._time_matrix.upper[self._default_bounds]
+        return lb, ub
 
     def _set_constraints(
         self,
@@ -273,118 +575,168 @@ class EndPointFBA(DynamicModelBase):
         Private method configures the constraints for the EndPointFBA model.
         Unlike using upper and lower bounds, it adjusts constraints for each
         time point's reaction based on biomass, dt, and the initial bound.
+        The constraints are stored as a sparse block, see
+        ``build_bound_constraints``, instead of as user defined constraints
+        of the model.
 
         Args:
+            initial_model (CommunityModel): The community model with the
+                original bounds.
             n (int): Number of time points.
-            initial_biomasses (dict[str, float]): Dictionary mapping model ID
-                to initial biomass concentrations.
             dt (float): Time step size.
         """
 
         # TODO can be removed once cbmpy version 0.9.0 is online
-        self.model.__FBC_VERSION__ = 3
+        self._model.__FBC_VERSION__ = 3
 
-        # Lookup time of set is on average O(1)
-        rids_lb_to_check = set()
-        rids_ub_to_check = set()
+        lower_bounds: dict[str, float] = {}
+        upper_bounds: dict[str, float] = {}
         for reaction in initial_model.reactions:
             if reaction.is_exchange:
                 continue
             lb = reaction.getLowerBound()
             ub = reaction.getUpperBound()
             if not (lb == 0.0 or lb == cbmpy.INF or lb == numpy.NINF):
-                rids_lb_to_check.add(reaction.getId())
+                lower_bounds[reaction.getId()] = lb
             if not (ub == 0.0 or ub == cbmpy.INF or ub == numpy.NINF):
-                rids_ub_to_check.add(reaction.getId())
-
-        combined_set = rids_lb_to_check | rids_ub_to_check
-        # Reactions at time zero
-        for rid in combined_set:
-            # TODO under construction
-            # if self.kinetics and self.kinetics.exists(reaction.getId()):
-            #     self.mm_approximation(reaction.getId())
-            #     continue
-            new_rid = rid + "_" + self.times[0]
-            reaction = self.model.getReaction(new_rid)
-            mid = self.model.identify_model_from_reaction(rid)
-
-            if rid in rids_lb_to_check:
-                udc = self.model.createUserDefinedConstraint(
-                    f"{new_rid}_lb",
-                    0.0,
-                    numpy.Inf,
-                    components=[
-                        (1, new_rid, "linear"),
-                        (
-                            1 * dt * reaction.getLowerBound(),
-                            f"BM_{mid}_exchange",
-                            "linear",
-                        ),
-                    ],
-                )
-                self.model.addUserDefinedConstraint(udc)
-                reaction.setLowerBound(numpy.NINF)
-            if rid in rids_ub_to_check:
-                udc = self.model.createUserDefinedConstraint(
-                    f"{new_rid}_ub",
-                    numpy.NINF,
-                    0.0,
-                    components=[
-                        (1, new_rid, "linear"),
-                        (
-                            1 * dt * reaction.getUpperBound(),
-                            f"BM_{mid}_exchange",
-                            "linear",
-                        ),
-                    ],
-                )
+                upper_bounds[reaction.getId()] = ub
 
-                self.model.addUserDefinedConstraint(udc)
-                reaction.setUpperBound(cbmpy.INF)
+        # TODO under construction
+        # if self.kinetics and self.kinetics.exists(reaction.getId()):
+        #     self.mm_approximation(reaction.getId())
+        #     continue
+        model_ids = {
+            rid: self._model.identify_model_from_reaction(rid)
+            for rid in lower_bounds.keys() | upper_bounds.keys()
+        }
+        self._scaled_bounds = (lower_bounds, upper_bounds, model_ids)
 
-        for rid in combined_set:
-            reaction: Reaction = initial_model.getReaction(rid)
-            # TODO not production ready yet
-            # if self.kinetics and self.kinetics.exists(reaction.getId()):
-            #     # just continue here, all bounds where set on the previous step
-            #     continue
+        self._scale_bounds(self.times[:n])
 
-            lb = reaction.getLowerBound()
-            ub = reaction.getUpperBound()
-            mid = self.model.identify_model_from_reaction(rid)
-
-            for i in range(1, n):
-                new_rid = rid + "_" + self.times[i]
-                reactionN: Reaction = self.model.getReaction(new_rid)
-
-                # Amount of biomass at time n
-                r_x_t = f"BM_{mid}_{self.times[i-1]}_{self.times[i]}"
-
-                if rid in rids_lb_to_check:
-                    udc = self.model.createUserDefinedConstraint(
-                        f"{new_rid}_lb",
-                        0.0,
-                        numpy.Inf,
-                        components=[
-                            (1, new_rid, "linear"),
-                            (-1 * dt * lb, r_x_t, "linear"),
-                        ],
-                    )
-                    self.model.addUserDefinedConstraint(udc)
-                    reactionN.setLowerBound(numpy.NINF)
-                if rid in rids_ub_to_check:
-                    udc = self.model.createUserDefinedConstraint(
-                        f"{new_rid}_ub",
-                        numpy.NINF,
-                        0.0,
-                        components=[
-                            (1, new_rid, "linear"),
-                            (-1 * dt * ub, r_x_t, "linear"),
-                        ],
-                    )
-
-                    self.model.addUserDefinedConstraint(udc)
-                    reactionN.setUpperBound(cbmpy.INF)
+    def _scale_bounds(self, times: list[str]) -> None:
+        """Replace the bounds of the reactions in the time matrix and in the
+        model at the given time points by the bound constraints and create
+        the bound constraints for all time points of the model.
+
+        Args:
+            times (list[str]): The time points of which the reaction bounds
+                of the model are not set yet.
+        """
+        lower_bounds, upper_bounds, model_ids = self._scaled_bounds
+
+        # The bounds are enforced by the constraint block, which is added to
+        # the constraint matrix when the model is simulated
+        self._bound_constraints = build_bound_constraints(
+            lower_bounds, upper_bounds, model_ids, self.times, self.dt
+        )
+
+        matrix = self._time_matrix
+        for bounds, values, value in [
+            (lower_bounds, matrix.lower, numpy.NINF),
+            (upper_bounds, matrix.upper, cbmpy.INF),
+        ]:
+            columns = [
+                matrix.col_index[f"{r}_{t}"]
+                for r in bounds
+                for t in self.times
+            ]
+            values[columns] = value
+
+        if self._expanded:
+            self._scale_model_bounds(times)
+
+    def _scale_model_bounds(self, times: list[str]) -> None:
+        """Remove the bounds of the model reactions at the given time points
+        that are replaced by the bound constraints.
+
+        Args:
+            times (list[str]): The time points of the reactions.
+        """
+        lower_bounds, upper_bounds, _ = self._scaled_bounds
+
+        lower = {f"{r}_{t}": numpy.NINF for r in lower_bounds for t in times}
+        upper = {f"{r}_{t}": cbmpy.INF for r in upper_bounds for t in times}
+        set_reaction_bounds(self._model, lower, "lower")
+        set_reaction_bounds(self._model, upper, "upper")
+
+    def resize(self, n: int) -> None:
+        """Change the number of time points of the model in place.
+
+        Time points are appended to or removed from the end of the time
+        expanded model and the final exchanges and the community biomass
+        are moved to the new final time point, so the model does not have to
+        be built again for a different n. Only if the ids of the new time
+        points are longer than the current ones, e.g. when going from 10 to
+        100 time points, the model is built again from the community model.
+
+        The results of a previous simulation are not changed. Constraints
+        added after initialization, e.g. by balanced_growth or
+        constrain_rates, refer to specific time points and are not resized,
+        so resizing a model with additional constraints is not allowed.
+
+        Args:
+            n (int): The new number of time points.
+
+        Raises:
+            ValueError: If n is smaller than 1 or the model has additional
+                constraints.
+        """
+        if n < 1:
+            raise ValueError("The number of time points should be at least 1")
+        if len(self._model.user_defined_constraints) > 0:
+            raise ValueError(
+                "Can not resize a model with additional constraints"
+            )
+
+        times = self.times
+        if n == len(times):
+            return
+
+        width = len(times[0]) - len("time")
+        if len(str(n - 1)) > width:
+            # The community model is already compressed
+            reaction_map = self._reaction_map
+            self.__init__(
+                self._community_model,
+                n,
+                self._initial_biomasses,
+                self._initial_concentrations,
+                self.dt,
+                self.kinetics,
+            )
+            self._reaction_map = reaction_map
+            return
+
+        final_reaction_ids = [
+            rid
+            for rid in self._model.getReactionIds()
+            if rid.endswith("_exchange_final")
+        ] + ["X_comm"]
+        new_times = time_ids(n, width)
+
+        # The LP of a warm started session has the old time points
+        if self._session is not None:
+            self._session.invalidate()
+
+        if not self._expanded:
+            move_final_time_point(
+                self._model, times[-1], new_times[-1], final_reaction_ids
+            )
+        elif n > len(times):
+            extend_time_model(
+                self._initial_model,
+                self._model,
+                times,
+                new_times[len(times) :],
+                final_reaction_ids,
+            )
+        else:
+            truncate_time_model(self._model, times, n, final_reaction_ids)
+
+        self._times = new_times
+        self._time_matrix = build_time_matrix(self._community_model, new_times)
+        self._scale_bounds(new_times[len(times) :])
+        self._build_result_index()
 
     # For cbmpy < 0.9.0
     # def set_constraints(
@@ -484,25 +836,30 @@ class EndPointFBA(DynamicModelBase):
                 dictionaries keys is not in the model raise an exception
 
         """
+        # The exchange reactions of the species of the first time point, the
+        # species of the time points are part of the time matrix
+        exchanges: dict[str, list[str]] = {}
+        for rid, sid in self._time_matrix.exchanges:
+            exchanges.setdefault(f"{sid}_{self.times[0]}", []).append(rid)
+            exchanges.setdefault(f"{sid}_{self.times[-1]}", []).append(
+                f"{sid}_exchange_final"
+            )
+        species_ids = set(self._initial_model.getSpeciesIds())
+
         for key, value in initial_concentrations.items():
-            sid = key + "_" + self.times[0]
-            if sid not in self.model.getSpeciesIds():
+            if key not in species_ids:
                 raise SpeciesNotFound(
                     "The species id defined as  \
                                       initial concentrations was not found in the model"
                 )
 
-            # get species and it's corresponding exchange reaction
-            species: Species = self.model.getSpecies(sid)
-            rids = species.isReagentOf()
-            for rid in rids:
-                reaction: Reaction = self.model.getReaction(rid)
-                if reaction.is_exchange:
-                    reaction.setLowerBound(-value)
-                    reaction.setUpperBound(-value)
+            for rid in exchanges.get(key + "_" + self.times[0], []):
+                self._model.setReactionBounds(rid, -value, -value)
 
         for key, value in initial_biomasses.items():
-            self.model.setReactionBounds(f"BM_{key}_exchange", -value, -value)
+            self._model.setReactionBounds(
+                f"BM_{key}_exchange", -value, -value
+            )
 
     def constrain_rates(self, epsilon=0.1):
         """
@@ -514,42 +871,35 @@ class EndPointFBA(DynamicModelBase):
             epsilon (float, optional): Maximum allowed rate difference between
                 successive time points. Defaults to 0.1.
         """
-        old_rids = set(
-            [id.split("_time")[0] for id in self.model.getReactionIds()]
-        )
-        for rid in old_rids:
-            reaction: Reaction = self.model.getReaction(
-                rid + "_" + self.times[0]
-            )
+        # The reactions of the time points, without the exchanges
+        for rid in self._time_matrix.reaction_ids:
+            for i, time in enumerate(self.times[:-1]):
+                id_t0 = f"{rid}_{time}"
+                id_t1 = f"{rid}_{self.times[i+1]}"
+
+                udc = self._model.createUserDefinedConstraint(
+                    "R_constraint_pos" + id_t0,
+                    numpy.NINF,
+                    epsilon,
+                    components=[
+                        (1, id_t0, "linear"),
+                        (-1, id_t1, "linear"),
+                    ],
+                )
 
-            if reaction is not None and (not reaction.is_exchange):
-                for i, time in enumerate(self.times[:-1]):
-                    id_t0 = f"{rid}_{time}"
-                    id_t1 = f"{rid}_{self.times[i+1]}"
-
-                    udc = self.model.createUserDefinedConstraint(
-                        "R_constraint_pos" + id_t0,
-                        numpy.NINF,
-                        epsilon,
-                        components=[
-                            (1, id_t0, "linear"),
-                            (-1, id_t1, "linear"),
-                        ],
-                    )
-
-                    self.model.addUserDefinedConstraint(udc)
-
-                    udc = self.model.createUserDefinedConstraint(
-                        "R_constraint_neg" + id_t0,
-                        -epsilon,
-                        numpy.Inf,
-                        components=[
-                            (1, id_t0, "linear"),
-                            (-1, id_t1, "linear"),
-                        ],
-                    )
-
-                    self.model.addUserDefinedConstraint(udc)
+                self._model.addUserDefinedConstraint(udc)
+
+                udc = self._model.createUserDefinedConstraint(
+                    "R_constraint_neg" + id_t0,
+                    -epsilon,
+                    numpy.Inf,
+                    components=[
+                        (1, id_t0, "linear"),
+                        (-1, id_t1, "linear"),
+                    ],
+                )
+
+                self._model.addUserDefinedConstraint(udc)
 
     # TODO fix this
     def mm_approximation(self, rid: str):
@@ -585,7 +935,7 @@ class EndPointFBA(DynamicModelBase):
             linking_reaction_id = f"{sid}_{self.times[i]}_{self.times[i+1]}"
             t_rid = rid + "_" + self.times[i + 1]
 
-            udc = self.model.createUserDefinedConstraint(
+            udc = self._model.createUserDefinedConstraint(
                 f"mm_low_{t_rid}",
                 0.0,
                 numpy.Inf,
@@ -599,9 +949,9 @@ class EndPointFBA(DynamicModelBase):
                 ],
             )
 
-            self.model.addUserDefinedConstraint(udc)
+            self._model.addUserDefinedConstraint(udc)
 
-            udc = self.model.createUserDefinedConstraint(
+            udc = self._model.createUserDefinedConstraint(
                 f"mm_high_{t_rid}",
                 numpy.NINF,
                 0.0,
@@ -615,7 +965,7 @@ class EndPointFBA(DynamicModelBase):
                 ],
             )
 
-            self.model.addUserDefinedConstraint(udc)
+            self._model.addUserDefinedConstraint(udc)
 
     def balanced_growth(self, Xin: float, Xm: float) -> None:
         """Set balanced growth constraint
@@ -627,20 +977,25 @@ class EndPointFBA(DynamicModelBase):
         # There is no initial X_c, so subtract the initial biomass from the
         # final biomass
         community_flux = Xm - Xin
-        self.model.setReactionBounds("X_comm", community_flux, community_flux)
+        self._model.setReactionBounds("X_comm", community_flux, community_flux)
+        self._balanced_growth = {"Xin": Xin, "Xm": Xm}
 
         additional_components = []
-        for mid, _ in self.model.get_model_biomass_ids().items():
-            self.model.setReactionBounds(f"BM_{mid}_exchange", numpy.NINF, 0.0)
+        for mid, _ in self._model.get_model_biomass_ids().items():
+            self._model.setReactionBounds(
+                f"BM_{mid}_exchange", numpy.NINF, 0.0
+            )
 
-        for mid, _ in self.model.get_model_biomass_ids().items():
-            self.model.createReaction(
+        for mid, _ in self._model.get_model_biomass_ids().items():
+            self._model.createReaction(
                 f"Phi_{mid}",
                 f"Phi, fraction of {mid}",
                 create_default_bounds=False,
             )
+            # Same bounds as the solver uses for a variable without bounds
+            self._model.setReactionBounds(f"Phi_{mid}", 0.0, numpy.inf)
             additional_components.append((1.0, f"Phi_{mid}", "linear"))
-            udc = self.model.createUserDefinedConstraint(
+            udc = self._model.createUserDefinedConstraint(
                 f"biomass_fraction_{mid}_{self.times[0]}",
                 0.0,
                 0.0,
@@ -650,9 +1005,9 @@ class EndPointFBA(DynamicModelBase):
                 ],
             )
 
-            self.model.addUserDefinedConstraint(udc)
+            self._model.addUserDefinedConstraint(udc)
 
-            udc = self.model.createUserDefinedConstraint(
+            udc = self._model.createUserDefinedConstraint(
                 f"biomass_fraction_{mid}_{self.times[-1]}",
                 0.0,
                 0.0,
@@ -662,13 +1017,74 @@ class EndPointFBA(DynamicModelBase):
                 ],
             )
 
-            self.model.addUserDefinedConstraint(udc)
+            self._model.addUserDefinedConstraint(udc)
 
-        udc = self.model.createUserDefinedConstraint(
+        udc = self._model.createUserDefinedConstraint(
             "Phi_add_to_one", 1.0, 1.0, components=additional_components
         )
 
-        self.model.addUserDefinedConstraint(udc)
+        self._model.addUserDefinedConstraint(udc)
+
+    def set_balanced_growth_target(self, Xm: float) -> None:
+        """Change the total community biomass at the final time point of the
+        balanced growth constraints, without creating new constraints.
+
+        With ``simulate(warm_start=True)`` the next simulation only changes
+        the bound of X_comm and the coefficients of the Phi fractions in the
+        solver and starts from the previous optimal basis.
+
+        Args:
+            Xm (float): Total community biomass at the final time point
+
+        Raises:
+            ValueError: If balanced_growth was not called first.
+        """
+        if not self._balanced_growth:
+            raise ValueError("Call balanced_growth before changing its target")
+
+        community_flux = Xm - self._balanced_growth["Xin"]
+        self._model.setReactionBounds("X_comm", community_flux, community_flux)
+
+        mids = self._model.get_model_biomass_ids().keys()
+        final_ids = {
+            f"biomass_fraction_{mid}_{self.times[-1]}" for mid in mids
+        }
+        for udc in self._model.user_defined_constraints:
+            if udc.getId() not in final_ids:
+                continue
+            for component in udc.getConstraintComponents():
+                if component.getVariable().startswith("Phi_"):
+                    component.setCoefficient(-1.0 * Xm)
+                    if self._session is not None:
+                        self._session.set_coefficient(
+                            udc.getId(), component.getVariable(), -1.0 * Xm
+                        )
+
+        self._balanced_growth["Xm"] = Xm
+
+    def set_biomass_fractions(
+        self, fractions: dict[str, float] = None
+    ) -> None:
+        """Fix the fractions Phi of the organisms in the balanced growth
+        constraints, or let the solver choose them again.
+
+        Args:
+            fractions (dict[str, float], optional): Model id followed by the
+                fraction of the community biomass of that organism.
+                Defaults to None, free fractions.
+
+        Raises:
+            ValueError: If balanced_growth was not called first.
+        """
+        if not self._balanced_growth:
+            raise ValueError("Call balanced_growth before setting fractions")
+
+        for mid in self._model.get_model_biomass_ids().keys():
+            if fractions is None:
+                self._model.setReactionBounds(f"Phi_{mid}", 0.0, numpy.inf)
+            else:
+                value = fractions[mid]
+                self._model.setReactionBounds(f"Phi_{mid}", value, value)
 
     # TODO In construction
     def remove_balanced_growth_constraints(self, initial_biomasses={}):
@@ -681,15 +1097,15 @@ class EndPointFBA(DynamicModelBase):
         print("WARNING, not ready")
         if initial_biomasses:
             for mid, value in initial_biomasses.items():
-                self.model.setReactionBounds(
+                self._model.setReactionBounds(
                     f"BM_{mid}_exchange", -value, -value
                 )
-        for mid, _ in self.model.get_model_biomass_ids().items():
-            self.model.deleteReactionAndBounds(f"Phi_{mid}")
-            self.model.__popGlobalId__(
+        for mid, _ in self._model.get_model_biomass_ids().items():
+            self._model.deleteReactionAndBounds(f"Phi_{mid}")
+            self._model.__popGlobalId__(
                 f"biomass_fraction_{mid}_{self.times[0]}"
             )
-            self.model.__popGlobalId__(
+            self._model.__popGlobalId__(
                 f"biomass_fraction_{mid}_{self.times[-1]}"
             )
 
@@ -704,36 +1120,34 @@ class EndPointFBA(DynamicModelBase):
             epsilon (float, optional): How much the solution can differ from
                 the final amount of biomass. Defaults to 0.01.
         """
-        obj = self.model.getActiveObjective()
+        obj = self._model.getActiveObjective()
         obj.setOperation("minimize")
         obj.deleteAllFluxObjectives()
         QP = []
 
-        for i, tid in enumerate(self.times[:-1]):
-            rids = self.model.getReactionIds(tid)
+        # R_ are all the original reactions, the time matrix does not
+        # contain the exchange reactions
+        rids = [
+            r for r in self._time_matrix.reaction_ids if r.startswith("R_")
+        ]
+        for i, _ in enumerate(self.times[:-1]):
             for rid in rids:
-                reaction = self.model.getReaction(rid)
-
-                # R_ are all the original reqactions
-                # We dont want the exchange reactions
-                if rid.startswith("R_") and not reaction.is_exchange:
-                    rid = re.match(r"(.*?)_(time\d*)", rid).group(1)
-                    rid_t_t1 = f"{rid}_{self.times[i+1]}"
-                    rid_t_t0 = f"{rid}_{self.times[i]}"
+                rid_t_t1 = f"{rid}_{self.times[i+1]}"
+                rid_t_t0 = f"{rid}_{self.times[i]}"
 
-                    if i == 0:
-                        QP.append([1.0 * 2, rid_t_t0, rid_t_t0, str(i)])
-                    else:
-                        QP.append([2.0 * 2, rid_t_t0, rid_t_t0, str(i)])
-                    if i == len(self.times[:-1]) - 1:
-                        QP.append([1.0 * 2, rid_t_t1, rid_t_t1, str(i)])
+                if i == 0:
+                    QP.append([1.0 * 2, rid_t_t0, rid_t_t0, str(i)])
+                else:
+                    QP.append([2.0 * 2, rid_t_t0, rid_t_t0, str(i)])
+                if i == len(self.times[:-1]) - 1:
+                    QP.append([1.0 * 2, rid_t_t1, rid_t_t1, str(i)])
 
-                    QP.append([-2.0, rid_t_t0, rid_t_t1, str(i)])
+                QP.append([-2.0, rid_t_t0, rid_t_t1, str(i)])
 
         obj.createQuadraticFluxObjectives(QP)
 
-        self.model.getReaction("X_comm").setLowerBound(solution - epsilon)
-        self.model.getReaction("X_comm").setUpperBound(solution + epsilon)
+        self._model.getReaction("X_comm").setLowerBound(solution - epsilon)
+        self._model.getReaction("X_comm").setUpperBound(solution + epsilon)
 
     def set_subset_qp(
         self, solution: float, reactions: list[str], epsilon=0.0
@@ -747,13 +1161,13 @@ class EndPointFBA(DynamicModelBase):
             epsilon (float, optional): How much the solution can differ from
                 the final amount of biomass. Defaults to 0.01.
         """
-        obj = self.model.getActiveObjective()
+        obj = self._model.getActiveObjective()
         obj.setOperation("minimize")
         obj.deleteAllFluxObjectives()
         QP = []
         all_reactions = [
             f"{r}_{mid}"
-            for mid in self.model.get_model_ids()
+            for mid in self._model.get_model_ids()
             for r in reactions
         ]
 
@@ -773,5 +1187,29 @@ class EndPointFBA(DynamicModelBase):
 
         obj.createQuadraticFluxObjectives(QP)
 
-        self.model.getReaction("X_comm").setLowerBound(solution - epsilon)
-        self.model.getReaction("X_comm").setUpperBound(solution + epsilon)
+        self._model.getReaction("X_comm").setLowerBound(solution - epsilon)
+        self._model.getReaction("X_comm").setUpperBound(solution + epsilon)
+
+
+def _available_memory() -> int:
+    """The available physical memory in bytes, None if it is unknown.
+
+    MemAvailable of the kernel also counts the page cache that can be
+    reclaimed, the free pages reported by sysconf are used if it is missing.
+    """
+    try:
+        with open("/proc/meminfo") as file:
+            for line in file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _mib(size: int) -> str:
+    return f"{size / 1024**2:.2f} MiB"
@@ -11,3 +11,8 @@ class NoLimitingSubstrateFound(Exception):
 class SpeciesNotFound(Exception):
     def __init__(self, message):
         super().__init__(message)
+
+
+class MatrixTooLarge(Exception):
+    def __init__(self, message):
+        super().__init__(message)
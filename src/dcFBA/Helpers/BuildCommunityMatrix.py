@@ -2,8 +2,8 @@
 """
 
 from cbmpy.CBModel import (
+    FluxBound,
     Model,
-    Gene,
     GeneProteinAssociation,
     Compartment,
     Reaction,
@@ -80,8 +80,8 @@ def combine_models(
         new_id = new_ids[i]
         merge_genes(model, combined_model, new_id)
         merge_compartments(model, combined_model, new_id)
-        merge_species(duplicate_species, model, new_id)
-        merge_reactions(model, combined_model, new_id)
+        species_ids = map_species(duplicate_species, model, new_id)
+        merge_reactions(model, combined_model, new_id, species_ids)
         setGeneProteinAssociations(model, combined_model, new_id)
 
     if len(objective_function) > 0:
@@ -127,8 +127,7 @@ def merge_genes(model: Model, combined_model: Model, new_id: str) -> None:
         combined_model (Model): The new model
         new_id (str): Gene suffix to be used for the new model
     """
-    for gid in model.getGeneIds():
-        gene: Gene = model.getGene(gid)
+    for gene in model.genes:
         new_gene = gene.clone()
         new_gene.setId(create_new_id(gene.id, new_id))
         combined_model.addGene(new_gene)
@@ -138,7 +137,8 @@ def setGeneProteinAssociations(
     model: Model, combined_model: Model, new_id: str
 ) -> None:
     """Copy the gene protein associations from the sub models
-    to the combined model
+    to the combined model. The association trees are copied with the new
+    gene ids, instead of being parsed again for every gene.
 
     Args:
         model (Model): sub-model from which the gene protein associations are copied
@@ -151,28 +151,56 @@ def setGeneProteinAssociations(
         Exception: If the gene was not found in the combined model
             throw an error
     """
-    new_dict_ids = {
-        create_new_id(rid, new_id): list(
-            map(lambda gid: create_new_id(gid, new_id), gene_id)
-        )
-        for rid, gene_id in model.getAllGeneProteinAssociations().items()
-    }
+    reaction_ids = set(combined_model.getReactionIds())
+    gene_ids = set(combined_model.getGeneIds())
+    associations: dict[str, GeneProteinAssociation] = {}
 
-    for rid, gls in new_dict_ids.items():
-        if rid in combined_model.getReactionIds():
-            gid = "{}_assoc".format(rid)
-            gpr = GeneProteinAssociation(gid, rid)
-            combined_model.addGPRAssociation(gpr)
-            for gene_id in gls:
-                if gene_id in combined_model.getGeneIds():
-                    gpr.createAssociationAndGeneRefsFromString(gene_id)
-                else:
-                    raise Exception(
-                        "something went wrong with setting the gene_id in the model"
-                    )
-        else:
+    for source in model.gpr:
+        rid = create_new_id(source.protein, new_id)
+        if rid not in reaction_ids:
             raise Exception("Reaction not recognized")
 
+        genes = {gid: create_new_id(gid, new_id) for gid in source.generefs}
+        if any(gid not in gene_ids for gid in genes.values()):
+            raise Exception(
+                "something went wrong with setting the gene_id in the model"
+            )
+
+        if rid not in associations:
+            gpr = GeneProteinAssociation("{}_assoc".format(rid), rid)
+            combined_model.addGPRAssociation(gpr, update_idx=False)
+            associations[rid] = gpr
+            if source.getTree() is not None:
+                gpr.setTree(rename_gpr_tree(source.getTree(), genes))
+                gpr.buildEvalFunc()
+
+        for gid in genes.values():
+            associations[rid].addGeneref(gid)
+
+    combined_model.__updateGeneIdx__()
+
+
+def rename_gpr_tree(tree: dict, gene_ids: dict[str, str]) -> dict:
+    """Copy a CBMPy gene protein association tree with new gene ids
+
+    Args:
+        tree (dict): The association tree, the keys of the "and" and "or"
+            nodes start with _AND_ and _OR_, a gene is a key with its own id
+            as value.
+        gene_ids (dict[str, str]): Old gene id followed by the new gene id
+
+    Returns:
+        dict: The new association tree
+    """
+    new_tree = {}
+    for key, value in tree.items():
+        if key.startswith("_AND_") or key.startswith("_OR_"):
+            new_tree[key] = rename_gpr_tree(value, gene_ids)
+        else:
+            gid = gene_ids.get(key, key)
+            new_tree[gid] = gid
+    return new_tree
+
 
 def merge_compartments(model: Model, combined_model: Model, new_id: str):
     """
@@ -198,23 +226,35 @@ def merge_compartments(model: Model, combined_model: Model, new_id: str):
             )
 
 
-def merge_reactions(model: Model, combined_model: Model, new_id: str) -> None:
+def merge_reactions(
+    model: Model,
+    combined_model: Model,
+    new_id: str,
+    species_ids: dict[str, tuple[str, str]] = None,
+) -> None:
     """
     Merge reactions from a model into the combined model.
 
     Args:
         model (Model): The source CBModel.
         combined_model (Model): The combined CBModel.
+        new_id (str): The suffix of the reaction ids
+        species_ids (dict[str, tuple[str, str]], optional): New id and
+            compartment of the species, see map_species. Defaults to None,
+            the species were already renamed by merge_species.
 
     Returns:
         None
 
     """
 
-    exchange_reactions = model.getExchangeReactionIds()
-    for reaction_id in model.getReactionIds():
+    exchange_reactions = set(model.getExchangeReactionIds())
+    combined_exchanges = set(combined_model.getExchangeReactionIds())
+    reaction_ids: dict[str, str] = {}
+
+    for reaction in model.reactions:
+        reaction_id = reaction.getId()
         is_exchange_reaction: bool = False
-        reaction: Reaction = model.getReaction(reaction_id)
 
         if (
             reaction_id.startswith("R_EX")
@@ -224,24 +264,50 @@ def merge_reactions(model: Model, combined_model: Model, new_id: str) -> None:
             is_exchange_reaction = True
 
         # if it is an exchange reaction and it is not yet in the model add it
-        if (
-            is_exchange_reaction
-            and reaction_id not in combined_model.getExchangeReactionIds()
-        ):
-            copy_reaction(
-                model,
-                combined_model,
-                reaction.id,
-            )
+        if is_exchange_reaction and reaction_id not in combined_exchanges:
+            reaction_ids[reaction_id] = None
+            combined_exchanges.add(reaction_id)
         # Otherwise add the reaction and add the identifier, we give all
         # reactions a new identifier for consistency
         elif not is_exchange_reaction:
-            copy_reaction(
-                model,
-                combined_model,
-                reaction.id,
-                altrid=create_new_id(reaction_id, new_id),
-            )
+            reaction_ids[reaction_id] = create_new_id(reaction_id, new_id)
+
+    copy_reactions(model, combined_model, reaction_ids, species_ids)
+
+
+def map_species(
+    duplicate_species: dict[str, int], model: Model, new_id: str
+) -> dict[str, tuple[str, str]]:
+    """
+    Create the new ids and compartments of the species of a model, following
+    the rules of merge_species. Unlike merge_species the model is not
+    modified, the ids are applied by copy_reactions when the species and
+    reagents are copied to the combined model.
+
+    Args:
+        duplicate_species (dict[str, int]): The species that occur in more
+            than one model, see create_duplicate_species_dict.
+        model (Model): The source CBModel.
+        new_id (str): The suffix of the model.
+
+    Returns:
+        dict[str, tuple[str, str]]: Species id followed by its new id and
+            compartment, extracellular species are not renamed
+    """
+    species_ids = {}
+    for species in model.species:
+        if species.compartment in extracellular_compartments:
+            continue
+
+        sid = species.getId()
+        if sid in duplicate_species:
+            sid = create_new_id(sid, new_id)
+        species_ids[species.getId()] = (
+            sid,
+            create_new_id(species.compartment, new_id),
+        )
+
+    return species_ids
 
 
 def merge_species(
@@ -259,6 +325,9 @@ def merge_species(
     3) If the species of a model is not a duplicate we still change its
     compartment for clarity. Now the user know where the species is located
 
+    This renames the species in the model itself, map_species creates the
+    same ids without modifying the model.
+
     Args:
         models (list[Model]): The list of the models that need to be in the
                               combined model
@@ -399,6 +468,113 @@ def copy_reaction(m_src: Model, m_targ: Model, rid, altrid=None):
     return out
 
 
+def copy_reactions(
+    m_src: Model,
+    m_targ: Model,
+    reaction_ids: dict[str, str],
+    species_ids: dict[str, tuple[str, str]] = None,
+) -> None:
+    """
+    Copy many reactions from a source model to a target model, see
+    copy_reaction. The ids of the target are collected once in sets and the
+    bounds are created directly, so copying a model is linear in its size
+    instead of quadratic.
+
+    Args:
+        m_src (Model): The source model.
+        m_targ (Model): The target model.
+        reaction_ids (dict[str, str]): Reaction id in the source model
+            followed by its id in the target model, or None to keep the id.
+        species_ids (dict[str, tuple[str, str]], optional): Species id in
+            the source model followed by its id and compartment in the
+            target model, see map_species. Only the copies are renamed.
+            Defaults to None, keep the ids.
+    """
+    if species_ids is None:
+        species_ids = {}
+
+    target_reactions = set(m_targ.getReactionIds())
+    target_species = set(m_targ.getSpeciesIds())
+    bounds = get_reaction_bounds(m_src)
+    existing_bounds = {
+        f"{fb.getReactionId()}_{fb.getType()}" for fb in m_targ.flux_bounds
+    }
+
+    for rid, altrid in reaction_ids.items():
+        old_reaction: Reaction = m_src.getReaction(rid)
+        if old_reaction is None:
+            print(f'ERROR: reaction with id "{rid}" does not exist in source')
+            continue
+
+        new_rid = rid if altrid is None else altrid
+        if new_rid in target_reactions:
+            print(f'ERROR: reaction with id "{new_rid}" already exists')
+            continue
+
+        R: Reaction = old_reaction.clone()
+        if altrid is not None:
+            R.setId(altrid)
+
+        for re in R.reagents:
+            sid = re.getSpecies()
+            new_sid, compartment = species_ids.get(sid, (sid, None))
+            if new_sid not in target_species:
+                species: Species = m_src.getSpecies(sid).clone()
+                if compartment is not None:
+                    species.setId(new_sid)
+                    species.setCompartmentId(compartment)
+                m_targ.addSpecies(species)
+                target_species.add(new_sid)
+
+            if new_sid != sid:
+                re.setSpecies(new_sid)
+            if altrid is not None or new_sid != sid:
+                re.setId("{}_{}".format(new_rid, new_sid))
+
+        if R.getId().startswith("R_EX") or R.getSBOterm() == "SBO:0000627":
+            R.is_exchange = True
+
+        m_targ.addReaction(R, create_default_bounds=False, silent=True)
+        target_reactions.add(new_rid)
+
+        lower, upper = bounds.get(rid, (None, None))
+        for bound, operation, value in [
+            ("lower", "greaterEqual", lower),
+            ("upper", "lessEqual", upper),
+        ]:
+            m_targ.addFluxBound(
+                FluxBound(f"{new_rid}_{bound}_bnd", new_rid, operation, value),
+                fbexists=existing_bounds,
+            )
+
+
+def get_reaction_bounds(model: Model) -> dict[str, tuple[float, float]]:
+    """
+    Read the lower and upper bound of every reaction in a single pass over
+    the flux bounds. An equality bound is used as both the lower and upper
+    bound, like Reaction.getLowerBound and Reaction.getUpperBound do.
+
+    Args:
+        model (Model): The CBModel.
+
+    Returns:
+        dict[str, tuple[float, float]]: Reaction id followed by its lower
+            and upper bound, None if a bound does not exist
+    """
+    values: dict[tuple[str, str], float] = {}
+    for fb in model.flux_bounds:
+        values.setdefault((fb.getReactionId(), fb.is_bound), fb.getValue())
+
+    bounds = {}
+    for rid, _ in values.keys():
+        equality = values.get((rid, "equality"))
+        bounds[rid] = (
+            values.get((rid, "lower"), equality),
+            values.get((rid, "upper"), equality),
+        )
+    return bounds
+
+
 def create_new_id(old_id: str, new_id: str) -> str:
     """
     Function to build new id strings for models
@@ -3,11 +3,12 @@ For further information see DynamicModels.EndPointFBA
 """
 import numpy
 import re
+import scipy.sparse
+from cbmpy.CBCommon import StructMatrixLP
 from cbmpy.CBModel import (
     Model,
     Compartment,
     Reaction,
-    Reagent,
     Species,
     FluxBound,
 )
@@ -17,25 +18,48 @@ from ..Models.CommunityModel import CommunityModel
 import weakref
 
 
-def build_time_model(cm: CommunityModel, times: list[str]) -> CommunityModel:
+def time_ids(n: int, width: int) -> list[str]:
+    """
+    Create the ids of n time points, numbered with the same width.
+
+    Args:
+        n (int): Number of time points.
+        width (int): Number of digits of each time point.
+
+    Returns:
+        list[str]: The time ids, time0, time1, ... or time00, time01, ...
+    """
+    return [f"time{i:0{width}d}" for i in range(n)]
+
+
+def build_time_model(
+    cm: CommunityModel,
+    times: list[str],
+    initial_model: CommunityModel = None,
+    time_points: bool = True,
+) -> CommunityModel:
     """
     Build a time-dependent CommunityModel based on the initial CommunityModel.
 
     Args:
-        initial_model (CommunityModel): The initial CommunityModel to be used as a base.
+        cm (CommunityModel): The initial CommunityModel to be used as a base.
         times (list): List of the ids which are used to to identify the
             reactions and species of the different time instances
+        initial_model (CommunityModel, optional): The community model
+            prepared by ``build_initial_model``, which is copied for every
+            time point. Defaults to None, prepare it from cm.
+        time_points (bool, optional): Copy the reactions and species of the
+            initial model for every time point. Without them the model only
+            contains the first and final exchanges, the time points can be
+            added later on with ``add_time_points``. Defaults to True.
 
     Returns:
         CommunityModel: The final time-dependent CommunityModel.
 
     """
-    initial_model: CommunityModel = cm.clone()
+    if initial_model is None:
+        initial_model = build_initial_model(cm)
 
-    # strip the intial model gene protein associations for the EndPointModel
-    # TODO SetUpperBOund for inactive genes!!!
-    initial_model.gpr = None
-    initial_model.genes = None
     final_model = CommunityModel(
         [],
         [],
@@ -51,16 +75,160 @@ def build_time_model(cm: CommunityModel, times: list[str]) -> CommunityModel:
     )
 
     final_model._single_model_ids = list(initial_model.single_model_ids)
-
-    add_biomass_species(initial_model)
+    # Keep the organism index of the initial model, the results of the
+    # time model are requested by the ids of the initial model
+    final_model._reaction_owners = dict(initial_model._reaction_owners)
+    final_model._species_owners = dict(initial_model._species_owners)
 
     set_exchanges(initial_model, final_model, times)
 
-    add_time_points(initial_model, final_model, times)
+    if time_points:
+        add_time_points(initial_model, final_model, times)
 
     return final_model
 
 
+def build_initial_model(cm: CommunityModel) -> CommunityModel:
+    """
+    Create the community model that is copied for every time point: a clone
+    of the community model without genes and with the biomass species.
+
+    Args:
+        cm (CommunityModel): The community model, it is not modified.
+
+    Returns:
+        CommunityModel: The model to pass to ``build_time_model`` and
+            ``extend_time_model``
+    """
+    initial_model: CommunityModel = cm.clone()
+
+    # strip the intial model gene protein associations for the EndPointModel
+    # TODO SetUpperBOund for inactive genes!!!
+    initial_model.gpr = None
+    initial_model.genes = None
+
+    add_biomass_species(initial_model)
+
+    return initial_model
+
+
+def extend_time_model(
+    initial_model: CommunityModel,
+    model: CommunityModel,
+    times: list[str],
+    new_times: list[str],
+    final_reaction_ids: list[str],
+) -> None:
+    """
+    Append time points to a time-dependent model and move the reactions
+    that take from the last time point, e.g. the final exchanges, to the
+    new last time point.
+
+    Args:
+        initial_model (CommunityModel): The model prepared by
+            ``build_initial_model``.
+        model (CommunityModel): The time-dependent model to extend.
+        times (list[str]): The current time points of the model.
+        new_times (list[str]): The time points to append.
+        final_reaction_ids (list[str]): The reactions which use the species
+            of the last time point.
+    """
+    previous = times[-1]
+    for time in new_times:
+        add_time_point(initial_model, model, time)
+        add_time_link(model, previous, time)
+        previous = time
+
+    move_final_time_point(model, times[-1], new_times[-1], final_reaction_ids)
+
+
+def truncate_time_model(
+    model: CommunityModel,
+    times: list[str],
+    n: int,
+    final_reaction_ids: list[str],
+) -> None:
+    """
+    Remove all time points after the first n from a time-dependent model and
+    move the reactions that take from the last time point, e.g. the final
+    exchanges, to the new last time point.
+
+    Args:
+        model (CommunityModel): The time-dependent model to truncate.
+        times (list[str]): The current time points of the model.
+        n (int): The number of time points to keep.
+        final_reaction_ids (list[str]): The reactions which use the species
+            of the last time point.
+    """
+    move_final_time_point(model, times[-1], times[n - 1], final_reaction_ids)
+
+    # The time ids have the same width, so the suffix identifies the time
+    # point of a reaction, species or linking reaction
+    suffixes = tuple(f"_{time}" for time in times[n:])
+    global_ids = model.__global_id__
+
+    def pop(object_id: str) -> None:
+        if object_id in global_ids:
+            model.__popGlobalId__(object_id)
+
+    removed = set()
+    for reaction in model.reactions:
+        if reaction.getId().endswith(suffixes):
+            removed.add(reaction.getId())
+            pop(reaction.getId())
+            for reagent in reaction.reagents:
+                pop(reagent.getId())
+    model.reactions = [r for r in model.reactions if r.getId() not in removed]
+
+    for bound in model.flux_bounds:
+        if bound.getReactionId() in removed:
+            pop(bound.getId())
+    model.flux_bounds = [
+        b for b in model.flux_bounds if b.getReactionId() not in removed
+    ]
+
+    for species in model.species:
+        if species.getId().endswith(suffixes):
+            pop(species.getId())
+    model.species = [
+        s for s in model.species if not s.getId().endswith(suffixes)
+    ]
+
+    compartment_suffixes = tuple(times[n:])
+    for compartment in model.compartments:
+        if compartment.getId().endswith(compartment_suffixes):
+            pop(compartment.getId())
+    model.compartments = [
+        c
+        for c in model.compartments
+        if not c.getId().endswith(compartment_suffixes)
+    ]
+
+
+def move_final_time_point(
+    model: CommunityModel,
+    old_time: str,
+    new_time: str,
+    reaction_ids: list[str],
+) -> None:
+    """
+    Let reactions use the species of another time point instead of those of
+    the old final time point.
+
+    Args:
+        model (CommunityModel): The time-dependent model.
+        old_time (str): The id of the old final time point.
+        new_time (str): The id of the new final time point.
+        reaction_ids (list[str]): The reactions to move.
+    """
+    suffix = f"_{old_time}"
+    for rid in reaction_ids:
+        for reagent in model.getReaction(rid).reagents:
+            sid = reagent.getSpecies()
+            if sid.endswith(suffix):
+                reagent.setSpecies(f"{sid[: -len(suffix)]}_{new_time}")
+
+
 def add_time_points(src_model, target_model, times):
     for i, time in enumerate(times):
         add_time_point(src_model, target_model, time)
@@ -234,8 +402,19 @@ def copy_species_and_reagents(
         None
 
     """
-    for sid in initial_model.getSpeciesIds():
-        species: Species = initial_model.getSpecies(sid)
+    # The reactions and coefficients of each species, read in one pass
+    # instead of searching all reactions for every species
+    reagents: dict[str, dict[str, float]] = {}
+    for reaction in initial_model.reactions:
+        if reaction.is_exchange:
+            continue
+        for reagent in reaction.reagents:
+            reagents.setdefault(reagent.getSpecies(), {}).setdefault(
+                reaction.getId(), reagent.coefficient
+            )
+
+    for species in initial_model.species:
+        sid = species.getId()
         new_id = sid + "_" + time_id
         new_species = species.clone()
         new_species.setId(new_id)
@@ -245,22 +424,16 @@ def copy_species_and_reagents(
 
         final_model.addSpecies(new_species)
 
-        for rid in species.isReagentOf():
-            old_reaction: Reaction = initial_model.getReaction(rid)
-            if not old_reaction.is_exchange:
-                new_reaction: Reaction = final_model.getReaction(
-                    rid + "_" + time_id
-                )
-                reagent: Reagent = old_reaction.getReagentWithSpeciesRef(sid)
-
-                new_reaction.createReagent(
-                    new_species.getId(), reagent.coefficient
-                )
+        for rid, coefficient in reagents.get(sid, {}).items():
+            new_reaction: Reaction = final_model.getReaction(
+                rid + "_" + time_id
+            )
+            new_reaction.createReagent(new_species.getId(), coefficient)
 
 
 def add_time_link(model: CommunityModel, time0, time1):
     for sid in model.getSpeciesIds():
-        if "final" not in sid:
+        if "final" not in sid and sid.endswith(f"_{time0}"):
             old_id = re.match(r"(.*?)_time\d+", sid).group(1)
 
             species: Species = model.getSpecies(sid)
@@ -314,3 +487,602 @@ def add_final_exchange(
 
     final_exchange.createReagent(f"{old_id}_{time_id}", -1)
     final_exchange.is_exchange = True
+
+
+class TimeMatrix:
+    """The stoichiometric matrix of the time expanded model, assembled
+    directly from the stoichiometry of the community model.
+
+    The matrix consists of one copy of the community stoichiometry for each
+    time point on the block diagonal, the exchange columns of the first and
+    last time point and the columns linking the external species of two
+    consecutive time points. The row and column ids and the bounds of the
+    columns are the same as those of the species and reactions created by
+    ``build_time_model``.
+
+    Attributes:
+        array (scipy.sparse.csr_matrix): The time expanded stoichiometry.
+        row_ids (list[str]): The species id of each row.
+        col_ids (list[str]): The reaction id of each column.
+        row_index (dict[str, int]): Row of each species id.
+        col_index (dict[str, int]): Column of each reaction id.
+        reaction_ids (list[str]): The community model id of the reactions
+            on the block diagonal, the first n * len(reaction_ids) columns
+            are these reactions for each time point in turn.
+        exchanges (list[tuple[str, str]]): The exchange reaction id and
+            species id of each exchange, each is followed by its final
+            exchange in the next 2 * len(exchanges) columns.
+        linked_ids (list[str]): The community model id of the linked
+            species, the last (n - 1) * len(linked_ids) columns are the
+            links of these species between each pair of time points.
+        lower (numpy.ndarray): The lower bound of each column.
+        upper (numpy.ndarray): The upper bound of each column.
+    """
+
+    def __init__(
+        self,
+        array: scipy.sparse.csr_matrix,
+        row_ids: list[str],
+        col_ids: list[str],
+        reaction_ids: list[str] = [],
+        exchanges: list[tuple[str, str]] = [],
+        linked_ids: list[str] = [],
+        lower: numpy.ndarray = None,
+        upper: numpy.ndarray = None,
+    ) -> None:
+        self.array = array
+        self.row_ids = row_ids
+        self.col_ids = col_ids
+        self.row_index = {sid: i for i, sid in enumerate(row_ids)}
+        self.col_index = {rid: i for i, rid in enumerate(col_ids)}
+        self.reaction_ids = reaction_ids
+        self.exchanges = exchanges
+        self.linked_ids = linked_ids
+        self.lower = (
+            numpy.full(len(col_ids), -numpy.inf) if lower is None else lower
+        )
+        self.upper = (
+            numpy.full(len(col_ids), numpy.inf) if upper is None else upper
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.array.shape
+
+    def lp_ids(
+        self, model: Model, time_points: bool = False
+    ) -> tuple[list[str], list[str]]:
+        """Return the species and reaction ids of the rows and columns of the
+        stoichiometric matrix of a model.
+
+        For a model built by ``build_time_model`` without time points these
+        are the species and reactions of the model followed by the rows and
+        columns of the time matrix that are not part of the model. For a
+        model with time points these are the ids of the model, reactions
+        deleted from the model are left out.
+
+        Args:
+            model (Model): The time-dependent model.
+            time_points (bool, optional): The model contains the reactions
+                and species of the time points. Defaults to False.
+
+        Returns:
+            tuple[list[str], list[str]]: The row and column ids
+        """
+        sids = [s.getId() for s in model.species if not s.is_boundary]
+        rids = model.getReactionIds()
+        if time_points:
+            return sids, rids
+
+        species, reactions = set(sids), set(rids)
+        sids += [sid for sid in self.row_ids if sid not in species]
+        rids += [rid for rid in self.col_ids if rid not in reactions]
+        return sids, rids
+
+    def struct_matrix(
+        self, model: Model, sparse: bool = True, time_points: bool = False
+    ) -> StructMatrixLP:
+        """Return the stoichiometric matrix in the species and reaction order
+        of the model, as cbmpy's ``buildStoichMatrix`` would create it. The
+        rows and columns are given by ``lp_ids``.
+
+        For a model without time points the columns of the time points are
+        taken from the time matrix and the other reactions, e.g. the
+        objective or reactions added later on, are read from the model. The
+        stoichiometry of a model with time points is read from its reactions,
+        so changes to these reactions are part of the matrix.
+
+        Args:
+            model (Model): The time-dependent model.
+            sparse (bool, optional): Return a SciPy csr matrix instead of a
+                dense NumPy array. Defaults to True.
+            time_points (bool, optional): The model contains the reactions
+                and species of the time points. Defaults to False.
+
+        Returns:
+            StructMatrixLP: The matrix which can be set as ``model.N``
+        """
+        sids, rids = self.lp_ids(model, time_points)
+        model_rows = {sid: i for i, sid in enumerate(sids)}
+        model_cols = {rid: i for i, rid in enumerate(rids)}
+
+        rows, cols, data = [], [], []
+        if not time_points:
+            row_map = numpy.array(
+                [model_rows.get(sid, -1) for sid in self.row_ids], dtype=int
+            )
+            col_map = numpy.array(
+                [model_cols.get(rid, -1) for rid in self.col_ids], dtype=int
+            )
+
+            coo = self.array.tocoo()
+            block_rows = row_map[coo.row]
+            block_cols = col_map[coo.col]
+            keep = (block_rows >= 0) & (block_cols >= 0)
+            rows.append(block_rows[keep])
+            cols.append(block_cols[keep])
+            data.append(coo.data[keep])
+
+        extra_rows, extra_cols, extra_data = [], [], []
+        for reaction in model.reactions:
+            rid = reaction.getId()
+            if not time_points and rid in self.col_index:
+                continue
+            for coefficient, sid in reaction.getStoichiometry():
+                if sid in model_rows:
+                    extra_rows.append(model_rows[sid])
+                    extra_cols.append(model_cols[rid])
+                    extra_data.append(coefficient)
+        rows.append(numpy.array(extra_rows, dtype=int))
+        cols.append(numpy.array(extra_cols, dtype=int))
+        data.append(numpy.array(extra_data, dtype=float))
+
+        N = scipy.sparse.csr_matrix(
+            (
+                numpy.concatenate(data),
+                (numpy.concatenate(rows), numpy.concatenate(cols)),
+            ),
+            shape=(len(sids), len(rids)),
+            dtype="d",
+        )
+        N.eliminate_zeros()
+        if not sparse:
+            N = N.toarray()
+
+        return StructMatrixLP(
+            N,
+            list(range(len(sids))),
+            list(range(len(rids))),
+            row=sids,
+            col=rids,
+            rhs=numpy.zeros(len(sids)),
+        )
+
+
+def build_time_matrix(cm: CommunityModel, times: list[str]) -> TimeMatrix:
+    """
+    Assemble the stoichiometric matrix of the time expanded model directly
+    from the community model, without creating the time expanded reactions
+    and species.
+
+    Args:
+        cm (CommunityModel): The community model, it is not modified.
+        times (list[str]): The ids of the time points, see
+            ``build_time_model``
+
+    Returns:
+        TimeMatrix: The time expanded stoichiometric matrix, its ids and the
+            bounds of its columns
+    """
+    # The same species and reactions as add_biomass_species adds to a clone
+    # of the community model, without cloning it
+    biomass_ids = cm.get_model_biomass_ids()
+    species = [s for s in cm.species if not s.is_boundary]
+    sids = [s.getId() for s in species]
+    compartments = [s.getCompartmentId() for s in species]
+    sids += ["BM_c"] + [f"BM_{mid}" for mid in biomass_ids.keys()]
+    compartments += ["e"] * (len(biomass_ids) + 1)
+    species_index = {sid: i for i, sid in enumerate(sids)}
+
+    biomass_species = {rid: f"BM_{mid}" for mid, rid in biomass_ids.items()}
+
+    def stoichiometry(reaction: Reaction) -> list[tuple[float, str]]:
+        reagents = list(reaction.getStoichiometry())
+        if reaction.getId() in biomass_species:
+            biomass = biomass_species[reaction.getId()]
+            reagents += [(1.0, biomass), (1.0, "BM_c")]
+        return reagents
+
+    internal = [r for r in cm.reactions if not r.is_exchange]
+    exchanges = [
+        (r.getId(), r.getSpeciesIds()[0])
+        for r in cm.reactions
+        if r.is_exchange
+    ]
+    exchanges += [(f"BM_{mid}_exchange", f"BM_{mid}") for mid in biomass_ids]
+    exchange_bounds = [
+        _reaction_bounds(r) for r in cm.reactions if r.is_exchange
+    ]
+    exchange_bounds += [(0.0, numpy.inf)] * len(biomass_ids)
+
+    n = len(times)
+    n_species = len(sids)
+    row_ids = [f"{sid}_{time}" for time in times for sid in sids]
+
+    # The community stoichiometry of a single time point, repeated on the
+    # block diagonal for each time point
+    rows, cols, data = [], [], []
+    for j, reaction in enumerate(internal):
+        for coefficient, sid in stoichiometry(reaction):
+            if sid in species_index:
+                rows.append(species_index[sid])
+                cols.append(j)
+                data.append(coefficient)
+    block = scipy.sparse.csr_matrix(
+        (data, (rows, cols)), shape=(n_species, len(internal)), dtype="d"
+    )
+    diagonal = scipy.sparse.kron(scipy.sparse.identity(n), block, format="csr")
+    diagonal_ids = [f"{r.getId()}_{time}" for time in times for r in internal]
+
+    # Exchanges of the first time point, each followed by the final
+    # exchange of the last time point
+    rows, cols, data, exchange_ids = [], [], [], []
+    for exchange_id, sid in exchanges:
+        for offset, rid in [
+            (0, exchange_id),
+            ((n - 1) * n_species, f"{sid}_exchange_final"),
+        ]:
+            if sid in species_index:
+                rows.append(offset + species_index[sid])
+                cols.append(len(exchange_ids))
+                data.append(-1.0)
+            exchange_ids.append(rid)
+    exchange_block = scipy.sparse.csr_matrix(
+        (data, (rows, cols)),
+        shape=(n * n_species, len(exchange_ids)),
+        dtype="d",
+    )
+
+    # Link the external species of consecutive time points
+    external = [
+        i
+        for i, sid in enumerate(sids)
+        if compartments[i] == "e" and "final" not in f"{sid}_{times[0]}"
+    ]
+    rows, cols, data, link_ids = [], [], [], []
+    for t in range(n - 1):
+        for i in external:
+            rows += [t * n_species + i, (t + 1) * n_species + i]
+            cols += [len(link_ids)] * 2
+            data += [-1.0, 1.0]
+            link_ids.append(f"{sids[i]}_{times[t]}_{times[t + 1]}")
+    link_block = scipy.sparse.csr_matrix(
+        (data, (rows, cols)),
+        shape=(n * n_species, len(link_ids)),
+        dtype="d",
+    )
+
+    array = scipy.sparse.hstack(
+        [diagonal, exchange_block, link_block], format="csr"
+    )
+    array.eliminate_zeros()
+
+    # The bounds of the community model for each time point, the final
+    # exchanges and the links only carry species forward
+    bounds = numpy.array(
+        [_reaction_bounds(r) for r in internal] * n
+        + [b for bound in exchange_bounds for b in [bound, (0.0, numpy.inf)]]
+        + [(0.0, numpy.inf)] * len(link_ids),
+        dtype=float,
+    ).reshape(-1, 2)
+
+    return TimeMatrix(
+        array,
+        row_ids,
+        diagonal_ids + exchange_ids + link_ids,
+        [r.getId() for r in internal],
+        exchanges,
+        [sids[i] for i in external],
+        bounds[:, 0],
+        bounds[:, 1],
+    )
+
+
+def _reaction_bounds(reaction: Reaction) -> tuple[float, float]:
+    """The lower and upper bound of a reaction, unbounded if not set."""
+    lb, ub = reaction.getLowerBound(), reaction.getUpperBound()
+    return (
+        -numpy.inf if lb is None else float(lb),
+        numpy.inf if ub is None else float(ub),
+    )
+
+
+class ConstraintBlock:
+    """Linear constraints on the reactions of the time expanded model, stored
+    as a sparse matrix instead of cbmpy user defined constraints.
+
+    Attributes:
+        array (scipy.sparse.csr_matrix): The coefficient of each reaction
+            (column) in each constraint (row).
+        row_ids (list[str]): The id of each constraint.
+        col_ids (list[str]): The reaction id of each column.
+        operators (list[str]): The sense of each constraint, "G", "L" or "E"
+            as used by cbmpy.
+        rhs (numpy.ndarray): The right hand side of each constraint.
+    """
+
+    def __init__(
+        self,
+        array: scipy.sparse.csr_matrix,
+        row_ids: list[str],
+        col_ids: list[str],
+        operators: list[str],
+        rhs: numpy.ndarray,
+    ) -> None:
+        self.array = array
+        self.row_ids = row_ids
+        self.col_ids = col_ids
+        self.operators = operators
+        self.rhs = rhs
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+
+def build_bound_constraints(
+    lower_bounds: dict[str, float],
+    upper_bounds: dict[str, float],
+    model_ids: dict[str, str],
+    times: list[str],
+    dt: float,
+) -> ConstraintBlock:
+    """
+    Create the constraints that scale the bounds of each reaction at each
+    time point with the biomass of its organism at that time point:
+
+        v_r(t) - dt * lb_r * X(t) >= 0
+        v_r(t) - dt * ub_r * X(t) <= 0
+
+    where X(0) is given by the biomass exchange, whose flux is minus the
+    initial biomass, and X(t) by the biomass link reaction between t - 1 and
+    t. The rows are ordered by bound, reaction and time point.
+
+    Args:
+        lower_bounds (dict[str, float]): Reaction id followed by the lower
+            bound to scale.
+        upper_bounds (dict[str, float]): Reaction id followed by the upper
+            bound to scale.
+        model_ids (dict[str, str]): Reaction id followed by the id of the
+            organism the reaction belongs to.
+        times (list[str]): The ids of the time points.
+        dt (float): The size of the time step.
+
+    Returns:
+        ConstraintBlock: The bound constraints, one row per bound, reaction
+            and time point
+    """
+    n = len(times)
+    rids = list(dict.fromkeys(list(lower_bounds) + list(upper_bounds)))
+    mids = list(dict.fromkeys(model_ids[rid] for rid in rids))
+    reaction_column = {rid: i * n for i, rid in enumerate(rids)}
+    biomass_column = {mid: (len(rids) + i) * n for i, mid in enumerate(mids)}
+
+    col_ids = [f"{rid}_{time}" for rid in rids for time in times]
+    for mid in mids:
+        col_ids.append(f"BM_{mid}_exchange")
+        col_ids += [f"BM_{mid}_{times[t - 1]}_{times[t]}" for t in range(1, n)]
+
+    # At t = 0 the biomass exchange is -X(0), so its coefficient changes sign
+    sign = numpy.full(n, -1.0)
+    sign[0] = 1.0
+    steps = numpy.arange(n)
+
+    rows, cols, data = [], [], []
+    row_ids, operators = [], []
+    for bounds, suffix, operator in [
+        (lower_bounds, "lb", "G"),
+        (upper_bounds, "ub", "L"),
+    ]:
+        for rid, bound in bounds.items():
+            first = len(row_ids)
+            row_ids += [f"{rid}_{time}_{suffix}" for time in times]
+            operators += [operator] * n
+
+            rows += [first + steps, first + steps]
+            cols += [
+                reaction_column[rid] + steps,
+                biomass_column[model_ids[rid]] + steps,
+            ]
+            data += [numpy.ones(n), sign * dt * bound]
+
+    if len(row_ids) == 0:
+        array = scipy.sparse.csr_matrix((0, len(col_ids)), dtype="d")
+    else:
+        array = scipy.sparse.csr_matrix(
+            (
+                numpy.concatenate(data),
+                (numpy.concatenate(rows), numpy.concatenate(cols)),
+            ),
+            shape=(len(row_ids), len(col_ids)),
+            dtype="d",
+        )
+
+    return ConstraintBlock(
+        array, row_ids, col_ids, operators, numpy.zeros(len(row_ids))
+    )
+
+
+def set_reaction_bounds(
+    model: Model, bounds: dict[str, float], bound: str
+) -> None:
+    """Set the same bound of many reactions at once.
+
+    cbmpy searches the list of all flux bounds for each bound it sets, this
+    looks up the flux bounds of the model once.
+
+    Args:
+        model (Model): The model.
+        bounds (dict[str, float]): Reaction id followed by the new value.
+        bound (str): "lower" or "upper".
+    """
+    flux_bounds = {
+        fb.reaction: fb for fb in model.flux_bounds if fb.is_bound == bound
+    }
+    for rid, value in bounds.items():
+        if rid in flux_bounds:
+            flux_bounds[rid].setValue(value)
+        else:
+            model.setReactionBound(rid, value, bound)
+
+
+def estimate_matrix_memory(
+    model: Model,
+    time_matrix: TimeMatrix,
+    blocks: list[ConstraintBlock] = [],
+    sparse: bool = True,
+    time_points: bool = False,
+) -> int:
+    """Estimate the peak memory needed to build the stoichiometric and
+    constraint matrix of a time expanded model with
+    ``TimeMatrix.struct_matrix`` and ``build_constraint_matrix``.
+
+    Both matrices are assembled from coordinate arrays (two int64 indices
+    and a float64 value per non-zero) into a csr matrix (a float64 value
+    and an int32 index per non-zero). A dense matrix is created from the
+    csr matrix and takes 8 bytes per element.
+
+    Args:
+        model (Model): The time-dependent model.
+        time_matrix (TimeMatrix): The time expanded stoichiometry.
+        blocks (list[ConstraintBlock], optional): The constraint blocks
+            passed to ``build_constraint_matrix``. Defaults to [].
+        sparse (bool, optional): Estimate for SciPy sparse matrices instead
+            of dense NumPy arrays. Defaults to True.
+        time_points (bool, optional): The model contains the reactions and
+            species of the time points, see ``TimeMatrix.struct_matrix``.
+            Defaults to False.
+
+    Returns:
+        int: The estimated number of bytes
+    """
+    sids, rids = time_matrix.lp_ids(model, time_points)
+    rows = len(sids)
+    constraint_rows = len(model.user_defined_constraints) + sum(
+        len(block) for block in blocks
+    )
+    columns = len(rids)
+
+    # Reactions that are not part of the time matrix, e.g. the objective
+    extra = sum(
+        len(r.reagents)
+        for r in model.reactions
+        if time_points or r.getId() not in time_matrix.col_index
+    )
+    nnz = extra if time_points else time_matrix.array.nnz + extra
+    nnz += sum(
+        len(c.constraint_components) for c in model.user_defined_constraints
+    )
+    nnz += sum(block.array.nnz for block in blocks)
+
+    memory = 36 * nnz + 4 * (rows + constraint_rows + 2)
+    if not sparse:
+        memory += 8 * (rows + constraint_rows) * columns
+
+    return memory
+
+
+def build_constraint_matrix(
+    model: Model,
+    sparse: bool = True,
+    blocks: list[ConstraintBlock] = [],
+    col_ids: list[str] = None,
+) -> StructMatrixLP:
+    """Assemble the user defined constraints of a model and the constraint
+    blocks into a matrix, as cbmpy's ``buildStoichMatrix`` would for the
+    same constraints, using a dictionary to find the column of each
+    reaction. The constraints are sorted by id.
+
+    Args:
+        model (Model): The model with user defined constraints.
+        sparse (bool, optional): Return a SciPy csr matrix instead of a
+            dense NumPy array. Defaults to True.
+        blocks (list[ConstraintBlock], optional): Constraints that are not
+            part of the model, e.g. the bound constraints of EndPointFBA.
+            Coefficients of reactions that are not a column are left out.
+            Defaults to [].
+        col_ids (list[str], optional): The reaction id of each column, e.g.
+            the columns of ``TimeMatrix.struct_matrix``. Defaults to None,
+            the reactions of the model.
+
+    Returns:
+        StructMatrixLP: The constraint matrix which can be set as
+            ``model.CM``, None if there are no constraints
+    """
+    rids = model.getReactionIds() if col_ids is None else list(col_ids)
+    columns = {rid: i for i, rid in enumerate(rids)}
+
+    crows, operators, rhs = [], [], []
+    rows, cols, data = [], [], []
+
+    if model.user_defined_constraints:
+        constraints = model.copyUserDefinedConstraintsToUserConstraints()
+        for cid in constraints:
+            constraint = constraints[cid]
+            for flux in constraint["fluxes"]:
+                if float(flux[0]) != 0.0:
+                    rows.append(len(crows))
+                    cols.append(columns[flux[1]])
+                    data.append(float(flux[0]))
+            crows.append(cid)
+            operators.append(constraint["operator"])
+            rhs.append(float(constraint["rhs"]))
+
+    rows = [numpy.array(rows, dtype=int)]
+    cols = [numpy.array(cols, dtype=int)]
+    data = [numpy.array(data, dtype=float)]
+    rhs = [numpy.array(rhs, dtype=float)]
+
+    # Reactions deleted from the model have no flux, their coefficients in
+    # the blocks are left out
+    for block in blocks:
+        col_map = numpy.array(
+            [columns.get(rid, -1) for rid in block.col_ids], dtype=int
+        )
+        coo = block.array.tocoo()
+        keep = col_map[coo.col] >= 0
+        rows.append(coo.row[keep] + len(crows))
+        cols.append(col_map[coo.col[keep]])
+        data.append(coo.data[keep])
+        crows += block.row_ids
+        operators += block.operators
+        rhs.append(block.rhs)
+
+    if len(crows) == 0:
+        return None
+
+    # Same row order as cbmpy, which sorts the constraint ids
+    order = sorted(range(len(crows)), key=crows.__getitem__)
+    position = numpy.empty(len(crows), dtype=int)
+    position[order] = numpy.arange(len(crows))
+
+    CM = scipy.sparse.csr_matrix(
+        (
+            numpy.concatenate(data),
+            (position[numpy.concatenate(rows)], numpy.concatenate(cols)),
+        ),
+        shape=(len(crows), len(rids)),
+        dtype="d",
+    )
+    CM.eliminate_zeros()
+    if not sparse:
+        CM = CM.toarray()
+
+    return StructMatrixLP(
+        CM,
+        list(range(len(crows))),
+        list(range(len(rids))),
+        row=[crows[i] for i in order],
+        col=rids,
+        rhs=numpy.concatenate(rhs)[order],
+        operators=[operators[i] for i in order],
+    )
@@ -0,0 +1,396 @@
+"""Compress a community model before it is expanded in time.
+
+EndPointFBA copies every reaction and species of the community model into
+each time point, so removing a reaction from the community model removes n
+columns from the time expanded LP. The compression runs three steps on a
+copy of the community model:
+
+1. Dead end pruning: an intracellular species that can only be produced or
+   only be consumed blocks every reaction it takes part in.
+2. Blocked reaction removal: reactions that can not carry flux in any
+   solution are found with ``scan_unused_reactions``, on the community model
+   of a single time point with all exchange reactions open. Within a time
+   point the bounds of a reaction are scaled by the biomass of its organism,
+   and scaling does not change which reactions can carry flux, so a reaction
+   that is blocked there is blocked at every time point.
+3. Merging of linear chains: an intracellular species that takes part in
+   exactly two reactions couples their fluxes, v2 = k * v1. The second
+   reaction is added to the first with factor k and removed.
+
+The exchange reactions, the biomass reactions and the protected reactions
+are never removed or merged. The compression returns a map from each
+removed or merged reaction to its representative reaction and factor, to
+expand the fluxes of the compressed model back to all reactions.
+"""
+import math
+
+import numpy
+from cbmpy.CBModel import FluxBound, Reaction
+
+from ..Models.CommunityModel import CommunityModel
+from .BuildCommunityMatrix import (
+    extracellular_compartments,
+    get_reaction_bounds,
+)
+from .ReduceModel import scan_unused_reactions
+from .Serialization import dumps_model, loads_model
+
+
+def compress_model(
+    model: CommunityModel,
+    protected: list[str] = [],
+    tolerance: float = 1e-9,
+) -> tuple[CommunityModel, dict[str, tuple[str, float]]]:
+    """Compress a community model, see the module description.
+
+    Args:
+        model (CommunityModel): The community model, it is not modified.
+        protected (list[str], optional): Reactions that are kept as they
+            are, besides the exchange and biomass reactions.
+            Defaults to [].
+        tolerance (float, optional): Flux values with a smaller absolute
+            value are considered zero in the blocked reaction scan.
+            Defaults to 1e-9.
+
+    Returns:
+        tuple[CommunityModel, dict[str, tuple[str, float]]]: The compressed
+            model and for each removed or merged reaction the id of the
+            reaction it is represented by and the factor with which its
+            flux follows from that reaction. Blocked reactions are
+            represented by None with factor 0.
+    """
+    # Unpickling is much faster than cloning a model
+    compressed: CommunityModel = loads_model(dumps_model(model))
+    protected = set(protected) | set(model.single_model_biomass_reaction_ids)
+    protected |= {r.getId() for r in compressed.reactions if r.is_exchange}
+
+    reaction_map: dict[str, tuple[str, float]] = {}
+
+    for find in [find_dead_end_reactions, find_blocked_reactions]:
+        blocked = find(compressed, protected, tolerance)
+        delete_reactions(compressed, blocked)
+        reaction_map.update({rid: (None, 0.0) for rid in blocked})
+
+    reaction_map.update(merge_linear_chains(compressed, protected))
+
+    delete_unused_species(compressed)
+
+    return compressed, reaction_map
+
+
+def find_dead_end_reactions(
+    model: CommunityModel, protected: set[str], tolerance: float = 1e-9
+) -> list[str]:
+    """Find the reactions that take part in an intracellular dead end
+    species, repeating until no new dead ends appear.
+
+    Args:
+        model (CommunityModel): The community model.
+        protected (set[str]): Reactions that are not returned, they do not
+            count as blocked when looking for new dead ends either.
+        tolerance (float, optional): Not used, for the same signature as
+            find_blocked_reactions. Defaults to 1e-9.
+
+    Returns:
+        list[str]: The blocked reactions, in the order of the model
+    """
+    bounds = reaction_bounds(model)
+    blocked: set[str] = set()
+
+    while True:
+        # The reactions that can produce or consume each species
+        producers: dict[str, bool] = {}
+        consumers: dict[str, bool] = {}
+        reactions: dict[str, list[str]] = {}
+        for reaction in model.reactions:
+            rid = reaction.getId()
+            if rid in blocked:
+                continue
+            lb, ub = bounds[rid]
+            for reagent in reaction.reagents:
+                sid = reagent.getSpecies()
+                coefficient = reagent.getCoefficient()
+                forward = ub > 0 if coefficient > 0 else lb < 0
+                backward = lb < 0 if coefficient > 0 else ub > 0
+                producers[sid] = producers.get(sid, False) or forward
+                consumers[sid] = consumers.get(sid, False) or backward
+                reactions.setdefault(sid, []).append(rid)
+
+        new = set()
+        for species in model.species:
+            sid = species.getId()
+            if species.getCompartmentId() in extracellular_compartments:
+                continue
+            if sid not in reactions or (producers[sid] and consumers[sid]):
+                continue
+            new.update(
+                rid
+                for rid in reactions[sid]
+                if rid not in protected and rid not in blocked
+            )
+
+        if len(new) == 0:
+            break
+        blocked |= new
+
+    return [r.getId() for r in model.reactions if r.getId() in blocked]
+
+
+def find_blocked_reactions(
+    model: CommunityModel, protected: set[str], tolerance: float = 1e-9
+) -> list[str]:
+    """Find the reactions that can not carry flux at any time point of the
+    time expanded model, see the module description.
+
+    Args:
+        model (CommunityModel): The community model.
+        protected (set[str]): Reactions that are not scanned.
+        tolerance (float, optional): Flux values with a smaller absolute
+            value are considered zero. Defaults to 1e-9.
+
+    Returns:
+        list[str]: The blocked reactions, in the order of the model
+    """
+    candidates = [
+        r.getId() for r in model.reactions if r.getId() not in protected
+    ]
+    if len(candidates) == 0:
+        return []
+
+    # A single time point with all exchanges open, the biomass reactions
+    # can always produce biomass
+    relaxed: CommunityModel = loads_model(dumps_model(model))
+    exchanges = {r.getId() for r in relaxed.reactions if r.is_exchange}
+    for bound in relaxed.flux_bounds:
+        if bound.getReactionId() not in exchanges:
+            continue
+        if bound.getType() == "lower":
+            bound.setValue(-numpy.inf)
+        elif bound.getType() == "upper":
+            bound.setValue(numpy.inf)
+
+    return scan_unused_reactions(
+        relaxed, {}, tolerance=tolerance, reaction_ids=candidates
+    )
+
+
+def merge_linear_chains(
+    model: CommunityModel, protected: set[str]
+) -> dict[str, tuple[str, float]]:
+    """Merge the pairs of reactions that are coupled by an intracellular
+    species that only takes part in these two reactions.
+
+    If a species has coefficient a in reaction r1 and b in reaction r2, its
+    steady state gives v2 = k * v1 with k = -a / b. Reaction r2 times k is
+    added to r1, which also gets the bounds of r2 divided by k, and r2 is
+    removed from the model.
+
+    Args:
+        model (CommunityModel): The community model, it is changed in place.
+        protected (set[str]): Reactions that are not merged.
+
+    Returns:
+        dict[str, tuple[str, float]]: For each removed reaction the reaction
+            that represents it and the factor of its flux
+    """
+    bounds = reaction_bounds(model)
+    flux_bounds = {
+        (fb.getReactionId(), fb.getType()): fb for fb in model.flux_bounds
+    }
+    reaction_map: dict[str, tuple[str, float]] = {}
+
+    while True:
+        species_reactions: dict[str, list[tuple[Reaction, float]]] = {}
+        for reaction in model.reactions:
+            for reagent in reaction.reagents:
+                species_reactions.setdefault(reagent.getSpecies(), []).append(
+                    (reaction, reagent.getCoefficient())
+                )
+
+        # Merge pairs without common reactions, so every pair is merged
+        # with the current stoichiometry
+        merged: set[str] = set()
+        removed: set[str] = set()
+        for species in model.species:
+            sid = species.getId()
+            pairs = species_reactions.get(sid, [])
+            if (
+                species.getCompartmentId() in extracellular_compartments
+                or len(pairs) != 2
+            ):
+                continue
+
+            (r1, a), (r2, b) = pairs
+            ids = {r1.getId(), r2.getId()}
+            if ids & (protected | merged) or len(ids) != 2:
+                continue
+
+            k = -a / b
+            lb, ub = _merged_bounds(bounds[r1.getId()], bounds[r2.getId()], k)
+            if lb > ub:
+                continue
+
+            _add_reaction(model, r1, r2, k)
+            _set_bounds(model, flux_bounds, r1, lb, ub)
+            bounds[r1.getId()] = (lb, ub)
+
+            rid = r2.getId()
+            reaction_map[rid] = (r1.getId(), k)
+            for original, (representative, factor) in reaction_map.items():
+                if representative == rid:
+                    reaction_map[original] = (r1.getId(), factor * k)
+
+            merged |= ids
+            removed.add(rid)
+
+        if len(removed) == 0:
+            break
+        delete_reactions(model, removed)
+        for key in [key for key in flux_bounds if key[0] in removed]:
+            del flux_bounds[key]
+
+    return reaction_map
+
+
+def _merged_bounds(
+    bounds1: tuple[float, float], bounds2: tuple[float, float], k: float
+) -> tuple[float, float]:
+    """The bounds of v1 given the bounds of v1 and of v2 = k * v1."""
+    lb2, ub2 = bounds2[0] / k, bounds2[1] / k
+    if k < 0:
+        lb2, ub2 = ub2, lb2
+    return max(bounds1[0], lb2), min(bounds1[1], ub2)
+
+
+def _add_reaction(
+    model: CommunityModel, r1: Reaction, r2: Reaction, k: float
+) -> None:
+    """Add k times the stoichiometry of r2 to r1, the species that cancel
+    are removed from r1."""
+    reagents = {reagent.getSpecies(): reagent for reagent in r1.reagents}
+    cancelled = set()
+    for reagent in r2.reagents:
+        sid = reagent.getSpecies()
+        coefficient = k * reagent.getCoefficient()
+        if sid in reagents:
+            coefficient += reagents[sid].getCoefficient()
+            if math.isclose(coefficient, 0.0, abs_tol=1e-12):
+                cancelled.add(sid)
+            else:
+                reagents[sid].setCoefficient(coefficient)
+        else:
+            r1.createReagent(sid, coefficient)
+
+    if len(cancelled) > 0:
+        for reagent in r1.reagents:
+            if reagent.getSpecies() in cancelled:
+                model.__popGlobalId__(reagent.getId())
+        r1.reagents = [
+            r for r in r1.reagents if r.getSpecies() not in cancelled
+        ]
+
+
+def _set_bounds(
+    model: CommunityModel,
+    flux_bounds: dict[tuple[str, str], FluxBound],
+    reaction: Reaction,
+    lb: float,
+    ub: float,
+) -> None:
+    """Set the bounds of a reaction, creating the flux bounds it lacks."""
+    rid = reaction.getId()
+    for bound, operation, value in [
+        ("lower", "greaterEqual", lb),
+        ("upper", "lessEqual", ub),
+    ]:
+        if (rid, bound) in flux_bounds:
+            flux_bounds[(rid, bound)].setValue(value)
+        else:
+            fb = FluxBound(f"{rid}_{bound}_bnd", rid, operation, value)
+            model.addFluxBound(fb, fbexists=set())
+            flux_bounds[(rid, bound)] = fb
+    reaction.reversible = lb < 0
+
+
+def reaction_bounds(model: CommunityModel) -> dict[str, tuple[float, float]]:
+    """The lower and upper bound of every reaction, a missing bound is
+    infinite.
+
+    Args:
+        model (CommunityModel): The community model.
+
+    Returns:
+        dict[str, tuple[float, float]]: Reaction id followed by its bounds
+    """
+    bounds = get_reaction_bounds(model)
+    result = {}
+    for reaction in model.reactions:
+        lb, ub = bounds.get(reaction.getId(), (None, None))
+        result[reaction.getId()] = (
+            -numpy.inf if lb is None else float(lb),
+            numpy.inf if ub is None else float(ub),
+        )
+    return result
+
+
+def delete_reactions(model: CommunityModel, rids) -> None:
+    """Delete reactions, their bounds, reagents and gene associations in a
+    single pass over the model.
+
+    Args:
+        model (CommunityModel): The community model.
+        rids (Iterable[str]): The reactions to delete.
+    """
+    rids = set(rids)
+    if len(rids) == 0:
+        return
+
+    reactions = []
+    for reaction in model.reactions:
+        if reaction.getId() not in rids:
+            reactions.append(reaction)
+            continue
+        model.__popGlobalId__(reaction.getId())
+        for reagent in reaction.reagents:
+            model.__popGlobalId__(reagent.getId())
+            species = model.getSpecies(reagent.getSpecies())
+            if species.reagent_of and reaction.getId() in species.reagent_of:
+                species.reagent_of.remove(reaction.getId())
+    model.reactions = reactions
+
+    flux_bounds = []
+    for bound in model.flux_bounds:
+        if bound.getReactionId() in rids:
+            model.__popGlobalId__(bound.getId())
+        else:
+            flux_bounds.append(bound)
+    model.flux_bounds = flux_bounds
+
+    if model.gpr:
+        gpr = []
+        for association in model.gpr:
+            if association.protein in rids:
+                model.__popGlobalId__(association.getId())
+            else:
+                gpr.append(association)
+        model.gpr = gpr
+
+
+def delete_unused_species(model: CommunityModel) -> None:
+    """Delete the species that are not a reagent of any reaction.
+
+    Args:
+        model (CommunityModel): The community model.
+    """
+    used = {
+        reagent.getSpecies()
+        for reaction in model.reactions
+        for reagent in reaction.reagents
+    }
+    species = []
+    for s in model.species:
+        if s.getId() in used:
+            species.append(s)
+        else:
+            model.__popGlobalId__(s.getId())
+    model.species = species
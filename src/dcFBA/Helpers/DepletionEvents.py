@@ -0,0 +1,178 @@
+"""Exact integration between depletion events of external metabolites.
+
+In the direct (event based) dFBA approach the LP is only solved again when
+the optimal basis can change, i.e. when an external metabolite runs out. As
+long as the basis is the same, all fluxes of an organism are proportional to
+its biomass, so the organism grows exponentially with its specific growth
+rate mu_k and a metabolite concentration follows
+
+    S(t) = S_0 + sum_k c_k (exp(mu_k t) - 1) / mu_k
+
+where c_k is the net exchange flux of organism k for that metabolite at
+t = 0. These functions integrate this system exactly and find the first time
+at which a metabolite that is consumed hits zero.
+"""
+import numpy
+
+DEPLETION_TOLERANCE = 1e-9
+
+
+def growth_integral(mu: numpy.ndarray, h: float) -> numpy.ndarray:
+    """Integral of exp(mu * t) from 0 to h for each growth rate.
+
+    Args:
+        mu (numpy.ndarray): specific growth rates
+        h (float): length of the time interval
+
+    Returns:
+        numpy.ndarray: (exp(mu * h) - 1) / mu, or h where mu is 0
+    """
+    mu = numpy.asarray(mu, dtype=float)
+    small = numpy.abs(mu * h) < 1e-10
+    safe_mu = numpy.where(small, 1.0, mu)
+    return numpy.where(small, h, numpy.expm1(mu * h) / safe_mu)
+
+
+def integrate(
+    S0: numpy.ndarray,
+    X0: numpy.ndarray,
+    C: numpy.ndarray,
+    mu: numpy.ndarray,
+    h: float,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Concentrations and biomasses after a time interval h.
+
+    Args:
+        S0 (numpy.ndarray): metabolite concentrations at t = 0
+        X0 (numpy.ndarray): biomass of each organism at t = 0
+        C (numpy.ndarray): (metabolites x organisms) exchange flux of each
+            organism for each metabolite at t = 0
+        mu (numpy.ndarray): specific growth rate of each organism
+        h (float): length of the time interval
+
+    Returns:
+        tuple[numpy.ndarray, numpy.ndarray]: concentrations and biomasses
+    """
+    S = S0 + C @ growth_integral(mu, h)
+    X = X0 * numpy.exp(mu * h)
+    return S, X
+
+
+def next_depletion(
+    S0: numpy.ndarray,
+    C: numpy.ndarray,
+    mu: numpy.ndarray,
+    h_max: float,
+    atol: float = DEPLETION_TOLERANCE,
+) -> tuple[float, numpy.ndarray]:
+    """Find the first time in (0, h_max] at which a metabolite runs out.
+
+    Metabolites with a concentration below atol are already depleted and
+    are ignored. A metabolite that is only consumed decreases monotonically,
+    one that is consumed by one organism and produced by another can run
+    out inside the step and recover before h_max. The concentration is
+    monotone between the turning points of the exact solution, so the first
+    piece that ends below atol is searched by bisection.
+
+    Args:
+        S0 (numpy.ndarray): metabolite concentrations at t = 0
+        C (numpy.ndarray): (metabolites x organisms) exchange flux of each
+            organism for each metabolite at t = 0
+        mu (numpy.ndarray): specific growth rate of each organism
+        h_max (float): the largest time step
+        atol (float, optional): concentration below which a metabolite is
+            depleted. Defaults to DEPLETION_TOLERANCE.
+
+    Returns:
+        tuple[float, numpy.ndarray]: The time of the first event, or h_max
+            if no metabolite runs out before h_max, and the indices of the
+            metabolites that are depleted at that time.
+    """
+    S0 = numpy.asarray(S0, dtype=float)
+    C = numpy.asarray(C, dtype=float)
+    mu = numpy.asarray(mu, dtype=float)
+
+    S_end = S0 + C @ growth_integral(mu, h_max)
+    mixed = numpy.any(C > 0, axis=1) & numpy.any(C < 0, axis=1)
+    candidates = numpy.flatnonzero((S0 > atol) & ((S_end <= atol) | mixed))
+
+    events, times = [], []
+    for i in candidates.tolist():
+        h = _first_depletion(S0[i], C[i], mu, h_max, atol)
+        if h is not None:
+            events.append(i)
+            times.append(h)
+
+    if len(times) == 0:
+        return h_max, numpy.array([], dtype=int)
+
+    events, times = numpy.array(events), numpy.array(times)
+    h = float(times.min())
+    return h, events[times <= h * (1 + 1e-9)]
+
+
+def _first_depletion(
+    S0: float, c: numpy.ndarray, mu: numpy.ndarray, h_max: float, atol: float
+) -> float:
+    """The first time at which a single metabolite drops to atol, None if it
+    does not before h_max."""
+
+    def depleted(t: float) -> bool:
+        return S0 + c @ growth_integral(mu, t) <= atol
+
+    # dS/dt = sum_k c_k exp(mu_k t), merge organisms with the same rate
+    rates, index = numpy.unique(mu[c != 0], return_inverse=True)
+    coefficients = numpy.zeros(len(rates))
+    numpy.add.at(coefficients, index, c[c != 0])
+    turning_points = _exponential_sum_roots(coefficients, rates, 0.0, h_max)
+
+    points = [0.0, *turning_points, h_max]
+    for low, high in zip(points[:-1], points[1:]):
+        if depleted(high):
+            return _bisect(depleted, low, high, h_max)
+    return None
+
+
+def _exponential_sum_roots(
+    a: numpy.ndarray, r: numpy.ndarray, low: float, high: float
+) -> list[float]:
+    """The roots of sum_k a_k exp(r_k t) in (low, high) in increasing order,
+    the rates r are sorted and distinct.
+
+    Dividing by the slowest exponential does not change the roots and the
+    derivative of the result has one term less. The function is monotone
+    between the roots of that derivative, which are found recursively.
+    """
+    if numpy.all(a > 0) or numpy.all(a < 0):
+        return []
+
+    shifted = r - r[0]
+
+    def positive(t: float) -> bool:
+        return bool(a @ numpy.exp(shifted * t) > 0)
+
+    critical = _exponential_sum_roots(
+        a[1:] * shifted[1:], shifted[1:], low, high
+    )
+    points = [low, *critical, high]
+
+    roots = []
+    for x, y in zip(points[:-1], points[1:]):
+        sign = positive(y)
+        if positive(x) != sign:
+            roots.append(_bisect(lambda t: positive(t) == sign, x, y, high))
+    return roots
+
+
+def _bisect(condition, low: float, high: float, scale: float) -> float:
+    """The first time in (low, high] at which the condition holds, it only
+    holds at high."""
+    for _ in range(100):
+        mid = 0.5 * (low + high)
+        if condition(mid):
+            high = mid
+        else:
+            low = mid
+        if high - low <= 1e-12 * scale:
+            break
+    return high
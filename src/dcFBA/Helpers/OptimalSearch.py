@@ -1,10 +1,14 @@
 # Binary search on answer
+import multiprocessing
+import multiprocessing.connection
+import os
+import traceback
+
 import numpy as np
 from ..DynamicModels import EndPointFBA
 from ..Models import CommunityModel
-
-# Remember which numbers were visited
-visited: dict[int, float] = {}
+from .Serialization import dumps_model, loads_model
+from .SolveCache import SolveCache, model_fingerprint, solve_key
 
 
 def time_search(
@@ -13,6 +17,8 @@ def time_search(
     initial_concentrations: dict[str, float] = {},
     dt=0.1,
     set_values: tuple[float, int] = None,
+    cache: SolveCache = None,
+    processes: int = 1,
 ) -> list[float, float]:
     """Finds the lowest number of time points given initial values and a dt
 
@@ -25,46 +31,51 @@ def time_search(
             specific value is attained. [value, N]. Where value is the value
             you want to reach and N the initial guess of N.
             Defaults to None
+        cache (SolveCache, optional): Cache of the solutions, pass the same
+            cache to several searches to reuse their solutions.
+            Defaults to None, a new cache for this search.
+        processes (int, optional): Number of worker processes. With more
+            than one process several numbers of time points are tried at
+            the same time, which needs fewer rounds than doubling and
+            bisection one n at a time, None uses the number of CPUs.
+            Defaults to 1.
 
 
     Returns:
         ist[float, float]: number of time points and the reached objective
             value
     """
-    low = 1
-    if set_values is None:
-        high = find_upper_bound(cm, initial_biomasses, initial_concentrations, dt)
-        ep = EndPointFBA(cm, high, initial_biomasses, initial_concentrations, dt=dt)
-        obj = ep.simulate()
+    if processes is None:
+        processes = os.cpu_count()
 
+    if processes > 1:
+        search = _ParallelHorizonSearch(
+            cm, initial_biomasses, initial_concentrations, dt, cache, processes
+        )
     else:
-        obj = set_values[0]
-        high = set_values[1]
-
-    while low < high:
-        n = (low + high) // 2
-        print(f"Trying {n} ...")
-        if n in visited.keys():
-            value = visited[n]
+        search = _HorizonSearch(
+            cm, initial_biomasses, initial_concentrations, dt, cache
+        )
+
+    with search:
+        low = 1
+        if set_values is None:
+            high = search.find_upper_bound()
+            obj = search.solve(high)
+
         else:
-            ep = EndPointFBA(cm, n, initial_biomasses, initial_concentrations, dt=dt)
-            value = ep.simulate()
-            visited[n] = value
+            obj = set_values[0]
+            high = set_values[1]
 
-        if round(value, 5) >= obj:
-            high = n
-            if not set_values:
-                obj = value
-        elif round(value, 5) < obj:
-            low = n + 1
+        high = search.bisect(low, high, obj, set_values is None)
+        value = search.solve(high)
 
     if set_values and value < set_values[0]:
         print("WARNING: Set objective can not be reached")
 
-    return [high, visited[high]]
+    return [high, value]
 
 
-# TODO when there is a remove UserDefinedConstraint fix this
 def balance_search_clean(
     community_model,
     n,
@@ -74,65 +85,53 @@ def balance_search_clean(
     objective,
     epsilon=0.01,
 ):
-    low = 0
-    high = 1
+    """Find the largest fraction of the objective for which balanced growth
+    is feasible. The EndPointFBA model is built once, each step of the
+    bisection only changes the final biomass and re-solves the LP starting
+    from the previous basis.
 
-    while high - low > epsilon:
-        mid_point = (low + high) / 2
-        print(f"Trying {mid_point} ...")
-        ep = EndPointFBA(community_model, n, {}, initial_concentrations, dt)
-        ep.balanced_growth(X_initial, objective * mid_point)
-        solution = ep.simulate()
+    Args:
+        community_model (CommunityModel): The community model.
+        n (int): Number of time points.
+        initial_concentrations (dict[str, float]): Initial concentrations of
+            the metabolites.
+        dt (float): Size of the time step.
+        X_initial (float): Total community biomass at the first time point.
+        objective (float): Total community biomass at the final time point
+            of which the fraction is searched.
+        epsilon (float, optional): Precision of the fraction.
+            Defaults to 0.01.
 
-        if not np.isnan(solution):  # If solution is not NaN
-            low = mid_point
-        else:
-            high = mid_point
+    Returns:
+        float: The largest fraction found for which the solution is not NaN
+    """
+    ep = EndPointFBA(community_model, n, {}, initial_concentrations, dt)
+    ep.balanced_growth(X_initial, objective)
 
-    return low  # Return the n closest to 1 for which the solution is not NaN
+    return _balance_search(ep, objective, epsilon)
 
 
-# TODO Clean this code once deleteUserdefinedConstraint is implemented in cbmpy
 def balanced_search_quick(ep: EndPointFBA, X_initial, objective, epsilon=0.01):
-    """Run this one if you know what you are doing, quick and dirty solution"""
-    low = 0
-    high = 1
+    """Find the largest fraction of the objective for which balanced growth
+    is feasible on an existing EndPointFBA model, see balance_search_clean.
+    The balanced growth constraints are added to the model."""
     ep.balanced_growth(X_initial, objective)
-    solution = ep.simulate()
+    solution = ep.simulate(warm_start=True)
     if not np.isnan(solution):
         return 1.0
+
+    return _balance_search(ep, objective, epsilon)
+
+
+def _balance_search(ep: EndPointFBA, objective, epsilon) -> float:
+    low = 0
+    high = 1
+
     while high - low > epsilon:
         mid_point = (low + high) / 2
         print(f"Trying {mid_point} ...")
-        for mid, _ in ep.m_model.get_model_biomass_ids().items():
-            # Should be replaced with remove user defined constraint once this is
-            #  implemented
-            old_udc = ep.m_model.getObject(f"biomass_fraction_{mid}_{ep.m_times[-1]}")
-
-            # for cid in old_udc.getConstraintComponentIDs():
-            #     ep.m_model.unRegisterObjectInGlobalStore(cid)
-            old_udc.constraint_components = []
-
-            ep.m_model.unRegisterObjectInGlobalStore(old_udc.getId())
-
-            value = objective * mid_point
-            ep.m_model.setReactionBounds("X_comm", value - 0.001, value + 0.001)
-            udc = ep.m_model.createUserDefinedConstraint(
-                f"biomass_fraction_{mid}_{ep.m_times[-1]}",
-                0.0,
-                0.0,
-                components=[
-                    (1.0, f"BM_{mid}_exchange_final", "linear"),
-                    (
-                        -1.0 * (value + X_initial),
-                        f"Phi_{mid}",
-                        "linear",
-                    ),
-                ],
-            )
-
-            ep.m_model.addUserDefinedConstraint(udc)
-        solution = ep.simulate()
+        ep.set_balanced_growth_target(objective * mid_point)
+        solution = ep.simulate(warm_start=True)
 
         if not np.isnan(solution):  # If solution is not NaN
             low = mid_point
@@ -147,16 +146,339 @@ def find_upper_bound(
     initial_biomasses: dict[str, float],
     initial_concentrations: dict[str, float],
     dt,
+    cache: SolveCache = None,
+    processes: int = 1,
 ):
-    n = 1
-    prev_value = 0
+    if processes is None:
+        processes = os.cpu_count()
+
+    if processes > 1:
+        search = _ParallelHorizonSearch(
+            cm, initial_biomasses, initial_concentrations, dt, cache, processes
+        )
+    else:
+        search = _HorizonSearch(
+            cm, initial_biomasses, initial_concentrations, dt, cache
+        )
+
+    with search:
+        return search.find_upper_bound()
+
+
+class _HorizonSearch:
+    """Solves EndPointFBA for different numbers of time points of the same
+    community and conditions. Solutions are looked up in the cache first,
+    otherwise a single EndPointFBA model is built and resized for each n."""
+
+    def __init__(
+        self,
+        cm: CommunityModel,
+        initial_biomasses: dict[str, float],
+        initial_concentrations: dict[str, float],
+        dt: float,
+        cache: SolveCache = None,
+    ) -> None:
+        self._cm = cm
+        self._initial_biomasses = initial_biomasses
+        self._initial_concentrations = initial_concentrations
+        self._dt = dt
+        self._cache = SolveCache() if cache is None else cache
+        self._fingerprint = model_fingerprint(cm)
+        self._ep: EndPointFBA = None
+
+    def _key(self, n: int) -> str:
+        return solve_key(
+            self._fingerprint,
+            n,
+            self._dt,
+            self._initial_biomasses,
+            self._initial_concentrations,
+        )
+
+    def solve(self, n: int) -> float:
+        key = self._key(n)
+        value = self._cache.get(key)
+        if value is not None:
+            return value
+
+        if self._ep is None:
+            self._ep = EndPointFBA(
+                self._cm,
+                n,
+                self._initial_biomasses,
+                self._initial_concentrations,
+                dt=self._dt,
+            )
+        else:
+            self._ep.resize(n)
+
+        value = self._ep.simulate()
+        self._cache[key] = value
+        return value
+
+    def find_upper_bound(self) -> int:
+        n = 1
+        prev_value = 0
+        while True:
+            n *= 2  # Double the value of n
+            current_value = self.solve(n)
+            # Check if current value is NaN or if it doesn't increase from the previous value
+            if np.isnan(current_value) or current_value <= prev_value:
+                return n // 2
+
+            prev_value = current_value
+
+    def bisect(self, low: int, high: int, obj: float, update: bool) -> int:
+        """Find the smallest n in [low, high] which reaches obj.
+
+        Args:
+            low (int): Smallest candidate.
+            high (int): Largest candidate, assumed to reach obj.
+            obj (float): The objective value to reach.
+            update (bool): Lower obj to the value of each new upper bound.
+
+        Returns:
+            int: The smallest n reaching obj
+        """
+        while low < high:
+            n = (low + high) // 2
+            print(f"Trying {n} ...")
+            value = self.solve(n)
+
+            if round(value, 5) >= obj:
+                high = n
+                if update:
+                    obj = value
+            elif round(value, 5) < obj:
+                low = n + 1
+
+        return high
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "_HorizonSearch":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class _ParallelHorizonSearch(_HorizonSearch):
+    """Tries several numbers of time points at the same time in worker
+    processes, each keeping its own resizable EndPointFBA model.
+
+    The upper bound is searched by trying up to ``processes`` evenly
+    spaced numbers of time points up to the next doubling at once and the
+    bisection is replaced by a k-ary search, which splits the interval in
+    processes + 1 parts each round. Candidates that can no longer change the
+    outcome are cancelled when they have not started yet, running ones are
+    not waited for and the workers are terminated when the search is closed.
+    """
+
+    def __init__(
+        self,
+        cm: CommunityModel,
+        initial_biomasses: dict[str, float],
+        initial_concentrations: dict[str, float],
+        dt: float,
+        cache: SolveCache,
+        processes: int,
+    ) -> None:
+        super().__init__(
+            cm, initial_biomasses, initial_concentrations, dt, cache
+        )
+        self.processes = processes
+        # The n each busy worker is solving, by worker index
+        self._running: dict[int, int] = {}
+
+        # Spawn the workers like SolverPool, forking a process that holds
+        # solver state is not safe
+        context = multiprocessing.get_context("spawn")
+        data = dumps_model(cm)
+        self._connections = []
+        self._workers = []
+        for _ in range(processes):
+            connection, child = context.Pipe()
+            worker = context.Process(
+                target=_work,
+                args=(
+                    child,
+                    data,
+                    initial_biomasses,
+                    initial_concentrations,
+                    dt,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            child.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    def solve(self, n: int) -> float:
+        return self.solve_all([n])[n]
+
+    def solve_all(self, ns: list[int], irrelevant=None) -> dict[int, float]:
+        """Solve several numbers of time points concurrently.
+
+        Args:
+            ns (list[int]): The numbers of time points.
+            irrelevant (Callable, optional): Called with the values found so
+                far, returns the numbers of time points that are no longer
+                needed. Defaults to None, all are needed.
+
+        Returns:
+            dict[int, float]: The value of each n that was not cancelled
+        """
+        values = {}
+        queue = []
+        for n in ns:
+            value = self._cache.get(self._key(n))
+            if value is not None:
+                values[n] = value
+            elif n not in self._running.values():
+                queue.append(n)
+
+        waiting = set(ns) - values.keys()
+        while waiting:
+            for worker in range(len(self._workers)):
+                if queue and worker not in self._running:
+                    n = queue.pop(0)
+                    self._connections[worker].send(n)
+                    self._running[worker] = n
+
+            # Candidates of an earlier call that were not waited for may
+            # finish here as well, their values are only cached
+            for n, value in self._receive():
+                self._cache[self._key(n)] = value
+                if n in waiting:
+                    values[n] = value
+                    waiting.remove(n)
+
+            if irrelevant is not None:
+                cancel = irrelevant(values)
+                queue = [n for n in queue if n not in cancel]
+                waiting -= cancel
+
+        return values
+
+    def find_upper_bound(self) -> int:
+        n = 1
+        prev_value = 0
+        while True:
+            # Speculate only within the next doubling, so the candidates
+            # stay close to the size the serial search would try
+            candidates = sorted(
+                {
+                    n + (i + 1) * n // self.processes
+                    for i in range(self.processes)
+                }
+                - {n}
+            )
+            print(f"Trying {candidates} ...")
+
+            def beyond_stop(values: dict[int, float]) -> set[int]:
+                previous = prev_value
+                for i, c in enumerate(candidates):
+                    if c not in values:
+                        return set()
+                    if np.isnan(values[c]) or values[c] <= previous:
+                        return set(candidates[i + 1 :])
+                    previous = values[c]
+                return set()
+
+            values = self.solve_all(candidates, beyond_stop)
+            for c in candidates:
+                if np.isnan(values[c]) or values[c] <= prev_value:
+                    return n
+                prev_value = values[c]
+                n = c
+
+    def bisect(self, low: int, high: int, obj: float, update: bool) -> int:
+        while low < high:
+            candidates = sorted(
+                {
+                    low + (i + 1) * (high - low) // (self.processes + 1)
+                    for i in range(self.processes)
+                }
+            )
+            print(f"Trying {candidates} ...")
+
+            def reached(value: float) -> bool:
+                return round(value, 5) >= obj
+
+            def outside(values: dict[int, float]) -> set[int]:
+                # Only candidates between the largest n that does not reach
+                # obj and the smallest n that does can change the outcome
+                below = [c for c, v in values.items() if not reached(v)]
+                above = [c for c, v in values.items() if reached(v)]
+                lowest = max(below, default=low - 1)
+                highest = min(above, default=high)
+                return {c for c in candidates if not lowest < c < highest}
+
+            values = self.solve_all(candidates, outside)
+            above = [c for c, v in values.items() if reached(v)]
+            below = [c for c, v in values.items() if not reached(v)]
+            if above:
+                high = min(above)
+                if update:
+                    obj = values[high]
+            if below:
+                low = max(below) + 1
+
+        return high
+
+    def close(self) -> None:
+        # Speculative candidates that are still running are not needed, stop
+        # the workers instead of waiting for them
+        for worker in self._workers:
+            worker.terminate()
+        for worker in self._workers:
+            worker.join(timeout=5)
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._workers = []
+        self._running = {}
+
+    def _receive(self) -> list[tuple[int, float]]:
+        """Wait until at least one busy worker is done.
+
+        Returns:
+            list[tuple[int, float]]: The n and value of each finished worker
+        """
+        busy = {self._connections[w]: w for w in self._running}
+        results = []
+        for connection in multiprocessing.connection.wait(list(busy)):
+            worker = busy[connection]
+            n = self._running.pop(worker)
+            status, value = connection.recv()
+            if status == "error":
+                raise RuntimeError(f"Search worker {worker} failed:\n{value}")
+            results.append((n, value))
+        return results
+
+
+def _work(
+    connection,
+    data: bytes,
+    initial_biomasses: dict[str, float],
+    initial_concentrations: dict[str, float],
+    dt: float,
+) -> None:
+    """Main loop of a worker process, solves the n it receives."""
+    search = _HorizonSearch(
+        loads_model(data), initial_biomasses, initial_concentrations, dt
+    )
+
     while True:
-        n *= 2  # Double the value of n
-        ep = EndPointFBA(cm, n, initial_biomasses, initial_concentrations, dt=dt)
-        current_value = ep.simulate()
-        # Check if current value is NaN or if it doesn't increase from the previous value
-        if np.isnan(current_value) or current_value <= prev_value:
-            return n // 2
-
-        visited[n] = current_value
-        prev_value = current_value
+        try:
+            n = connection.recv()
+        except EOFError:
+            break
+
+        try:
+            connection.send(("ok", search.solve(n)))
+        except Exception:
+            connection.send(("error", traceback.format_exc()))
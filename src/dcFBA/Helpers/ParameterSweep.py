@@ -0,0 +1,202 @@
+"""Run many dynamic FBA simulations of the same community in parallel.
+
+A sweep takes a CommunityModel and a list of parameter sets (initial
+biomasses, initial concentrations and kinetics), sends the pickled model
+once to every worker process and yields the results as the simulations
+finish. Every simulation only depends on its own parameters, so the results
+are the same for any number of processes. Exceptions raised by a single
+simulation are stored in its result instead of stopping the sweep.
+"""
+import itertools
+import multiprocessing
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator
+
+from ..Models import CommunityModel, KineticsStruct
+from .Serialization import dumps_model, loads_model
+
+# The community model of a worker process, set by _init_worker
+_worker_model: CommunityModel = None
+
+
+class SweepResult:
+    """The outcome of a single simulation of a sweep.
+
+    Attributes:
+        index (int): Position of the parameters in the grid.
+        parameters (dict): The parameters of this simulation.
+        times (list[float]): The time points of the simulation.
+        biomasses (dict[str, list[float]]): Biomass of each organism over time.
+        metabolites (dict[str, list[float]]): Concentrations over time.
+        fluxes (dict[str, list[float]]): Flux values over time of the
+            requested reactions.
+        error (str): The traceback if the simulation failed, else None.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        parameters: dict,
+        times: list[float] = None,
+        biomasses: dict[str, list[float]] = None,
+        metabolites: dict[str, list[float]] = None,
+        fluxes: dict[str, list[float]] = None,
+        error: str = None,
+    ) -> None:
+        self.index = index
+        self.parameters = parameters
+        self.times = times if times is not None else []
+        self.biomasses = biomasses if biomasses is not None else {}
+        self.metabolites = metabolites if metabolites is not None else {}
+        self.fluxes = fluxes if fluxes is not None else {}
+        self.error = error
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    def __repr__(self) -> str:
+        status = "failed" if self.failed else f"{len(self.times)} time points"
+        return f"SweepResult({self.index}, {status})"
+
+
+def parameter_grid(
+    biomasses: list[list[float]],
+    initial_concentrations: list[dict[str, float]] = [{}],
+    kinetics: list[KineticsStruct] = [None],
+) -> list[dict]:
+    """Create the cartesian product of the parameter values.
+
+    The order is deterministic: the last argument changes fastest.
+
+    Args:
+        biomasses (list[list[float]]): Initial biomasses, one list per
+            simulation with a value for each organism.
+        initial_concentrations (list[dict[str, float]], optional): Initial
+            concentrations to combine with. Defaults to [{}].
+        kinetics (list[KineticsStruct], optional): Kinetics to combine with.
+            Defaults to [None], no kinetics.
+
+    Returns:
+        list[dict]: The parameter sets with the keys "biomasses",
+            "initial_concentrations" and "kinetics"
+    """
+    return [
+        {
+            "biomasses": list(b),
+            "initial_concentrations": dict(c),
+            "kinetics": k,
+        }
+        for b, c, k in itertools.product(
+            biomasses, initial_concentrations, kinetics
+        )
+    ]
+
+
+def sweep(
+    model: CommunityModel,
+    grid: list[dict],
+    dt: float,
+    dynamic_model=None,
+    processes: int = None,
+    ordered: bool = False,
+    flux_ids: list[str] = [],
+    **simulate_kwargs,
+) -> Iterator[SweepResult]:
+    """Simulate the community for each parameter set in the grid.
+
+    Args:
+        model (CommunityModel): The community to simulate. It is pickled once
+            and send to each worker.
+        grid (list[dict]): Parameter sets, see ``parameter_grid``. Missing
+            keys use the defaults of the dynamic model.
+        dt (float): The time step passed to simulate.
+        dynamic_model (type, optional): The dynamic model class, called with
+            (model, biomasses, initial_concentrations, kinetics).
+            Defaults to DynamicJointFBA.
+        processes (int, optional): Number of worker processes, 1 runs all
+            simulations in this process. Defaults to None, the number of CPUs.
+        ordered (bool, optional): Yield the results in grid order instead of
+            as soon as they finish. Defaults to False.
+        flux_ids (list[str], optional): Reactions of which the fluxes are
+            returned. Defaults to [], no fluxes.
+        **simulate_kwargs: Passed on to the simulate method.
+
+    Yields:
+        SweepResult: The result of each simulation
+    """
+    if dynamic_model is None:
+        from ..DynamicModels import DynamicJointFBA
+
+        dynamic_model = DynamicJointFBA
+
+    tasks = [
+        (i, parameters, dynamic_model, dt, flux_ids, simulate_kwargs)
+        for i, parameters in enumerate(grid)
+    ]
+
+    if processes == 1:
+        global _worker_model
+        previous = _worker_model
+        _worker_model = model
+        try:
+            for task in tasks:
+                yield _run(task)
+        finally:
+            _worker_model = previous
+        return
+
+    # Spawn the workers like SolverPool, forking a process that holds
+    # solver state is not safe
+    executor = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(dumps_model(model),),
+    )
+    try:
+        futures = [executor.submit(_run, task) for task in tasks]
+        completed = futures if ordered else as_completed(futures)
+        for future in completed:
+            yield future.result()
+    finally:
+        # Return at once if the sweep is stopped early, the simulations
+        # that did not start yet are cancelled
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _init_worker(data: bytes) -> None:
+    global _worker_model
+    _worker_model = loads_model(data)
+
+
+def _run(task: tuple) -> SweepResult:
+    """Run one simulation on the model of this worker."""
+    index, parameters, dynamic_model, dt, flux_ids, simulate_kwargs = task
+
+    try:
+        arguments = [_worker_model, parameters["biomasses"]]
+        arguments.append(parameters.get("initial_concentrations", {}))
+        if parameters.get("kinetics") is not None:
+            arguments.append(parameters["kinetics"])
+
+        simulation = dynamic_model(*arguments)
+        simulation.simulate(dt, **simulate_kwargs)
+
+        return SweepResult(
+            index,
+            parameters,
+            times=list(simulation.times),
+            biomasses=_to_lists(simulation.biomasses),
+            metabolites=_to_lists(simulation.metabolites),
+            fluxes={
+                rid: simulation.get_flux_values(rid) for rid in flux_ids
+            },
+        )
+    except Exception:
+        return SweepResult(index, parameters, error=traceback.format_exc())
+
+
+def _to_lists(values) -> dict[str, list[float]]:
+    return {key: list(map(float, values[key])) for key in values.keys()}
@@ -1,17 +1,57 @@
 """Helper function which loops over all reactions in a Model or CommunityModel. Sets the reaction as the objective function and checks, given a medium if the reaction can take place
+
+A single ``SolverSession`` is kept per scan: for every reaction only the
+objective and the bound of that reaction are changed in the LP. Every
+reaction that carries flux in one of the solutions can take place, so it is
+not scanned itself anymore. The reactions can be split over several worker
+processes, each scanning its own share of the reactions.
+
+Before the exact scan, a few LPs are solved with random weights on all
+reactions that did not carry flux yet as objective. Only the reactions that
+did not carry flux in any of these solutions are scanned one by one.
 """
 import math
-import cbmpy
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator
+
 import numpy
 from cbmpy.CBModel import Model, Reaction
 
+from .Serialization import dumps_model, loads_model
+from .SolverSession import SolverSession, read_bounds
+
+# The model of a worker process, set by _init_worker
+_worker_model: Model = None
+
 
-def scan_unused_reactions(model: Model, medium: dict[str, float]) -> list[str]:
+def scan_unused_reactions(
+    model: Model,
+    medium: dict[str, float],
+    processes: int = 1,
+    tolerance: float = 1e-9,
+    samples: int = 10,
+    seed: int = None,
+    reaction_ids: list[str] = None,
+) -> list[str]:
     """Generate list of unused reactions
 
     Args:
         model (Model): a GSMM
         medium (dict[str, float]): The medium the model is in
+        processes (int, optional): Number of worker processes the reactions
+            are split over, None uses the number of CPUs. Defaults to 1,
+            scan in this process.
+        tolerance (float, optional): Flux values with a smaller absolute
+            value are considered zero. Defaults to 1e-9.
+        samples (int, optional): Number of random objective LPs solved
+            before the exact scan, 0 scans every reaction. Defaults to 10.
+        seed (int, optional): Seed of the random objectives. The result
+            does not depend on it. Defaults to None.
+        reaction_ids (list[str], optional): The reactions to scan.
+            Defaults to None, scan all reactions.
 
     Returns:
         list[str]: All the unused reactions given the medium
@@ -23,51 +63,172 @@ def scan_unused_reactions(model: Model, medium: dict[str, float]) -> list[str]:
             # Set all the exchange reactions of the medium
             reaction.setLowerBound(-medium[sid])
 
-    unused_reactions = []
-
-    for rid in model.getReactionIds():
-        reaction = model.getReaction(rid)
-
-        # Check forward flux possibility
-        old_ub = reaction.getUpperBound()
-        if old_ub == cbmpy.INF or old_ub == numpy.Inf:
-            reaction.setUpperBound(1)
-
-        model.createObjectiveFunction(rid, osense="maximize")
-        model.setActiveObjective(f"{rid}_objective")
-
-        solution = cbmpy.doFBA(model, quiet=True)
-
-        model.deleteObjective(f"{rid}_objective")
-        reaction.setUpperBound(old_ub)
-
-        if not (math.isnan(solution) or solution == 0):
-            continue
-
-        # Check reverse flux possibility
-        old_lb = reaction.getLowerBound()
-        if old_lb == cbmpy.NINF or old_lb == numpy.NINF:
-            reaction.setLowerBound(-1)
-
-        model.createObjectiveFunction(rid, osense="minimize")
-        model.setActiveObjective(f"{rid}_objective")
-
-        solution = cbmpy.doFBA(model, quiet=True)
-
-        model.deleteObjective(f"{rid}_objective")
-
-        reaction.setLowerBound(old_lb)
-
-        if not (math.isnan(solution) or solution == 0):
-            continue
-
-        unused_reactions.append(rid)
-    return unused_reactions
-
-
-def reduce_model(model: Model, medium: dict[str, float]) -> None:
-    """Remove unused reactions and metabolites from the model"""
-    rids: list[str] = scan_unused_reactions(model, medium)
+    rids = model.getReactionIds()
+    if reaction_ids is not None:
+        scanned = set(reaction_ids)
+        rids = [rid for rid in rids if rid in scanned]
+
+    candidates = rids
+    if samples > 0:
+        candidates = _prescreen_reactions(
+            model, rids, tolerance, samples, seed
+        )
+
+    if processes == 1 or len(candidates) == 0:
+        unused = set(_scan_reactions(model, candidates, tolerance))
+    else:
+        n = processes if processes is not None else os.cpu_count()
+        m = len(candidates)
+        n = max(1, min(n, m))
+        shares = [
+            candidates[i * m // n : (i + 1) * m // n] for i in range(n)
+        ]
+
+        unused = set()
+        # Spawn the workers like SolverPool, forking a process that holds
+        # solver state is not safe
+        with ProcessPoolExecutor(
+            max_workers=n,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(dumps_model(model),),
+        ) as executor:
+            for result in executor.map(_scan_share, shares, [tolerance] * n):
+                unused.update(result)
+
+    return [rid for rid in rids if rid in unused]
+
+
+@contextmanager
+def _scan_session(model: Model) -> Iterator[SolverSession]:
+    """Create a solver session for a scan. The session needs an active
+    objective to build the LP, if the model has none a temporary objective
+    is created. The objective itself is replaced in the LP."""
+    temporary_objective = None
+    if model.getActiveObjective() is None:
+        rid = model.reactions[0].getId()
+        model.createObjectiveFunction(rid, delete_current_obj=False)
+        temporary_objective = f"{rid}_objective"
+
+    try:
+        yield SolverSession(model)
+    finally:
+        if temporary_objective is not None:
+            model.deleteObjective(temporary_objective)
+
+
+def _prescreen_reactions(
+    model: Model,
+    rids: list[str],
+    tolerance: float,
+    samples: int,
+    seed: int = None,
+) -> list[str]:
+    """Solve LPs with random objectives and return the reactions that did
+    not carry flux in any of the solutions."""
+    if len(rids) == 0:
+        return []
+
+    with _scan_session(model) as session:
+        session.set_objective({})
+        index = {rid: i for i, rid in enumerate(session.reaction_ids)}
+        lb, ub = read_bounds(model, index)
+
+        # Replace infinite bounds by a box, so the LPs are not unbounded.
+        # Every solution in the box is also a solution of the model.
+        finite = numpy.abs(numpy.concatenate([lb, ub]))
+        box = max(1.0, finite[numpy.isfinite(finite)].max(initial=0.0))
+        lower = numpy.where(numpy.isinf(lb), -box, lb)
+        upper = numpy.where(numpy.isinf(ub), box, ub)
+
+        # Random positive weights on the reactions that did not carry flux
+        # yet, maximizing pushes them forward and minimizing in reverse
+        generator = numpy.random.default_rng(seed)
+        used = numpy.zeros(len(index), dtype=bool)
+        for sample in range(samples):
+            candidates = [rid for rid in rids if not used[index[rid]]]
+            if len(candidates) == 0:
+                break
+
+            weights = generator.uniform(0, 1, len(candidates))
+            session.set_objective(
+                dict(zip(candidates, weights.tolist())),
+                "maximize" if sample % 2 == 0 else "minimize",
+            )
+            if not math.isnan(session.solve(lower, upper)):
+                used |= numpy.abs(session.fluxes) > tolerance
+
+    return [rid for rid in rids if not used[index[rid]]]
+
+
+def _scan_reactions(
+    model: Model, rids: list[str], tolerance: float
+) -> list[str]:
+    """Scan the reactions for the possibility to carry forward or reverse
+    flux, using a single solver session."""
+    if len(rids) == 0:
+        return []
+
+    with _scan_session(model) as session:
+        session.set_objective({})
+        index = {rid: i for i, rid in enumerate(session.reaction_ids)}
+        lb, ub = read_bounds(model, index)
+
+        # Reactions that carried flux in one of the solutions
+        used = numpy.zeros(len(index), dtype=bool)
+        unused = []
+
+        for rid in rids:
+            i = index[rid]
+            if used[i]:
+                continue
+
+            # A reaction with a lower bound of at least zero can only carry
+            # forward flux and one with an upper bound of at most zero only
+            # reverse flux, so a single LP is enough
+            senses = []
+            if ub[i] > 0 or lb[i] >= 0:
+                senses.append("maximize")
+            if lb[i] < 0 or ub[i] <= 0:
+                senses.append("minimize")
+
+            for sense in senses:
+                # Bound the scanned reaction, so the LP is not unbounded
+                lower, upper = lb.copy(), ub.copy()
+                if sense == "maximize" and math.isinf(upper[i]):
+                    upper[i] = 1
+                elif sense == "minimize" and math.isinf(lower[i]):
+                    lower[i] = -1
+
+                session.set_objective({rid: 1}, sense)
+                solution = session.solve(lower, upper)
+                if math.isnan(solution):
+                    continue
+
+                used |= numpy.abs(session.fluxes) > tolerance
+                if abs(solution) > tolerance:
+                    break
+            else:
+                unused.append(rid)
+
+    return unused
+
+
+def _init_worker(data: bytes) -> None:
+    global _worker_model
+    _worker_model = loads_model(data)
+
+
+def _scan_share(rids: list[str], tolerance: float) -> list[str]:
+    return _scan_reactions(_worker_model, rids, tolerance)
+
+
+def reduce_model(
+    model: Model, medium: dict[str, float], processes: int = 1
+) -> None:
+    """Remove unused reactions and metabolites from the model, see
+    scan_unused_reactions for the processes argument."""
+    rids: list[str] = scan_unused_reactions(model, medium, processes)
 
     for rid in rids:
         model.deleteReactionAndBounds(rid)
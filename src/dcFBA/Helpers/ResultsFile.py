@@ -0,0 +1,279 @@
+"""Save the results of a dynamic model to a columnar file and read them back
+lazily.
+
+The results are stored as a numpy ``.npz`` file with one table for the
+biomasses, the metabolites and the fluxes. Every table is a float array with
+one row per id and one column per time point, so the values of a single id
+are stored next to each other. The ids of the rows are stored as separate id
+tables and the time points and the type of the model as JSON metadata.
+Tables with rows of different length are padded with NaN.
+
+By default the file is not compressed, so ``load_results`` can memory map
+the tables: reading a few fluxes out of thousands only reads those rows from
+disk. A compressed file is smaller, but a table is decompressed completely
+the first time one of its rows is read.
+"""
+import json
+import os
+import zipfile
+from collections.abc import Mapping
+
+import numpy
+
+from ..Models.Trajectory import Trajectory
+
+FORMAT_VERSION = 1
+
+TABLES = ["biomasses", "metabolites", "fluxes"]
+
+
+def save_results(
+    tables: dict[str, tuple[list, numpy.ndarray]],
+    times: list,
+    path,
+    model: str = "",
+    compress: bool = False,
+) -> None:
+    """Save result tables to a file, see ``DynamicModelBase.save_results``.
+
+    Args:
+        tables (dict[str, tuple[list, numpy.ndarray]]): The table name, one
+            of ``TABLES``, followed by the row ids and a (id x time) array.
+            The row ids of the fluxes are reaction ids, or (model id,
+            reaction id) pairs for models that are simulated separately.
+        times (list): The time points of the simulation.
+        path (str or file): The file to write, the ``.npz`` extension is
+            added to a file name without it.
+        model (str, optional): The type of the model. Defaults to "".
+        compress (bool, optional): Compress the file, the tables can then
+            not be memory mapped. Defaults to False.
+    """
+    metadata = {
+        "version": FORMAT_VERSION,
+        "model": model,
+        "times": [_json_value(t) for t in times],
+    }
+    arrays = {"metadata": numpy.array(json.dumps(metadata))}
+
+    for name in TABLES:
+        ids, values = tables.get(name, ([], numpy.zeros((0, 0))))
+        model_ids = [i[0] if isinstance(i, tuple) else "" for i in ids]
+        ids = [i[1] if isinstance(i, tuple) else i for i in ids]
+
+        arrays[f"{name}_ids"] = numpy.array(ids, dtype=str)
+        arrays[f"{name}_model_ids"] = numpy.array(model_ids, dtype=str)
+        arrays[name] = numpy.asarray(values, dtype=float).reshape(len(ids), -1)
+
+    path = _npz_path(path)
+    if compress:
+        numpy.savez_compressed(path, **arrays)
+    else:
+        numpy.savez(path, **arrays)
+
+
+def build_table(values: Mapping) -> tuple[list, numpy.ndarray]:
+    """Convert the values over time of a model to a table for
+    ``save_results``.
+
+    Args:
+        values (Mapping): id followed by the values over time, e.g. a
+            dictionary of lists or a Trajectory. Shorter lists are padded
+            with NaN.
+
+    Returns:
+        tuple[list, numpy.ndarray]: The ids and the (id x time) array
+    """
+    if isinstance(values, Trajectory):
+        return list(values.ids), values.array.T
+
+    ids = list(values.keys())
+    rows = [numpy.asarray(values[i], dtype=float).ravel() for i in ids]
+    length = max((len(row) for row in rows), default=0)
+
+    table = numpy.full((len(ids), length), numpy.nan)
+    for i, row in enumerate(rows):
+        table[i, : len(row)] = row
+    return ids, table
+
+
+def load_results(path) -> "ResultsFile":
+    """Open a file written by ``save_results``.
+
+    Args:
+        path (str): The results file, the ``.npz`` extension is added to a
+            file name without it, as ``save_results`` does.
+
+    Raises:
+        ValueError: If the file was written by an unknown version.
+
+    Returns:
+        ResultsFile: The results, the tables are read on access
+    """
+    return ResultsFile(path)
+
+
+class ResultTable(Mapping):
+    """A table of a results file, mapping each id to its values over time.
+
+    The values are read from the file when they are accessed. The ids are
+    the reaction, species or model ids of the rows, or (model id, reaction
+    id) pairs for the fluxes of models that are simulated separately.
+
+    Attributes:
+        ids (list): The id of each row.
+    """
+
+    def __init__(self, results: "ResultsFile", name: str) -> None:
+        self._results = results
+        self._name = name
+
+        ids = results._read(f"{name}_ids").tolist()
+        model_ids = results._read(f"{name}_model_ids").tolist()
+        self.ids: list = [
+            (mid, i) if mid != "" else i for mid, i in zip(model_ids, ids)
+        ]
+        self._index = {i: row for row, i in enumerate(self.ids)}
+
+    @property
+    def array(self) -> numpy.ndarray:
+        """All values as an (id x time) array, memory mapped if possible."""
+        return self._results._table(self._name)
+
+    def __getitem__(self, id) -> numpy.ndarray:
+        return self.array[self._index[id]]
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        return f"ResultTable({self._name}, {len(self.ids)} ids)"
+
+
+class ResultsFile:
+    """The results of a dynamic model read from a file written by
+    ``save_results``.
+
+    Attributes:
+        model (str): The type of the model, e.g. "EndPointFBA".
+        times (list): The time points of the simulation.
+        biomasses (ResultTable): The biomass of each model over time.
+        metabolites (ResultTable): The concentration of each metabolite.
+        fluxes (ResultTable): The flux values of each reaction.
+    """
+
+    def __init__(self, path) -> None:
+        path = _npz_path(path)
+        self._path = path
+        self._archive = numpy.load(path, allow_pickle=False)
+        self._tables: dict[str, numpy.ndarray] = {}
+
+        metadata = json.loads(self._read("metadata").item())
+        if metadata["version"] != FORMAT_VERSION:
+            self.close()
+            raise ValueError(
+                f"Unknown results version {metadata['version']}, "
+                f"expected {FORMAT_VERSION}"
+            )
+
+        self.model: str = metadata["model"]
+        self.times: list = metadata["times"]
+        self.biomasses = ResultTable(self, "biomasses")
+        self.metabolites = ResultTable(self, "metabolites")
+        self.fluxes = ResultTable(self, "fluxes")
+
+    def get_flux_values(self, rid: str, mid: str = None) -> list[float]:
+        """Returns the flux values of a reaction for each time point.
+
+        Args:
+            rid (str): The reaction id.
+            mid (str, optional): The model id, only for models that are
+                simulated separately. Defaults to None.
+
+        Returns:
+            list[float]: The flux values
+        """
+        return self.fluxes[rid if mid is None else (mid, rid)].tolist()
+
+    def close(self) -> None:
+        """Close the file, memory mapped tables stay readable."""
+        self._archive.close()
+
+    def __enter__(self) -> "ResultsFile":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _read(self, name: str) -> numpy.ndarray:
+        return self._archive[name]
+
+    def _table(self, name: str) -> numpy.ndarray:
+        if name not in self._tables:
+            table = _memory_map(self._path, f"{name}.npy")
+            if table is None:
+                table = self._read(name)
+            self._tables[name] = table
+        return self._tables[name]
+
+
+def _npz_path(path):
+    """Add the ``.npz`` extension to a file name without it, like
+    ``numpy.savez`` does. File objects are returned unchanged."""
+    if not isinstance(path, str) and not hasattr(path, "__fspath__"):
+        return path
+
+    path = os.fspath(path)
+    if not path.endswith(".npz"):
+        path += ".npz"
+    return path
+
+
+def _memory_map(path, member: str) -> numpy.ndarray:
+    """Memory map an array stored uncompressed in an ``.npz`` file, None if
+    the array is compressed or the path is not a file name."""
+    if not isinstance(path, str) and not hasattr(path, "__fspath__"):
+        return None
+
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(member)
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(path, "rb") as file:
+        # The data starts after the local header of the member, which has a
+        # fixed size of 30 bytes followed by the file name and extra field
+        file.seek(info.header_offset + 26)
+        name_length, extra_length = numpy.frombuffer(file.read(4), "<u2")
+        file.seek(info.header_offset + 30 + name_length + extra_length)
+
+        version = numpy.lib.format.read_magic(file)
+        shape, fortran_order, dtype = _read_array_header(file, version)
+        offset = file.tell()
+
+    if 0 in shape:
+        return numpy.zeros(shape, dtype=dtype)
+
+    return numpy.memmap(
+        path,
+        dtype=dtype,
+        mode="r",
+        offset=offset,
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+def _read_array_header(file, version: tuple[int, int]):
+    if version == (1, 0):
+        return numpy.lib.format.read_array_header_1_0(file)
+    return numpy.lib.format.read_array_header_2_0(file)
+
+
+def _json_value(value):
+    """Convert numpy scalars, e.g. numpy.float64 time points, for JSON."""
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
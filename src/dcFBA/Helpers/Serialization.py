@@ -0,0 +1,49 @@
+"""Pickle cbmpy models without breaking the original model.
+
+Pickling a cbmpy Model clears its global id store, after which methods such
+as ``getReaction`` fail on the original model. These functions restore the
+store after pickling.
+"""
+import pickle
+from cbmpy.CBModel import Model
+
+
+def dumps_models(models: list[Model]) -> list[bytes]:
+    """Pickle each model and restore its global id store afterwards.
+
+    Args:
+        models (list[Model]): The models to pickle.
+
+    Returns:
+        list[bytes]: The pickled models
+    """
+    data = []
+    for model in models:
+        data.append(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+        model.__setGlobalIdStore__()
+        model.__populateGlobalIdStore__()
+    return data
+
+
+def dumps_model(model: Model) -> bytes:
+    """Pickle a model and restore its global id store afterwards.
+
+    Args:
+        model (Model): The model to pickle.
+
+    Returns:
+        bytes: The pickled model
+    """
+    return dumps_models([model])[0]
+
+
+def loads_model(data: bytes) -> Model:
+    """Load a model pickled by ``dumps_model``.
+
+    Args:
+        data (bytes): The pickled model.
+
+    Returns:
+        Model: The model
+    """
+    return pickle.loads(data)
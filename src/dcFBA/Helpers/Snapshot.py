@@ -0,0 +1,293 @@
+"""Save a built CommunityModel to a binary snapshot and load it again.
+
+Building a community from SBML files takes seconds for large models and SBML
+does not store the properties of a CommunityModel, such as the custom model
+identifiers and biomass reactions. A snapshot stores the model as a single
+uncompressed numpy ``.npz`` file: the stoichiometry as sparse coordinates,
+the flux bounds as arrays and the ids, names and community properties as
+tables. Loading creates the cbmpy objects directly from these arrays, without
+parsing SBML, searching for duplicates or validating the ids again, which
+takes milliseconds.
+
+A snapshot contains everything DynamicJointFBA and EndPointFBA use: the
+compartments, species, reactions, flux bounds, objectives, user defined
+constraints, genes, gene protein associations and the community properties.
+Annotations, notes and MIRIAM references are not stored.
+"""
+import json
+
+import numpy
+from cbmpy.CBModel import (
+    Compartment,
+    FluxBound,
+    FluxObjective,
+    Gene,
+    GeneProteinAssociation,
+    Objective,
+    Reaction,
+    Reagent,
+    Species,
+    UserDefinedConstraint,
+)
+
+from ..Models.CommunityModel import CommunityModel
+
+FORMAT_VERSION = 1
+
+# Valid id the cbmpy objects of a snapshot are created with
+_PLACEHOLDER_ID = "_"
+
+
+def save_snapshot(model: CommunityModel, path) -> None:
+    """Save a community model to a snapshot file.
+
+    Args:
+        model (CommunityModel): The community model, it is not modified.
+        path (str or file): The file to write, numpy adds the ``.npz``
+            extension to a file name without it.
+    """
+    species_index = {s.getId(): i for i, s in enumerate(model.species)}
+
+    rows, columns, coefficients, reagent_ids = [], [], [], []
+    for j, reaction in enumerate(model.reactions):
+        for reagent in reaction.reagents:
+            rows.append(species_index[reagent.getSpecies()])
+            columns.append(j)
+            coefficients.append(reagent.getCoefficient())
+            reagent_ids.append(reagent.getId())
+
+    metadata = {
+        "version": FORMAT_VERSION,
+        "id": model.getId(),
+        "name": model.getName(),
+        "compartments": [
+            [c.getId(), c.getName(), c.size, c.dimensions]
+            for c in model.compartments
+        ],
+        "species": [
+            [
+                s.getId(),
+                s.getName(),
+                s.getCompartmentId(),
+                s.charge,
+                s.chemFormula,
+                s.getSBOterm(),
+            ]
+            for s in model.species
+        ],
+        "reactions": [
+            [r.getId(), r.getName(), r.getSBOterm()] for r in model.reactions
+        ],
+        "reagents": reagent_ids,
+        "flux_bounds": [
+            [fb.getId(), fb.getReactionId(), fb.operation]
+            for fb in model.flux_bounds
+        ],
+        "objectives": [
+            [
+                o.getId(),
+                o.operation,
+                [
+                    [fo.getId(), fo.reaction, fo.coefficient]
+                    for fo in o.flux_objectives
+                ],
+            ]
+            for o in model.objectives
+        ],
+        "active_objective": model.activeObjIdx,
+        "user_defined_constraints": [
+            [
+                udc.getId(),
+                udc.getLowerBound(),
+                udc.getUpperBound(),
+                [
+                    [cc.getId(), cc.coefficient, cc.variable, cc.ctype]
+                    for cc in udc.constraint_components
+                ],
+            ]
+            for udc in model.user_defined_constraints
+        ],
+        "genes": [[g.getId(), g.label, g.active] for g in model.genes],
+        "gpr": [
+            [gpr.getId(), gpr.protein, gpr.getName(), gpr.tree, gpr.generefs]
+            for gpr in model.gpr
+        ],
+        "custom_model_identifiers": model.custom_model_identifiers,
+        "single_model_ids": model.single_model_ids,
+        "single_model_biomass_reaction_ids": (
+            model.single_model_biomass_reaction_ids
+        ),
+        "reaction_owners": model._reaction_owners,
+        "species_owners": model._species_owners,
+        "check_gene_activity": model.__check_gene_activity__,
+    }
+
+    numpy.savez(
+        path,
+        metadata=numpy.array(json.dumps(metadata)),
+        species_boundary=numpy.array(
+            [bool(s.is_boundary) for s in model.species], dtype=bool
+        ),
+        reaction_reversible=numpy.array(
+            [bool(r.reversible) for r in model.reactions], dtype=bool
+        ),
+        reaction_exchange=numpy.array(
+            [bool(r.is_exchange) for r in model.reactions], dtype=bool
+        ),
+        stoichiometry_rows=numpy.array(rows, dtype=numpy.int64),
+        stoichiometry_columns=numpy.array(columns, dtype=numpy.int64),
+        stoichiometry_coefficients=numpy.array(coefficients, dtype=float),
+        flux_bound_values=numpy.array(
+            [
+                numpy.nan if fb.getValue() is None else fb.getValue()
+                for fb in model.flux_bounds
+            ],
+            dtype=float,
+        ),
+    )
+
+
+def load_snapshot(path) -> CommunityModel:
+    """Load a community model saved by ``save_snapshot``.
+
+    Args:
+        path (str or file): The snapshot file.
+
+    Raises:
+        ValueError: If the file was written by an unknown snapshot version.
+
+    Returns:
+        CommunityModel: The community model
+    """
+    with numpy.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+
+    metadata = json.loads(arrays["metadata"].item())
+    if metadata["version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unknown snapshot version {metadata['version']}, "
+            f"expected {FORMAT_VERSION}"
+        )
+
+    return _build_model(metadata, arrays)
+
+
+def _build_model(metadata: dict, arrays: dict) -> CommunityModel:
+    """Create the community model from the content of a snapshot.
+
+    cbmpy validates the id of a new compartment, species, reaction or gene
+    by executing it as Python code. These objects are created with
+    ``_PLACEHOLDER_ID`` and get their own id, which was validated when the
+    model was built, afterwards.
+    """
+    model = CommunityModel([], [], [], metadata["id"])
+    model.setName(metadata["name"])
+
+    existing = set(model.getCompartmentIds())
+    for cid, name, size, dimensions in metadata["compartments"]:
+        if cid not in existing:
+            if name is None:
+                name = cid
+            compartment = Compartment(_PLACEHOLDER_ID, name, size, dimensions)
+            compartment.id = cid
+            model.addCompartment(compartment)
+
+    species_ids = []
+    boundaries = arrays["species_boundary"].tolist()
+    for i, values in enumerate(metadata["species"]):
+        sid, name, compartment, charge, formula, sbo = values
+        species = Species(
+            _PLACEHOLDER_ID,
+            boundary=boundaries[i],
+            name=name,
+            compartment=compartment,
+            charge=charge,
+            chemFormula=formula,
+        )
+        species.id = sid
+        if sbo is not None:
+            species.setSBOterm(sbo)
+        model.addSpecies(species)
+        species_ids.append(sid)
+
+    reactions = []
+    reversible = arrays["reaction_reversible"].tolist()
+    exchange = arrays["reaction_exchange"].tolist()
+    for j, (rid, name, sbo) in enumerate(metadata["reactions"]):
+        reaction = Reaction(
+            _PLACEHOLDER_ID, name=name, reversible=reversible[j]
+        )
+        reaction.id = rid
+        reaction.is_exchange = exchange[j]
+        if sbo is not None:
+            reaction.setSBOterm(sbo)
+        reactions.append(reaction)
+
+    for reagent_id, row, column, coefficient in zip(
+        metadata["reagents"],
+        arrays["stoichiometry_rows"].tolist(),
+        arrays["stoichiometry_columns"].tolist(),
+        arrays["stoichiometry_coefficients"].tolist(),
+    ):
+        reagent = Reagent(reagent_id, species_ids[row], coefficient)
+        reactions[column].reagents.append(reagent)
+
+    for reaction in reactions:
+        model.addReaction(reaction, create_default_bounds=False, silent=True)
+
+    existing_bounds = set()
+    for (fid, rid, operation), value in zip(
+        metadata["flux_bounds"], arrays["flux_bound_values"].tolist()
+    ):
+        value = None if numpy.isnan(value) else value
+        model.addFluxBound(
+            FluxBound(fid, rid, operation, value), fbexists=existing_bounds
+        )
+
+    for oid, operation, flux_objectives in metadata["objectives"]:
+        objective = Objective(oid, operation)
+        model.addObjective(objective)
+        for fid, rid, coefficient in flux_objectives:
+            objective.addFluxObjective(FluxObjective(fid, rid, coefficient))
+    if metadata["active_objective"] is not None:
+        model.activeObjIdx = metadata["active_objective"]
+        model.obj_func = model.objectives[model.activeObjIdx]
+
+    for uid, lb, ub, components in metadata["user_defined_constraints"]:
+        udc = UserDefinedConstraint(uid, lb, ub)
+        for cid, coefficient, variable, ctype in components:
+            udc.addConstraintComponent(
+                udc.createConstraintComponent(
+                    cid, coefficient, variable, ctype
+                )
+            )
+        model.addUserDefinedConstraint(udc)
+
+    for gid, label, active in metadata["genes"]:
+        if label is None:
+            label = gid
+        gene = Gene(_PLACEHOLDER_ID, label=label, active=active)
+        gene.id = gid
+        model.addGene(gene)
+
+    for gpid, protein, name, tree, generefs in metadata["gpr"]:
+        gpr = GeneProteinAssociation(gpid, protein)
+        model.addGPRAssociation(gpr, update_idx=False)
+        gpr.setName(name)
+        for gid in generefs:
+            gpr.addGeneref(gid)
+        if tree is not None:
+            gpr.setTree(tree)
+            gpr.buildEvalFunc()
+    model.__updateGeneIdx__()
+
+    model._custom_model_identifiers = metadata["custom_model_identifiers"]
+    model._single_model_ids = metadata["single_model_ids"]
+    model._single_model_biomass_reaction_ids = metadata[
+        "single_model_biomass_reaction_ids"
+    ]
+    model._reaction_owners = metadata["reaction_owners"]
+    model._species_owners = metadata["species_owners"]
+    model.__check_gene_activity__ = metadata["check_gene_activity"]
+
+    return model
@@ -0,0 +1,192 @@
+"""Cache of EndPointFBA solutions, used by the searches in OptimalSearch.
+
+The result of an EndPointFBA simulation only depends on the community model,
+the number of time points, the time step and the initial biomasses and
+concentrations. ``solve_key`` hashes these values into a key, so solutions
+can be shared between searches on the same community and never between
+different communities or conditions. The cache keeps the most recently used
+solutions in memory and can also store every solution in a directory, to
+reuse solutions across runs.
+"""
+import hashlib
+import json
+import math
+import os
+import tempfile
+from collections import OrderedDict
+
+from cbmpy.CBModel import Model
+
+
+def model_fingerprint(model: Model) -> str:
+    """Hash the content of a (community) model that determines the
+    EndPointFBA solution: the species, the stoichiometry and bounds of the
+    reactions and, for a CommunityModel, the organisms and their biomass
+    reactions.
+
+    Args:
+        model (Model): The model.
+
+    Returns:
+        str: The hexadecimal SHA-256 hash of the model
+    """
+    digest = hashlib.sha256()
+
+    def add(*values) -> None:
+        digest.update(repr(values).encode())
+
+    for species in model.species:
+        add(species.getId(), species.getCompartmentId(), species.is_boundary)
+
+    for reaction in model.reactions:
+        add(
+            reaction.getId(),
+            bool(reaction.is_exchange),
+            float(reaction.getLowerBound()),
+            float(reaction.getUpperBound()),
+            sorted(
+                (sid, float(coefficient))
+                for coefficient, sid in reaction.getStoichiometry()
+            ),
+        )
+
+    if hasattr(model, "get_model_biomass_ids"):
+        add(sorted(model.get_model_biomass_ids().items()))
+
+    return digest.hexdigest()
+
+
+def solve_key(
+    fingerprint: str,
+    n: int,
+    dt: float,
+    initial_biomasses: dict[str, float],
+    initial_concentrations: dict[str, float],
+) -> str:
+    """Create the cache key of an EndPointFBA simulation.
+
+    Args:
+        fingerprint (str): The ``model_fingerprint`` of the community model.
+        n (int): Number of time points.
+        dt (float): Size of the time step.
+        initial_biomasses (dict[str, float]): Initial biomass of each
+            organism.
+        initial_concentrations (dict[str, float]): Initial concentrations of
+            the metabolites.
+
+    Returns:
+        str: The key, independent of the order of the dictionaries
+    """
+    content = json.dumps(
+        [
+            fingerprint,
+            int(n),
+            float(dt),
+            sorted((k, float(v)) for k, v in initial_biomasses.items()),
+            sorted((k, float(v)) for k, v in initial_concentrations.items()),
+        ]
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class SolveCache:
+    """Least recently used cache of objective values, optionally backed by a
+    directory with one file per solution.
+
+    Attributes:
+        maxsize (int): Number of solutions kept in memory.
+        path (str): Directory in which the solutions are stored, None to
+            only keep them in memory.
+    """
+
+    def __init__(self, maxsize: int = 128, path: str = None) -> None:
+        """Initialize the cache.
+
+        Args:
+            maxsize (int, optional): Number of solutions kept in memory.
+                Defaults to 128.
+            path (str, optional): Directory in which the solutions are
+                stored, it is created if it does not exist. Defaults to None,
+                memory only.
+
+        Raises:
+            ValueError: If maxsize is smaller than 1.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize should be at least 1")
+
+        self.maxsize = maxsize
+        self.path = path
+        self._values: OrderedDict[str, float] = OrderedDict()
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def get(self, key: str, default: float = None) -> float:
+        """Return the cached value of a key, or default if it is unknown.
+
+        Args:
+            key (str): The key, see ``solve_key``.
+            default (float, optional): Returned for unknown keys.
+                Defaults to None.
+
+        Returns:
+            float: The cached objective value
+        """
+        if key in self._values:
+            self._values.move_to_end(key)
+            return self._values[key]
+
+        value = self._read(key)
+        if value is None:
+            return default
+
+        self._remember(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Remove all solutions from memory, stored files are kept."""
+        self._values.clear()
+
+    def _remember(self, key: str, value: float) -> None:
+        self._values[key] = value
+        self._values.move_to_end(key)
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def _read(self, key: str) -> float:
+        if self.path is None or not os.path.exists(self._file(key)):
+            return None
+        with open(self._file(key)) as file:
+            value = json.load(file)["value"]
+        return math.nan if value is None else float(value)
+
+    def _write(self, key: str, value: float) -> None:
+        # Write to a temporary file first, so concurrent runs never read a
+        # partially written solution
+        data = {"value": None if math.isnan(value) else value}
+        descriptor, temporary = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(data, file)
+        os.replace(temporary, self._file(key))
+
+    def __getitem__(self, key: str) -> float:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: float) -> None:
+        value = float(value)
+        self._remember(key, value)
+        if self.path is not None:
+            self._write(key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._values)
@@ -0,0 +1,170 @@
+"""Solve the FBA problems of several independent models in worker processes.
+
+Each worker process owns a fixed subset of the models and keeps a
+``SolverSession`` for each of them alive for the whole simulation, so the LP
+of a model is built once and re-solved warm in the same process every step.
+Per step only the bound vectors are sent to the workers and only the flux
+vectors are sent back.
+"""
+import multiprocessing
+import traceback
+
+import numpy
+from cbmpy.CBModel import Model
+
+from .SolverSession import SolverSession, read_bounds
+from .Serialization import dumps_model, dumps_models, loads_model
+
+
+class SolverPool:
+    """Pool of worker processes solving the LP of a fixed set of models.
+
+    Attributes:
+        processes (int): Number of worker processes.
+    """
+
+    def __init__(self, models: dict[str, Model], processes: int) -> None:
+        """Start the workers and send each its share of the models.
+
+        Args:
+            models (dict[str, Model]): Model id followed by the model.
+            processes (int): Number of worker processes, at most the number
+                of models are started.
+        """
+        self._models = models
+        self.processes = max(1, min(processes, len(models)))
+
+        context = multiprocessing.get_context("spawn")
+        self._connections = []
+        self._workers = []
+        self._assignment: dict[str, int] = {}
+        self._reactions: dict[str, list] = {}
+        self._index: dict[str, dict[str, int]] = {}
+
+        shares = [{} for _ in range(self.processes)]
+        for i, (mid, model) in enumerate(models.items()):
+            shares[i % self.processes][mid] = model
+            self._assignment[mid] = i % self.processes
+            self._set_reaction_index(mid, model)
+
+        for share in shares:
+            data = dict(zip(share.keys(), dumps_models(share.values())))
+            connection, child = context.Pipe()
+            worker = context.Process(
+                target=_work, args=(child, data), daemon=True
+            )
+            worker.start()
+            child.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    def solve(self) -> dict[str, tuple[float, dict[str, float]]]:
+        """Solve all models with their current bounds.
+
+        Models whose reactions changed since the last solve, for example by
+        a deviate function, are first send to their worker again.
+
+        Returns:
+            dict[str, tuple[float, dict[str, float]]]: For each model id the
+                objective value (NaN if not optimal) and the flux of each
+                reaction
+        """
+        requests = [{} for _ in range(self.processes)]
+        for mid, model in self._models.items():
+            if self._reactions_changed(mid, model):
+                self._set_reaction_index(mid, model)
+                self._send(
+                    self._assignment[mid], ("model", mid, dumps_model(model))
+                )
+
+            lb, ub = read_bounds(model, self._index[mid])
+            requests[self._assignment[mid]][mid] = (lb, ub)
+
+        for worker, request in enumerate(requests):
+            self._send(worker, ("solve", request))
+
+        results = {}
+        for worker in range(self.processes):
+            results.update(self._receive(worker))
+
+        solutions = {}
+        for mid in self._models.keys():
+            objective, fluxes = results[mid]
+            rids = self._index[mid].keys()
+            solutions[mid] = (objective, dict(zip(rids, fluxes.tolist())))
+        return solutions
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        for connection in self._connections:
+            try:
+                connection.send(("close",))
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._connections = []
+        self._workers = []
+
+    def _set_reaction_index(self, mid: str, model: Model) -> None:
+        self._reactions[mid] = list(model.reactions)
+        self._index[mid] = {
+            r.getId(): i for i, r in enumerate(self._reactions[mid])
+        }
+
+    def _reactions_changed(self, mid: str, model: Model) -> bool:
+        reactions = self._reactions[mid]
+        if len(reactions) != len(model.reactions):
+            return True
+        return any(r is not s for r, s in zip(model.reactions, reactions))
+
+    def _send(self, worker: int, message: tuple) -> None:
+        self._connections[worker].send(message)
+
+    def _receive(self, worker: int) -> dict:
+        status, result = self._connections[worker].recv()
+        if status == "error":
+            raise RuntimeError(f"Solver worker {worker} failed:\n{result}")
+        return result
+
+    def __enter__(self) -> "SolverPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        if self._workers:
+            self.close()
+
+
+def _work(connection, data: dict[str, bytes]) -> None:
+    """Main loop of a worker process, keeps one SolverSession per model."""
+    sessions = {
+        mid: SolverSession(loads_model(model)) for mid, model in data.items()
+    }
+
+    while True:
+        message = connection.recv()
+        if message[0] == "close":
+            break
+
+        try:
+            if message[0] == "model":
+                _, mid, model = message
+                sessions[mid] = SolverSession(loads_model(model))
+                continue
+
+            results = {}
+            for mid, (lb, ub) in message[1].items():
+                session = sessions[mid]
+                objective = session.solve(lb, ub)
+                results[mid] = (objective, numpy.asarray(session.fluxes))
+            connection.send(("ok", results))
+        except Exception:
+            connection.send(("error", traceback.format_exc()))
+
+    connection.close()
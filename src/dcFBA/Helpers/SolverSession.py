@@ -0,0 +1,400 @@
+"""Persistent LP solver session for repeated FBA solves on the same model.
+
+The dynamic methods solve the same linear program thousands of times, only
+changing the reaction bounds between two time steps. ``cbmpy.doFBA``
+rebuilds the stoichiometric matrix and a new solver problem on every call.
+A ``SolverSession`` builds the LP once, pushes only the bounds that changed
+since the previous solve and re-solves starting from the previous optimal
+basis.
+"""
+import math
+from typing import Callable
+
+import numpy
+from cbmpy.CBConfig import __CBCONFIG__
+from cbmpy.CBModel import Model
+
+
+class SolverSession:
+    """Keeps a solver LP alive for a cbmpy model whose bounds change.
+
+    The LP is (re)built on the first solve and whenever the reactions or the
+    active objective of the model change. Changes to the stoichiometry that
+    keep the same reactions (e.g. adding a reagent) are not detected, call
+    ``invalidate()`` after such changes.
+
+    Attributes:
+        model (Model): The model this session solves.
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        method: str = None,
+        build_matrices: Callable[[], None] = None,
+        bounds: Callable[
+            [dict[str, int]], tuple[numpy.ndarray, numpy.ndarray]
+        ] = None,
+    ) -> None:
+        """Initialize the session, the LP is not build until the first solve.
+
+        Args:
+            model (Model): The cbmpy model to solve.
+            method (str, optional): Solver method passed to the cbmpy solve
+                function. Defaults to None, the cbmpy default of the active
+                solver.
+            build_matrices (Callable[[], None], optional): Function that sets
+                the stoichiometric and constraint matrix (``model.N`` and
+                ``model.CM``), called instead of ``model.buildStoichMatrix``
+                when the LP is built. Defaults to None.
+            bounds (Callable, optional): Function that returns the lower and
+                upper bounds of the columns of the LP given the position of
+                each reaction id, used instead of the flux bounds of the
+                model. Use this when the matrices have columns that are not
+                reactions of the model. Defaults to None.
+        """
+        self._model = model
+        self._method = method
+        self._build_matrices = build_matrices
+        self._bounds = bounds
+        self._solver: str = __CBCONFIG__["SOLVER_ACTIVE"]
+        self._lp = None
+        self._objective_id: str = None
+        self._objective: dict[int, float] = {}
+        self._rids: list[str] = []
+        self._reactions = []
+        self._columns = numpy.empty(0, dtype=int)
+        self._index: dict[str, int] = {}
+        self._lb = numpy.empty(0)
+        self._ub = numpy.empty(0)
+        self._fluxes = numpy.empty(0)
+        self._objective_value = numpy.nan
+        self._n_builds = 0
+
+    @property
+    def model(self) -> Model:
+        return self._model
+
+    @property
+    def reaction_ids(self) -> list[str]:
+        """Reaction ids in the order of the flux vector."""
+        return self._rids
+
+    @property
+    def fluxes(self) -> numpy.ndarray:
+        """The flux vector of the last solve."""
+        return self._fluxes
+
+    @property
+    def objective_value(self) -> float:
+        """The objective value of the last solve, NaN if not optimal."""
+        return self._objective_value
+
+    @property
+    def n_builds(self) -> int:
+        """Number of times the LP was built in this session."""
+        return self._n_builds
+
+    def invalidate(self) -> None:
+        """Discard the current LP, it is rebuilt on the next solve."""
+        self._lp = None
+
+    def set_coefficient(
+        self, constraint_id: str, rid: str, coefficient: float
+    ) -> None:
+        """Change the coefficient of a reaction in a constraint of the LP,
+        keeping the current basis for the next solve.
+
+        Only the LP is changed, change the constraint of the model as well
+        so the coefficient is kept when the LP is built again.
+
+        Args:
+            constraint_id (str): The id of the constraint, e.g. of a user
+                defined constraint.
+            rid (str): The reaction id.
+            coefficient (float): The new coefficient.
+        """
+        if self._lp is None:
+            return
+
+        if self._solver == "CPLEX":
+            self._lp.linear_constraints.set_coefficients(
+                constraint_id, rid, coefficient
+            )
+        else:
+            import swiglpk as sw
+
+            sw.glp_create_index(self._lp)
+            row = sw.glp_find_row(self._lp, constraint_id)
+            length = sw.glp_get_mat_row(self._lp, row, None, None)
+            indices = sw.intArray(length + 2)
+            values = sw.doubleArray(length + 2)
+            sw.glp_get_mat_row(self._lp, row, indices, values)
+
+            row_values = {indices[k]: values[k] for k in range(1, length + 1)}
+            row_values[sw.glp_find_col(self._lp, rid)] = coefficient
+
+            for k, (column, value) in enumerate(row_values.items(), start=1):
+                indices[k] = column
+                values[k] = value
+            sw.glp_set_mat_row(self._lp, row, len(row_values), indices, values)
+
+    def set_objective(
+        self, coefficients: dict[str, float], sense: str = "maximize"
+    ) -> None:
+        """Replace the objective of the LP, keeping the current basis for
+        the next solve. The LP is built first if needed.
+
+        Only the LP is changed, the objective of the model is used again
+        when the LP is rebuilt.
+
+        Args:
+            coefficients (dict[str, float]): Reaction id followed by its
+                coefficient in the objective.
+            sense (str, optional): "maximize" or "minimize".
+                Defaults to "maximize".
+        """
+        if self._needs_build():
+            self._build()
+
+        # Only the coefficients that change are sent to the solver
+        objective = {self._index[rid]: c for rid, c in coefficients.items()}
+        changes = {i: 0.0 for i in self._objective}
+        changes.update(objective)
+        self._objective = objective
+
+        if self._solver == "CPLEX":
+            lp = self._lp
+            lp.objective.set_linear(list(changes.items()))
+            if sense == "minimize":
+                lp.objective.set_sense(lp.objective.sense.minimize)
+            else:
+                lp.objective.set_sense(lp.objective.sense.maximize)
+        else:
+            import swiglpk as sw
+
+            for i, coefficient in changes.items():
+                sw.glp_set_obj_coef(self._lp, i + 1, coefficient)
+            sw.glp_set_obj_dir(
+                self._lp, sw.GLP_MIN if sense == "minimize" else sw.GLP_MAX
+            )
+
+    def get_solution(self) -> dict[str, float]:
+        """Return the last solution as a reaction id to flux dictionary.
+
+        Returns:
+            dict[str, float]: The flux value of each reaction
+        """
+        return dict(zip(self._rids, self._fluxes.tolist()))
+
+    def solve(
+        self, lb: numpy.ndarray = None, ub: numpy.ndarray = None
+    ) -> float:
+        """Solve the LP with the current bounds of the model.
+
+        Like ``cbmpy.doFBA`` the solution is also written to the reactions
+        and the active objective of the model.
+
+        Args:
+            lb (numpy.ndarray, optional): Lower bounds in the order of
+                ``reaction_ids`` to use instead of the bounds of the model.
+            ub (numpy.ndarray, optional): Upper bounds in the order of
+                ``reaction_ids`` to use instead of the bounds of the model.
+
+        Returns:
+            float: The objective value, NaN if no optimal solution was found
+        """
+        if self._needs_build():
+            self._build()
+
+        if lb is None or ub is None:
+            lb, ub = self._read_bounds()
+        self._push_bounds(
+            numpy.asarray(lb, dtype=float), numpy.asarray(ub, dtype=float)
+        )
+
+        if self._solver == "CPLEX":
+            optimal, objective, fluxes = self._solve_cplex()
+        else:
+            optimal, objective, fluxes = self._solve_glpk()
+
+        self._fluxes = fluxes
+        self._objective_value = objective if optimal else numpy.nan
+        self._set_solution_to_model(optimal)
+
+        return self._objective_value
+
+    def _needs_build(self) -> bool:
+        if self._lp is None:
+            return True
+
+        objective = self.model.getActiveObjective()
+        if objective is None or objective.getId() != self._objective_id:
+            return True
+
+        reactions = self.model.reactions
+        if len(reactions) != len(self._reactions):
+            return True
+
+        return any(r is not s for r, s in zip(reactions, self._reactions))
+
+    def _build(self) -> None:
+        """Build the stoichiometric matrix and the solver LP."""
+        model = self.model
+        if self._build_matrices is not None:
+            self._build_matrices()
+        else:
+            model.buildStoichMatrix()
+
+        if model.__check_gene_activity__:
+            model.updateNetwork(lower=0.0, upper=0.0)
+            model.__check_gene_activity__ = False
+
+        if self._solver == "CPLEX":
+            from cbmpy import CBCPLEX
+
+            self._lp = CBCPLEX.cplx_constructLPfromFBA(model)
+            CBCPLEX.cplx_setOutputStreams(self._lp, mode=None)
+        else:
+            from cbmpy import CBGLPK
+
+            self._lp = CBGLPK.glpk_constructLPfromFBA(model)
+
+        self._rids = list(model.N.col)
+        self._index = {rid: i for i, rid in enumerate(self._rids)}
+        self._reactions = list(model.reactions)
+        self._columns = numpy.array(
+            [self._index.get(r.getId(), -1) for r in self._reactions],
+            dtype=int,
+        )
+        self._objective_id = model.getActiveObjective().getId()
+        self._objective = {
+            self._index[fo.getReactionId()]: fo.getCoefficient()
+            for fo in model.getActiveObjective().flux_objectives
+            if fo.getReactionId() in self._index
+        }
+
+        # The construction of the LP already set the bounds of the model,
+        # the bounds of other columns are unknown and all sent on the solve
+        if self._bounds is None:
+            self._lb, self._ub = self._read_bounds()
+        else:
+            self._lb = numpy.full(len(self._rids), numpy.nan)
+            self._ub = numpy.full(len(self._rids), numpy.nan)
+        self._n_builds += 1
+
+    def _read_bounds(self) -> tuple[numpy.ndarray, numpy.ndarray]:
+        if self._bounds is not None:
+            return self._bounds(self._index)
+        return read_bounds(self.model, self._index)
+
+    def _push_bounds(self, lb: numpy.ndarray, ub: numpy.ndarray) -> None:
+        """Only send the bounds that changed since the last solve"""
+        changed = numpy.flatnonzero((lb != self._lb) | (ub != self._ub))
+        if len(changed) == 0:
+            return
+
+        if self._solver == "CPLEX":
+            import cplex
+
+            lower = numpy.clip(lb[changed], -cplex.infinity, cplex.infinity)
+            upper = numpy.clip(ub[changed], -cplex.infinity, cplex.infinity)
+            columns = changed.tolist()
+            self._lp.variables.set_lower_bounds(
+                list(zip(columns, lower.tolist()))
+            )
+            self._lp.variables.set_upper_bounds(
+                list(zip(columns, upper.tolist()))
+            )
+        else:
+            import swiglpk as sw
+
+            for i in changed.tolist():
+                low, up = lb[i], ub[i]
+                if math.isinf(low) and math.isinf(up):
+                    bound_type = sw.GLP_FR
+                elif math.isinf(up):
+                    bound_type = sw.GLP_LO
+                elif math.isinf(low):
+                    bound_type = sw.GLP_UP
+                elif low == up:
+                    bound_type = sw.GLP_FX
+                else:
+                    bound_type = sw.GLP_DB
+                sw.glp_set_col_bnds(self._lp, i + 1, bound_type, low, up)
+
+        self._lb = lb
+        self._ub = ub
+
+    def _solve_cplex(self) -> tuple[bool, float, numpy.ndarray]:
+        from cbmpy import CBCPLEX
+
+        lp = self._lp
+        CBCPLEX.cplx_Solve(lp, self._method or "o")
+
+        if lp.solution.get_solution_type() == lp.solution.type.none:
+            return False, numpy.nan, numpy.full(len(self._rids), numpy.nan)
+
+        optimal = lp.solution.get_status() == lp.solution.status.optimal
+        return (
+            optimal,
+            lp.solution.get_objective_value(),
+            numpy.array(lp.solution.get_values()),
+        )
+
+    def _solve_glpk(self) -> tuple[bool, float, numpy.ndarray]:
+        from cbmpy import CBGLPK
+        import swiglpk as sw
+
+        lp = self._lp
+        CBGLPK.glpk_Solve(lp, self._method or "s")
+
+        optimal = CBGLPK.glpk_getSolutionStatus(lp) == "LPS_OPT"
+        fluxes = numpy.array(
+            [sw.glp_get_col_prim(lp, i + 1) for i in range(len(self._rids))]
+        )
+        return optimal, sw.glp_get_obj_val(lp), fluxes
+
+    def _set_solution_to_model(self, optimal: bool) -> None:
+        """Write the solution to the model in the same way cbmpy does after
+        an FBA"""
+        fluxes = self._fluxes.tolist()
+        for reaction, i in zip(self._reactions, self._columns.tolist()):
+            reaction.value = fluxes[i] if i >= 0 else None
+
+        self.model.getActiveObjective().value = self._objective_value
+        self.model.SOLUTION_STATUS = "LPS_OPT" if optimal else "LPS_NONE"
+
+
+def read_bounds(
+    model: Model, index: dict[str, int]
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Collect the bounds of all reactions in a single pass over the flux
+    bounds of the model.
+
+    Args:
+        model (Model): The cbmpy model.
+        index (dict[str, int]): Position of each reaction id in the result.
+
+    Returns:
+        tuple[numpy.ndarray, numpy.ndarray]: lower and upper bounds in the
+            order of the index
+    """
+    lb = numpy.full(len(index), -numpy.inf)
+    ub = numpy.full(len(index), numpy.inf)
+
+    for bound in model.flux_bounds:
+        i = index.get(bound.reaction)
+        if i is None:
+            continue
+        value = float(bound.getValue())
+        bound_type = bound.getType()
+        if bound_type == "lower":
+            lb[i] = value
+        elif bound_type == "upper":
+            ub[i] = value
+        elif bound_type == "equality":
+            lb[i] = value
+            ub[i] = value
+
+    return lb, ub
@@ -0,0 +1,111 @@
+"""Step size control for the dynamic FBA simulations.
+
+With a fixed time step the step has to be small enough for the moment a
+substrate runs out, which wastes many LP solves while the substrates are
+still plentiful. The ``StepSizeController`` accepts a step when no external
+metabolite loses more than a relative tolerance of its concentration, shrinks
+the step when it does and grows the step again afterwards.
+"""
+import math
+
+
+class StepSizeController:
+    """Adaptive time step controller based on the relative depletion of the
+    external metabolites.
+
+    The relative depletion of a step is the largest fraction of its
+    concentration any metabolite loses in that step:
+    max(-v_ex * dt / S). Metabolites with a concentration below ``atol`` are
+    considered depleted and do not limit the step size.
+
+    Attributes:
+        rtol (float): Maximal relative depletion of an accepted step.
+        atol (float): Concentration below which a metabolite is depleted.
+        dt_min (float): Smallest step size, always accepted.
+        dt_max (float): Largest step size.
+        safety (float): Factor applied to the predicted step size.
+        max_growth (float): Maximal factor by which the step grows.
+        min_shrink (float): Minimal factor by which a step shrinks.
+    """
+
+    def __init__(
+        self,
+        rtol: float = 0.1,
+        atol: float = 1e-6,
+        dt_min: float = 1e-4,
+        dt_max: float = math.inf,
+        safety: float = 0.9,
+        max_growth: float = 2.0,
+        min_shrink: float = 0.1,
+    ) -> None:
+        """Initialize the controller.
+
+        Args:
+            rtol (float, optional): Maximal relative depletion of an accepted
+                step. Defaults to 0.1.
+            atol (float, optional): Concentration below which a metabolite is
+                considered depleted. Defaults to 1e-6.
+            dt_min (float, optional): Smallest step size. Defaults to 1e-4.
+            dt_max (float, optional): Largest step size. Defaults to inf.
+            safety (float, optional): Factor applied to the predicted step
+                size. Defaults to 0.9.
+            max_growth (float, optional): Maximal factor by which the step
+                grows after an accepted step. Defaults to 2.0.
+            min_shrink (float, optional): Minimal factor by which the step
+                shrinks after a rejected step. Defaults to 0.1.
+
+        Raises:
+            ValueError: If the tolerances or step sizes are not valid.
+        """
+        if rtol <= 0 or rtol > 1:
+            raise ValueError("rtol should be in (0, 1]")
+        if dt_min <= 0 or dt_max < dt_min:
+            raise ValueError("Expected 0 < dt_min <= dt_max")
+        if not 0 < safety <= 1 or max_growth < 1 or not 0 < min_shrink <= 1:
+            raise ValueError("Invalid safety, max_growth or min_shrink factor")
+
+        self.rtol = rtol
+        self.atol = atol
+        self.dt_min = dt_min
+        self.dt_max = dt_max
+        self.safety = safety
+        self.max_growth = max_growth
+        self.min_shrink = min_shrink
+
+    def clip(self, dt: float) -> float:
+        """Clip a step size to [dt_min, dt_max]"""
+        return min(max(dt, self.dt_min), self.dt_max)
+
+    def accept(self, dt: float, depletion: float) -> bool:
+        """Check if a step is accepted
+
+        Args:
+            dt (float): The step size used.
+            depletion (float): The relative depletion of the step.
+
+        Returns:
+            bool: True if the depletion is within the tolerance or the step
+                can not shrink any further
+        """
+        return depletion <= self.rtol or dt <= self.dt_min
+
+    def next_step(self, dt: float, depletion: float) -> float:
+        """Predict the next step size.
+
+        The depletion scales linearly with the step size, so the step for
+        which the depletion equals ``rtol`` is dt * rtol / depletion.
+
+        Args:
+            dt (float): The step size used.
+            depletion (float): The relative depletion of the step.
+
+        Returns:
+            float: The new step size
+        """
+        if depletion <= 0:
+            factor = self.max_growth
+        else:
+            factor = self.safety * self.rtol / depletion
+            factor = min(max(factor, self.min_shrink), self.max_growth)
+
+        return self.clip(dt * factor)
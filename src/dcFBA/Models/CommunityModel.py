@@ -2,7 +2,7 @@
 # TODO write the new properties of community model so a sbml file and import the community model
 
 import copy
-from cbmpy.CBModel import Model, Species
+from cbmpy.CBModel import Model
 from ..Helpers import BuildCommunityMatrix as cm
 from ..Exceptions import NotInCombinedModel
 
@@ -18,6 +18,11 @@ class CommunityModel(Model):
         m_single_model_ids (list[str]): List of IDs of the individual models.
         m_single_model_biomass_reaction_ids (list[str]): List of biomass
             reaction IDs of the individual models.
+
+    The community keeps an index of the organism each reaction and species
+    belongs to, it is updated when a model is added or removed. Exchange
+    reactions and extracellular species are shared and do not belong to an
+    organism.
     """
 
     def __init__(
@@ -31,7 +36,9 @@ class CommunityModel(Model):
         Initialize a CommunityModel instance.
 
         Args:
-            models (list[Model]): List of individual models to combine.
+            models (list[Model]): List of individual models to combine. The
+                models are not modified, so they can be reused in other
+                communities.
             biomass_reaction_ids (list[str]): List of biomass reaction IDs for
                 each individual model.
             ids (list[str], optional): List of user-specified identifiers for
@@ -58,6 +65,9 @@ class CommunityModel(Model):
 
         self.createCompartment("e", "extracellular space")
 
+        self._reaction_owners: dict[str, str] = {}
+        self._species_owners: dict[str, str] = {}
+
         duplicate_species = cm.create_duplicate_species_dict(models)
 
         # Save biomass reaction id of old model, make sure
@@ -75,8 +85,8 @@ class CommunityModel(Model):
             new_id = self.custom_model_identifiers[i]
             cm.merge_genes(model, self, new_id)
             cm.merge_compartments(model, self, new_id)
-            cm.merge_species(duplicate_species, model, new_id)
-            cm.merge_reactions(model, self, new_id)
+            species_ids = cm.map_species(duplicate_species, model, new_id)
+            self._merge_and_index_reactions(model, new_id, species_ids)
             cm.setGeneProteinAssociations(model, self, new_id)
 
         self.__check_gene_activity__ = any([m.__check_gene_activity__ for m in models])
@@ -122,6 +132,8 @@ class CommunityModel(Model):
             self.single_model_biomass_reaction_ids
         )
         new_instance._single_model_ids = copy.deepcopy(self.single_model_ids)
+        new_instance._reaction_owners = dict(self._reaction_owners)
+        new_instance._species_owners = dict(self._species_owners)
 
         return new_instance
 
@@ -147,8 +159,8 @@ class CommunityModel(Model):
         duplicate_species = cm.create_duplicate_species_dict([self, model])
 
         cm.merge_compartments(model, self, new_id)
-        cm.merge_species(duplicate_species, model, new_id)
-        cm.merge_reactions(model, self, new_id)
+        species_ids = cm.map_species(duplicate_species, model, new_id)
+        self._merge_and_index_reactions(model, new_id, species_ids)
 
         self.custom_model_identifiers.append(new_id)
         self.single_model_ids.append(model.id)
@@ -174,14 +186,11 @@ class CommunityModel(Model):
 
         mid = self.custom_model_identifiers[index]
 
-        for rid in self.getReactionIds():
-            if mid in rid:
-                self.deleteReactionAndBounds(rid)
+        for rid in self.get_model_specific_reactions(mid):
+            self.deleteReactionAndBounds(rid)
 
-        for sid in self.getSpeciesIds():
-            species: Species = self.getSpecies(sid)
-            if mid in species.getCompartmentId():
-                self.deleteSpecies(sid)
+        for sid in self.get_model_specific_species(mid):
+            self.deleteSpecies(sid)
 
         self.custom_model_identifiers.remove(mid)
         del self.single_model_ids[index]
@@ -208,11 +217,11 @@ class CommunityModel(Model):
             raise NotInCombinedModel(
                 "The model id provided was not found in the combined model"
             )
-        ans = []
-        for rid in self.getReactionIds():
-            if mid in rid:
-                ans.append(rid)
-        return ans
+        return [
+            rid
+            for rid in self.getReactionIds()
+            if self.identify_model_from_reaction(rid) == mid
+        ]
 
     def get_model_specific_species(self, mid: str) -> list[str]:
         """
@@ -233,12 +242,11 @@ class CommunityModel(Model):
             raise NotInCombinedModel(
                 "The model id provided was not found in the combined model"
             )
-        ans = []
-        for species_id in self.m_model.getSpeciesIds():
-            species: Species = self.m_model.getSpecies(species_id)
-            if mid in species.getCompartmentId():
-                ans.append(species_id)
-        return ans
+        return [
+            sid
+            for sid in self.getSpeciesIds()
+            if self.identify_model_from_species(sid) == mid
+        ]
 
     def get_reaction_bigg_ids(self, mid="") -> list[str]:
         """Get the reaction BIGG IDs of all reactions
@@ -309,12 +317,50 @@ class CommunityModel(Model):
             rid (str): reaction id of the kinetic model
 
         Returns:
-            str: id of the old model
+            str: id of the old model, "" if the reaction is shared or unknown
         """
-        for old_id in self.custom_model_identifiers:
-            if f"_{old_id}" in rid:
-                return old_id
-        return ""
+        if rid in self._reaction_owners:
+            return self._reaction_owners[rid]
+
+        return self._match_model_identifier(rid)
+
+    def identify_model_from_species(self, sid: str) -> str:
+        """Given a species id get the single model this species belonged to
+
+        Args:
+            sid (str): species id in the community model
+
+        Returns:
+            str: id of the old model, "" if the species is shared or unknown
+        """
+        if sid in self._species_owners:
+            return self._species_owners[sid]
+
+        return self._match_model_identifier(sid)
+
+    def __popGlobalId__(self, sid: str) -> None:
+        """Remove a deleted object from the model and from the organism
+        index. Every deletion of cbmpy and of the helpers passes here, so
+        the index never refers to deleted reactions or species."""
+        super().__popGlobalId__(sid)
+        self._reaction_owners.pop(sid, None)
+        self._species_owners.pop(sid, None)
+
+    def _match_model_identifier(self, object_id: str) -> str:
+        """Find the model of an id that is not in the index, such as the
+        reactions of a time-expanded model or reactions created afterwards.
+        The identifier has to be a complete part of the id, when several
+        identifiers match the longest one is returned."""
+        parts = object_id.split("_")
+        best = ""
+        for mid in self.custom_model_identifiers:
+            size = len(mid.split("_"))
+            for i in range(1, len(parts) - size + 1):
+                if "_".join(parts[i : i + size]) == mid:
+                    if len(mid) > len(best):
+                        best = mid
+                    break
+        return best
 
     def identify_biomass_reaction_for_model(self, mid: str) -> list[str]:
         """Given a model id return the biomass reaction
@@ -341,6 +387,24 @@ class CommunityModel(Model):
             return ""
         return self.identify_biomass_reaction_for_model(model_id)
 
+    def _merge_and_index_reactions(
+        self, model: Model, mid: str, species_ids: dict[str, tuple[str, str]]
+    ) -> None:
+        """Merge the reactions of a model and add the reactions and the
+        species it created to the index of that model."""
+        n_reactions = len(self.reactions)
+        n_species = len(self.species)
+
+        cm.merge_reactions(model, self, mid, species_ids)
+
+        for reaction in self.reactions[n_reactions:]:
+            if not reaction.is_exchange:
+                self._reaction_owners[reaction.getId()] = mid
+
+        for species in self.species[n_species:]:
+            if species.compartment not in cm.extracellular_compartments:
+                self._species_owners[species.getId()] = mid
+
     def get_model_biomass_ids(self) -> dict[str, str]:
         return dict(
             zip(
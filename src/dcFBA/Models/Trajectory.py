@@ -0,0 +1,209 @@
+from collections.abc import MutableMapping, Sequence
+import numpy
+
+
+class Trajectory(MutableMapping):
+    """
+    Growable, NumPy backed storage of values over time.
+
+    The values are stored in a preallocated (time x id) array which doubles
+    in size when it is full. Indexing the trajectory with an id returns the
+    values of that id over time as a NumPy view, so
+
+        trajectory["M_glc__D_e"][-1] = 30
+
+    changes the stored value of the last time point, just like it would for
+    the dictionary of lists that was used before. New time points are added
+    with ``append`` on the trajectory, not on a column, and a view taken
+    before the trajectory grows does not show the values added after it.
+    Use ``to_dict`` for a copy as lists.
+
+    Attributes:
+        ids (list[str]): The ids of the columns, e.g. species or reaction ids.
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        initial_values: list[float] = None,
+        capacity: int = 64,
+    ) -> None:
+        """
+        Initialize the Trajectory.
+
+        Args:
+            ids (list[str]): ids of the stored columns.
+            initial_values (list[float], optional): Values of the first time
+                point. Defaults to None, an empty trajectory.
+            capacity (int, optional): Number of time points for which memory
+                is reserved up front. Defaults to 64.
+        """
+        self._ids: list[str] = list(ids)
+        self._index: dict[str, int] = {id: i for i, id in enumerate(self._ids)}
+        self._data = numpy.zeros((max(capacity, 1), len(self._ids)))
+        self._size = 0
+        self._last_ids = None
+
+        if initial_values is not None:
+            self.append(initial_values)
+
+    @classmethod
+    def from_dict(cls, values: dict[str, list[float]]) -> "Trajectory":
+        """Create a trajectory from a dictionary of equally long lists.
+
+        Args:
+            values (dict[str, list[float]]): id followed by the values over
+                time
+
+        Returns:
+            Trajectory: A trajectory holding the same values
+        """
+        if isinstance(values, Trajectory):
+            return values
+
+        trajectory = cls(list(values.keys()))
+        lengths = {len(v) for v in values.values()}
+        if len(lengths) > 1:
+            raise ValueError(
+                "All ids should have the same number of time points"
+            )
+        if len(values) > 0:
+            for row in numpy.array(list(values.values()), dtype=float).T:
+                trajectory.append(row)
+        return trajectory
+
+    @property
+    def ids(self) -> list[str]:
+        return self._ids
+
+    @property
+    def array(self) -> numpy.ndarray:
+        """All stored values as a (time x id) view."""
+        return self._data[: self._size]
+
+    def index(self, id: str) -> int:
+        """Return the column of an id"""
+        return self._index[id]
+
+    def last(self) -> numpy.ndarray:
+        """Return a view of the values of the last time point"""
+        return self._data[self._size - 1]
+
+    def append(self, values, ids: list[str] = None) -> None:
+        """
+        Add the values of a new time point.
+
+        Args:
+            values (numpy.ndarray | list[float] | dict[str, float]): The new
+                values, in the order of ``ids`` or as id value pairs.
+            ids (list[str], optional): The ids belonging to the values when
+                they are given in a different order than the trajectory.
+                New ids are added as new columns, missing values are NaN.
+                Defaults to None.
+        """
+        if isinstance(values, dict):
+            ids = list(values.keys())
+            values = list(values.values())
+
+        if ids is not None and ids is not self._last_ids:
+            if list(ids) == self._ids:
+                # Same ids as the trajectory, use the fast path from now on
+                self._last_ids = ids
+            else:
+                new_ids = [id for id in ids if id not in self._index]
+                if len(new_ids) > 0:
+                    self._add_columns(new_ids, numpy.nan)
+                row = numpy.full(len(self._ids), numpy.nan)
+                row[[self._index[id] for id in ids]] = values
+                values = row
+
+        if self._size == len(self._data):
+            self._grow()
+
+        self._data[self._size] = values
+        self._size += 1
+
+    def pop(self) -> numpy.ndarray:
+        """Remove and return the values of the last time point"""
+        if self._size == 0:
+            raise IndexError("pop from empty Trajectory")
+        self._size -= 1
+        return self._data[self._size].copy()
+
+    def truncate(self, size: int) -> None:
+        """Only keep the first ``size`` time points"""
+        self._size = max(0, min(size, self._size))
+
+    def row(self, t: int) -> dict[str, float]:
+        """Return the values of time point t as a dictionary"""
+        return dict(zip(self._ids, self.array[t].tolist()))
+
+    def rows(self) -> "TrajectoryRows":
+        """Return the time points as a sequence of dictionaries"""
+        return TrajectoryRows(self)
+
+    def to_dict(self) -> dict[str, list[float]]:
+        """Return the trajectory as a dictionary of lists"""
+        return {
+            id: self.array[:, i].tolist() for i, id in enumerate(self._ids)
+        }
+
+    def _grow(self) -> None:
+        data = numpy.zeros((2 * len(self._data), len(self._ids)))
+        data[: self._size] = self.array
+        self._data = data
+
+    def _add_columns(self, ids: list[str], values) -> None:
+        self._data = numpy.hstack(
+            [self._data, numpy.zeros((len(self._data), len(ids)))]
+        )
+        self._data[: self._size, -len(ids) :] = values
+        for id in ids:
+            self._index[id] = len(self._ids)
+            self._ids.append(id)
+        self._last_ids = None
+
+    def __getitem__(self, id: str) -> numpy.ndarray:
+        return self._data[: self._size, self._index[id]]
+
+    def __setitem__(self, id: str, values) -> None:
+        if id in self._index:
+            self[id][:] = values
+        else:
+            self._add_columns([id], numpy.reshape(values, (-1, 1)))
+
+    def __delitem__(self, id: str) -> None:
+        column = self._index[id]
+        self._data = numpy.delete(self._data, column, axis=1)
+        del self._ids[column]
+        self._index = {id: i for i, id in enumerate(self._ids)}
+        self._last_ids = None
+
+    def __iter__(self):
+        return iter(list(self._ids))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __repr__(self) -> str:
+        return f"Trajectory({len(self._ids)} ids, {self._size} time points)"
+
+
+class TrajectoryRows(Sequence):
+    """Read only view of a Trajectory as a sequence of dictionaries, one for
+    each time point. The dictionaries are created on access."""
+
+    def __init__(self, trajectory: Trajectory) -> None:
+        self._trajectory = trajectory
+
+    def __getitem__(self, t):
+        if isinstance(t, slice):
+            return [self[i] for i in range(*t.indices(len(self)))]
+        if t < 0:
+            t += len(self)
+        if not 0 <= t < len(self):
+            raise IndexError("time point out of range")
+        return self._trajectory.row(t)
+
+    def __len__(self) -> int:
+        return len(self._trajectory.array)
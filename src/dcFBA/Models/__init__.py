@@ -1,3 +1,4 @@
 from dcFBA.Models.KineticsStruct import KineticsStruct
 from dcFBA.Models.Transporters import Transporters
 from dcFBA.Models.CommunityModel import CommunityModel
+from dcFBA.Models.Trajectory import Trajectory
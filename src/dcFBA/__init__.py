@@ -1,10 +1,49 @@
-from dcFBA.DynamicModels import (
-    DynamicSingleFBA,
-    DynamicJointFBA,
-    DynamicParallelFBA,
-    EndPointFBA,
-)
-from dcFBA import Models
-from dcFBA import Helpers
-
-from dcFBA import DefaultModels
+"""Dynamic community FBA.
+
+The submodules and dynamic models are imported on first access, so importing
+the package itself does not load cbmpy, numpy or the default models. Import
+only what you need, for example ``from dcFBA.Models import CommunityModel``.
+"""
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from dcFBA.DynamicModels import (
+        DynamicSingleFBA,
+        DynamicJointFBA,
+        DynamicParallelFBA,
+        EndPointFBA,
+    )
+    from dcFBA import Models
+    from dcFBA import Helpers
+
+    from dcFBA import DefaultModels
+
+_dynamic_models = [
+    "DynamicSingleFBA",
+    "DynamicJointFBA",
+    "DynamicParallelFBA",
+    "EndPointFBA",
+]
+
+_submodules = ["Models", "Helpers", "DefaultModels"]
+
+__all__ = _dynamic_models + _submodules
+
+
+def __getattr__(name: str):
+    if name in _dynamic_models:
+        module = importlib.import_module(".DynamicModels", __name__)
+        value = getattr(module, name)
+    elif name in _submodules:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    # Cache the attribute, so __getattr__ is only called once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals().keys()) + __all__)
@@ -50,6 +50,21 @@ def test_final_biomass_concentrations(dynamic_joint_fba):
     )
 
 
+def test_getters_return_copies_as_lists(dynamic_joint_fba):
+    biomasses = dynamic_joint_fba.get_biomasses()
+    metabolites = dynamic_joint_fba.get_metabolites()
+
+    assert isinstance(biomasses["ecoli"], list)
+    assert isinstance(metabolites["M_glc__D_e"], list)
+
+    biomasses["ecoli"].append(0.0)
+    metabolites["M_glc__D_e"][0] = -1.0
+
+    n = len(dynamic_joint_fba.get_time_points())
+    assert len(dynamic_joint_fba.get_biomasses()["ecoli"]) == n
+    assert dynamic_joint_fba.get_metabolites()["M_glc__D_e"][0] == 100
+
+
 def test_simulation_length(dynamic_joint_fba):
     time_points = dynamic_joint_fba.get_time_points()
 
@@ -81,3 +96,8 @@ def test_if_relative_abundance_is_calculated_correct(dynamic_joint_fba):
         and round(abundances["strep"][-1], 7) == 0.5195725
         and round(total, 7) == 1.0
     )
+
+
+def test_unknown_reaction_flux_values(dynamic_joint_fba):
+    with pytest.raises(KeyError):
+        dynamic_joint_fba.get_flux_values("R_GLCpts_ecolii")
@@ -93,3 +93,27 @@ def test_if_relative_abundance_is_calculated_correct(dynamic_parallel_fba):
         and round(abundances["strep"][-1], 4) == 0.6663
         and round(total, 7) == 1.0
     )
+
+
+def test_simulation_with_solver_pool(
+    dynamic_parallel_fba, model_ecoli_core, model_strep_therm
+):
+    pooled = DynamicParallelFBA(
+        [model_ecoli_core, model_strep_therm],
+        [1.0, 1.0],
+        {
+            "M_glc__D_e": 100,
+            "M_succ_e": 0,
+            "M_glu__L_e": 0.0,
+            "M_gln__L_e": 0.0,
+            "M_lcts_e": 100,
+        },
+    )
+    pooled.simulate(0.1, processes=2)
+
+    biomasses = dynamic_parallel_fba.get_biomasses()
+    assert pooled.get_time_points() == dynamic_parallel_fba.get_time_points()
+    for mid in ["ecoli", "strep"]:
+        assert round(pooled.biomasses[mid][-1], 3) == round(
+            biomasses[mid][-1], 3
+        )
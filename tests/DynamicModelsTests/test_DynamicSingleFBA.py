@@ -2,6 +2,7 @@ import pytest
 from dcFBA.DynamicModels import DynamicSingleFBA
 from dcFBA import DefaultModels
 from dcFBA.Models import KineticsStruct
+from dcFBA.Helpers.StepSizeController import StepSizeController
 
 
 @pytest.fixture
@@ -65,3 +66,110 @@ def test_kinetics(model_ecoli_core):
         and correct_final_biomass
         and metabolites != {}
     )
+
+
+def test_reaction_bounds_are_scaled_by_biomass(model_ecoli_core):
+    model_ecoli_core.getReaction("R_GLCpts").setUpperBound(10)
+    kin = KineticsStruct({"R_PYK": ("M_glc__D_e", 5, 10)})
+
+    ds = DynamicSingleFBA(
+        model_ecoli_core,
+        "R_BIOMASS_Ecoli_core_w_GAM",
+        0.5,
+        {"M_glc__D_e": 10},
+        kinetics=kin,
+    )
+    ds.update_reaction_bounds(None)
+
+    glcpts = ds.model.getReaction("R_GLCpts")
+    atpm = ds.model.getReaction("R_ATPM")
+    pyk = ds.model.getReaction("R_PYK")
+
+    assert (
+        glcpts.getUpperBound() == 5.0
+        and round(atpm.getLowerBound(), 3) == 4.195
+        and round(pyk.getUpperBound(), 6) == round(10 * (10 / 15) * 0.5, 6)
+    )
+
+
+def test_adaptive_time_step(model_ecoli_core):
+    model_ecoli_core.getReaction("R_GLCpts").setUpperBound(10)
+
+    fixed = DynamicSingleFBA(
+        model_ecoli_core, "R_BIOMASS_Ecoli_core_w_GAM", 0.1, {"M_glc__D_e": 10}
+    )
+    fixed.simulate(0.01)
+
+    adaptive = DynamicSingleFBA(
+        model_ecoli_core, "R_BIOMASS_Ecoli_core_w_GAM", 0.1, {"M_glc__D_e": 10}
+    )
+    adaptive.simulate(0.01, step_controller=StepSizeController(rtol=0.1))
+
+    history = adaptive.step_history
+    solves = len(history) + sum(step["rejected"] for step in history)
+
+    assert solves < len(fixed.step_history) / 2
+    assert round(adaptive.get_biomass()[-1], 2) == round(
+        fixed.get_biomass()[-1], 2
+    )
+    assert min(adaptive.metabolites["M_glc__D_e"]) >= 0
+
+
+def test_event_driven_simulation(model_ecoli_core):
+    model_ecoli_core.getReaction("R_GLCpts").setUpperBound(10)
+
+    ds = DynamicSingleFBA(
+        model_ecoli_core, "R_BIOMASS_Ecoli_core_w_GAM", 0.1, {"M_glc__D_e": 10}
+    )
+    ds.simulate(10, event_driven=True)
+
+    # Glucose runs out after one exact step, the second solve has no growth
+    assert len(ds.get_time_points()) == 2
+    assert ds.metabolites["M_glc__D_e"][-1] == 0
+    assert round(ds.get_biomass()[-1], 2) == 0.97
+
+
+def test_deviate_changes_initial_bounds(model_ecoli_core):
+    ds = DynamicSingleFBA(
+        model_ecoli_core,
+        "R_BIOMASS_Ecoli_core_w_GAM",
+        0.1,
+        {"M_glc__D_e": 100},
+    )
+
+    def deviate(model, used_time, condition):
+        if len(used_time) == 2:
+            lb = model.initial_bounds["R_GLCpts"][0]
+            model.initial_bounds["R_GLCpts"] = [lb, 1]
+        return 0
+
+    ds.simulate(0.15, n=6, deviate=deviate)
+
+    glucose = ds.get_flux_values("R_GLCpts")
+    biomass = ds.get_biomass()
+    assert glucose[0] > biomass[0]
+    assert glucose[1] <= biomass[1] + 1e-9
+
+
+def test_deviate_changes_stoichiometry(model_ecoli_core):
+    model_ecoli_core.getReaction("R_GLCpts").setUpperBound(10)
+    ds = DynamicSingleFBA(
+        model_ecoli_core,
+        "R_BIOMASS_Ecoli_core_w_GAM",
+        0.1,
+        {"M_glc__D_e": 100},
+    )
+
+    def deviate(model, used_time, condition):
+        if len(used_time) == 2:
+            reaction = model.model.getReaction("R_GLCpts")
+            reaction.setStoichCoefficient("M_glc__D_e", -2.0)
+        return 0
+
+    ds.simulate(0.15, n=4, deviate=deviate)
+
+    transport = ds.get_flux_values("R_GLCpts")
+    exchange = ds.get_flux_values("R_EX_glc__D_e")
+    assert exchange[0] == pytest.approx(-transport[0])
+    assert exchange[1] == pytest.approx(-2 * transport[1])
+    assert exchange[2] == pytest.approx(-2 * transport[2])
@@ -1,5 +1,11 @@
+import importlib
+
+import numpy
 import pytest
+import scipy.sparse
 from dcFBA.DynamicModels import EndPointFBA
+from dcFBA.Exceptions import MatrixTooLarge
+from dcFBA.Helpers.BuildEndPointModel import estimate_matrix_memory
 from dcFBA.Models import CommunityModel
 from dcFBA.ToyModels import model_a, model_b
 
@@ -143,3 +149,242 @@ def test_qp(model_A, model_B):
     solution = ep.simulate()
 
     assert round(solution, 3) == 0.482
+
+
+@pytest.fixture(scope="module")
+def small_EndPointFBA(model_A, model_B):
+    community_model = CommunityModel(
+        [model_A, model_B], ["R_BM_A", "R_BM_B"], ["modelA", "modelB"]
+    )
+
+    return EndPointFBA(
+        community_model,
+        4,
+        {"modelA": 1.0, "modelB": 2.0},
+        {"S_e": 100, "A_e": 0.0, "B_e": 0.0},
+        dt=0.1,
+    )
+
+
+def test_time_matrix_equals_cbmpy_stoichiometric_matrix(small_EndPointFBA):
+    ep = small_EndPointFBA
+
+    N = ep._time_matrix.struct_matrix(ep.model)
+    expected = ep.model.buildStoichMatrix(
+        matrix_type="scipy_csr", only_return=True
+    )
+    if isinstance(expected, tuple):
+        expected = expected[0]
+
+    assert N.row == expected.row and N.col == expected.col
+    assert (N.array != expected.array).nnz == 0
+    assert list(N.RHS) == list(expected.RHS)
+
+
+def test_bounds_are_scaled_by_biomass(small_EndPointFBA):
+    ep = small_EndPointFBA
+    ep._build_matrices(sparse=True)
+    CM = ep.model.CM
+
+    # The bound constraints are not stored as cbmpy objects
+    assert len(ep.model.user_defined_constraints) == 0
+    reaction = ep.model.getReaction("R_1_modelA_time2")
+    assert reaction.getUpperBound() == numpy.inf
+
+    def coefficients(row_id):
+        row = CM.array.getrow(CM.row.index(row_id))
+        return {CM.col[j]: v for j, v in zip(row.indices, row.data)}
+
+    # R_1 of model A has an upper bound of 10 and dt is 0.1
+    first = CM.row.index("R_1_modelA_time0_ub")
+    assert CM.operators[first] == "L" and CM.RHS[first] == 0.0
+    assert coefficients("R_1_modelA_time0_ub") == {
+        "R_1_modelA_time0": 1.0,
+        "BM_modelA_exchange": 1.0,
+    }
+    assert coefficients("R_1_modelA_time2_ub") == {
+        "R_1_modelA_time2": 1.0,
+        "BM_modelA_time1_time2": -1.0,
+    }
+
+
+@pytest.mark.parametrize("n", [2, 7])
+def test_resize_equals_new_model(model_A, model_B, n):
+    community_model = CommunityModel(
+        [model_A, model_B], ["R_BM_A", "R_BM_B"], ["modelA", "modelB"]
+    )
+    arguments = (
+        {"modelA": 1.0, "modelB": 2.0},
+        {"S_e": 10, "A_e": 0.0, "B_e": 0.0},
+    )
+
+    ep = EndPointFBA(community_model, 4, *arguments, dt=0.1)
+    ep.resize(n)
+    expected = EndPointFBA(community_model, n, *arguments, dt=0.1)
+
+    assert ep.times == expected.times
+    assert sorted(ep.model.getReactionIds()) == sorted(
+        expected.model.getReactionIds()
+    )
+    assert round(ep.simulate(), 6) == round(expected.simulate(), 6)
+    assert len(ep.get_biomasses()["modelA"]) == n + 1
+
+
+def test_resize_with_constraints_raises(model_A, model_B):
+    community_model = CommunityModel(
+        [model_A, model_B], ["R_BM_A", "R_BM_B"], ["modelA", "modelB"]
+    )
+    ep = EndPointFBA(community_model, 3, {"modelA": 1.0, "modelB": 2.0})
+    ep.balanced_growth(3.0, 4.0)
+
+    with pytest.raises(ValueError):
+        ep.resize(6)
+
+
+def test_warm_started_balanced_growth_equals_new_model(model_A, model_B):
+    community_model = CommunityModel(
+        [model_A, model_B], ["R_BM_A", "R_BM_B"], ["modelA", "modelB"]
+    )
+    concentrations = {"S_e": 20, "A_e": 0.0, "B_e": 0.0}
+
+    ep = EndPointFBA(community_model, 4, {}, concentrations, dt=0.1)
+    ep.balanced_growth(3.0, 3.5)
+
+    for target in [3.5, 6.0, 4.0]:
+        ep.set_balanced_growth_target(target)
+        warm = ep.simulate(warm_start=True)
+
+        new = EndPointFBA(community_model, 4, {}, concentrations, dt=0.1)
+        new.balanced_growth(3.0, target)
+        cold = new.simulate()
+
+        assert warm == pytest.approx(cold, nan_ok=True)
+
+
+def test_balanced_growth_target_without_constraints_raises(small_EndPointFBA):
+    with pytest.raises(ValueError):
+        small_EndPointFBA.set_balanced_growth_target(4.0)
+
+
+@pytest.fixture
+def new_EndPointFBA(model_A, model_B):
+    community_model = CommunityModel(
+        [model_A, model_B], ["R_BM_A", "R_BM_B"], ["modelA", "modelB"]
+    )
+
+    return EndPointFBA(
+        community_model,
+        4,
+        {"modelA": 1.0, "modelB": 2.0},
+        {"S_e": 100, "A_e": 0.0, "B_e": 0.0},
+        dt=0.1,
+    )
+
+
+def test_matrix_memory_estimate(small_EndPointFBA):
+    ep = small_EndPointFBA
+    blocks = [ep._bound_constraints]
+    ep._build_matrices(sparse=False)
+
+    dense = ep.model.N.array.nbytes + ep.model.CM.array.nbytes
+    estimate = estimate_matrix_memory(
+        ep.model, ep._time_matrix, blocks, sparse=False
+    )
+    assert dense <= estimate
+    assert estimate_matrix_memory(
+        ep.model, ep._time_matrix, blocks, sparse=True
+    ) < estimate
+
+
+def test_sparse_above_dense_matrix_limit(new_EndPointFBA, small_EndPointFBA):
+    new_EndPointFBA.dense_matrix_limit = 0
+    solution = new_EndPointFBA.simulate()
+
+    assert scipy.sparse.issparse(new_EndPointFBA.model.N.array)
+    assert solution == pytest.approx(small_EndPointFBA.simulate())
+    assert not scipy.sparse.issparse(small_EndPointFBA.model.N.array)
+
+
+def test_dense_matrix_falls_back_to_sparse(new_EndPointFBA, monkeypatch):
+    module = importlib.import_module("dcFBA.DynamicModels.EndPointFBA")
+    blocks = [new_EndPointFBA._bound_constraints]
+    sparse = estimate_matrix_memory(
+        new_EndPointFBA.model, new_EndPointFBA._time_matrix, blocks
+    )
+
+    monkeypatch.setattr(module, "_available_memory", lambda: sparse)
+    new_EndPointFBA.simulate(sparse=False)
+    assert scipy.sparse.issparse(new_EndPointFBA.model.N.array)
+
+    monkeypatch.setattr(module, "_available_memory", lambda: sparse - 1)
+    with pytest.raises(MatrixTooLarge):
+        new_EndPointFBA.simulate()
+
+
+@pytest.mark.parametrize("n", [1, 4])
+def test_results_match_flux_ids(new_EndPointFBA, n):
+    ep = new_EndPointFBA
+    ep.resize(n)
+    ep.simulate()
+    fluxes = ep.get_fluxes()
+
+    for rid in ["R_1_modelA", "R_2_modelB", "R_BM_A_modelA"]:
+        assert ep.get_flux_values(rid) == [
+            fluxes[f"{rid}_{tid}"] for tid in ep.times
+        ]
+
+    links = [f"{ep.times[i]}_{ep.times[i + 1]}" for i in range(n - 1)]
+    for mid in ["modelA", "modelB"]:
+        assert ep.get_biomasses()[mid] == (
+            [-1 * fluxes[f"BM_{mid}_exchange"]]
+            + [fluxes[f"BM_{mid}_{link}"] for link in links]
+            + [fluxes[f"BM_{mid}_exchange_final"]]
+        )
+
+    assert ep.get_metabolites()["S_e"] == (
+        [-1 * fluxes["S_e_exchange"]]
+        + [fluxes[f"S_e_{link}"] for link in links]
+        + [fluxes["S_e_exchange_final"]]
+    )
+
+
+def test_matrix_memory_reported_per_build(new_EndPointFBA, capsys):
+    for _ in range(3):
+        new_EndPointFBA.simulate(warm_start=True)
+    assert capsys.readouterr().out.count("estimated memory") == 1
+
+    new_EndPointFBA.simulate()
+    assert capsys.readouterr().out.count("estimated memory") == 1
+
+
+def test_model_is_expanded_on_demand(new_EndPointFBA):
+    ep = new_EndPointFBA
+    solution = ep.simulate()
+
+    # The simulation only needs the time matrix
+    assert ep._model.getReaction("R_1_modelA_time2") is None
+    assert ep.model.getReaction("R_1_modelA_time2") is not None
+
+    assert ep.simulate() == pytest.approx(solution)
+    assert ep.model.getReaction("R_1_modelA_time2").getValue() == (
+        ep.get_flux_values("R_1_modelA")[2]
+    )
+
+
+def test_changes_to_the_expanded_model_are_simulated(new_EndPointFBA):
+    ep = new_EndPointFBA
+
+    # Without its substrate uptake model A can not grow
+    for tid in ep.times:
+        ep.model.deleteReactionAndBounds(f"R_1_modelA_{tid}")
+    reaction = ep.model.getReaction("R_1_modelB_time0")
+    reaction.setStoichCoefficient("S_e_time0", -2.0)
+    ep.simulate()
+
+    assert ep.get_biomasses()["modelA"] == [1.0] * (len(ep.times) + 1)
+    assert ep.get_flux_values("R_1_modelA") == [0.0] * len(ep.times)
+
+    N = ep.model.N
+    row = N.row.index("S_e_time0")
+    column = N.col.index("R_1_modelB_time0")
+    assert N.array[row, column] == -2.0
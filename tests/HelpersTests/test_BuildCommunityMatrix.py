@@ -104,6 +104,61 @@ def test_if_a_reaction_is_copied_to_the_new_model(
     )
 
 
+def test_copy_reactions_equals_copy_reaction(
+    model_ecoli_core, model_strep_therm
+):
+    rids = ["R_ASNN", "R_PGK", "R_ENO"]
+    expected = model_ecoli_core.clone()
+    for rid in rids:
+        bcm.copy_reaction(model_strep_therm, expected, rid, f"{rid}_strep")
+
+    bcm.copy_reactions(
+        model_strep_therm,
+        model_ecoli_core,
+        {rid: f"{rid}_strep" for rid in rids},
+    )
+
+    for rid in rids:
+        new = model_ecoli_core.getReaction(f"{rid}_strep")
+        old = expected.getReaction(f"{rid}_strep")
+
+        assert sorted(new.getStoichiometry()) == sorted(old.getStoichiometry())
+        assert new.getLowerBound() == old.getLowerBound()
+        assert new.getUpperBound() == old.getUpperBound()
+
+    assert sorted(model_ecoli_core.getSpeciesIds()) == sorted(
+        expected.getSpeciesIds()
+    )
+
+
+def test_get_reaction_bounds(model_ecoli_core):
+    bounds = bcm.get_reaction_bounds(model_ecoli_core)
+
+    assert all(
+        bounds[rid] == (reaction.getLowerBound(), reaction.getUpperBound())
+        for rid, reaction in zip(
+            model_ecoli_core.getReactionIds(), model_ecoli_core.reactions
+        )
+    )
+
+
+def test_gene_protein_associations_are_copied(model_ecoli_core):
+    combined_model = bcm.combine_models([model_ecoli_core], ["ecoli"])
+    rid = "R_PFK"
+
+    old_gpr = model_ecoli_core.getGPRforReaction(rid)
+    new_gpr = combined_model.getGPRforReaction(f"{rid}_ecoli")
+
+    association = old_gpr.getAssociationStr()
+    for gid in old_gpr.getGeneIds():
+        association = association.replace(gid, f"{gid}_ecoli")
+
+    assert sorted(new_gpr.getGeneIds()) == sorted(
+        f"{gid}_ecoli" for gid in old_gpr.getGeneIds()
+    )
+    assert new_gpr.getAssociationStr() == association
+
+
 # Good example of a function (copy_species_and_reagents) that does not adhere to
 # the single responsibility principle, hence this test is terrible to write
 # TODO split the function in copy_species and copy_reagents
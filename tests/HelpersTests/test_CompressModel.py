@@ -0,0 +1,88 @@
+import pytest
+from cbmpy.CBModel import Reaction
+from dcFBA.DynamicModels import EndPointFBA
+from dcFBA.Helpers.CompressModel import compress_model
+from dcFBA.Models import CommunityModel
+from dcFBA.ToyModels import model_a, model_b
+
+
+@pytest.fixture
+def toy_community():
+    m_a = model_a.build_toy_model_fba_A()
+    for rid, ub in [("R_1", 10), ("R_4", 3), ("R_6", 1)]:
+        m_a.getReaction(rid).setUpperBound(ub)
+        m_a.getReaction(rid).setLowerBound(0)
+    m_a.getReaction("R_BM_A").deleteReagentWithSpeciesRef("BM_e_A")
+
+    # A dead end: D_c can be produced but not consumed
+    m_a.createSpecies("D_c", False, "Dead end", compartment="c")
+    reaction = Reaction("R_dead", "Dead end reaction", reversible=False)
+    reaction.createReagent("S_c", -1)
+    reaction.createReagent("D_c", 1)
+    m_a.addReaction(reaction, False, silent=True)
+    reaction.setLowerBound(0)
+    reaction.setUpperBound(10)
+
+    m_b = model_b.build_toy_model_fba_B()
+    for rid, ub in [("R_1", 10), ("R_3", 1), ("R_5", 1)]:
+        m_b.getReaction(rid).setUpperBound(ub)
+        m_b.getReaction(rid).setLowerBound(0)
+    m_b.getReaction("R_BM_B").deleteReagentWithSpeciesRef("BM_e_B")
+
+    return CommunityModel(
+        [m_a, m_b], ["R_BM_A", "R_BM_B"], ["modelA", "modelB"]
+    )
+
+
+def test_compress_model(toy_community):
+    n_reactions = len(toy_community.reactions)
+    compressed, reaction_map = compress_model(toy_community)
+
+    # The original model is not modified
+    assert len(toy_community.reactions) == n_reactions
+    assert len(compressed.reactions) < n_reactions
+
+    assert reaction_map["R_dead_modelA"] == (None, 0.0)
+    assert "D_c_modelA" not in compressed.getSpeciesIds()
+
+    for rid, (representative, factor) in reaction_map.items():
+        assert rid not in compressed.getReactionIds()
+        assert representative is None or representative in (
+            compressed.getReactionIds()
+        )
+
+    # Exchange and biomass reactions are kept
+    for reaction in toy_community.reactions:
+        if reaction.is_exchange:
+            assert reaction.getId() in compressed.getReactionIds()
+    for rid in toy_community.get_model_biomass_ids().values():
+        assert rid in compressed.getReactionIds()
+
+
+def test_compressed_endpoint_fba(toy_community):
+    results = [
+        EndPointFBA(
+            toy_community,
+            6,
+            {"modelA": 1.0, "modelB": 2.0},
+            {"S_e": 100, "A_e": 0.0, "B_e": 0.0},
+            dt=0.1,
+            compress=compress,
+        )
+        for compress in [False, True]
+    ]
+    solutions = [result.simulate() for result in results]
+
+    assert solutions[0] == pytest.approx(solutions[1])
+    assert len(results[1].model.reactions) < len(results[0].model.reactions)
+
+    # The fluxes of removed and merged reactions follow from the fluxes of
+    # the reactions representing them
+    simulation = results[1]
+    assert simulation.get_flux_values("R_dead_modelA") == [0.0] * 6
+    for rid, (representative, factor) in simulation._reaction_map.items():
+        if representative is None:
+            continue
+        assert simulation.get_flux_values(rid) == pytest.approx(
+            [factor * v for v in simulation.get_flux_values(representative)]
+        )
@@ -0,0 +1,46 @@
+import math
+import numpy
+import pytest
+from dcFBA.Helpers.DepletionEvents import integrate, next_depletion
+
+
+def test_depletion_time_is_exact():
+    # One organism growing with mu = 0.5 consuming 2 per unit biomass
+    S0 = numpy.array([10.0, 100.0])
+    X0 = numpy.array([1.0])
+    C = numpy.array([[-2.0], [0.0]])
+    mu = numpy.array([0.5])
+
+    h, depleted = next_depletion(S0, C, mu, 100.0)
+
+    assert h == pytest.approx(math.log(1 + 0.5 * 10 / 2) / 0.5)
+    assert depleted.tolist() == [0]
+
+    S, X = integrate(S0, X0, C, mu, h)
+    assert S[0] == pytest.approx(0.0, abs=1e-8)
+    assert X[0] == pytest.approx(math.exp(0.5 * h))
+
+
+def test_no_depletion_before_maximal_step():
+    h, depleted = next_depletion(
+        numpy.array([10.0]), numpy.array([[-1.0]]), numpy.array([0.0]), 2.0
+    )
+
+    assert h == 2.0
+    assert len(depleted) == 0
+
+
+def test_depletion_of_cross_fed_metabolite():
+    # Consumed at a constant rate and produced by a fast growing organism,
+    # the metabolite runs out inside the step and recovers before h_max
+    S0 = numpy.array([1.0])
+    C = numpy.array([[-1.0, 0.01]])
+    mu = numpy.array([0.0, 2.0])
+
+    h, depleted = next_depletion(S0, C, mu, 5.0)
+
+    assert h < 2.0 and depleted.tolist() == [0]
+    S, _ = integrate(S0, numpy.ones(2), C, mu, h)
+    assert S[0] == pytest.approx(0.0, abs=1e-8)
+    S, _ = integrate(S0, numpy.ones(2), C, mu, 5.0)
+    assert S[0] > 0
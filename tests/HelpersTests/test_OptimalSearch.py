@@ -1,5 +1,11 @@
+import multiprocessing
 import pytest
-from dcFBA.Helpers.OptimalSearch import time_search, balance_search_clean
+from dcFBA.Helpers.OptimalSearch import (
+    _ParallelHorizonSearch,
+    balance_search_clean,
+    find_upper_bound,
+    time_search,
+)
 from dcFBA.ToyModels import model_a, model_b
 from dcFBA.Models import CommunityModel
 
@@ -82,3 +88,50 @@ def test_balance_search(model_A, model_B):
     )
 
     assert round((value * 12.77778), 4) == 12.678
+
+
+def test_parallel_time_search(model_A, model_B):
+    community_model = CommunityModel(
+        [model_A, model_B], ["R_BM_A", "R_BM_B"], ["modelA", "modelB"]
+    )
+    arguments = (
+        community_model,
+        {"modelA": 1.0, "modelB": 2.0},
+        {"S_e": 20, "A_e": 0.0, "B_e": 0.0},
+    )
+
+    serial = time_search(*arguments, dt=0.1)
+    parallel = time_search(*arguments, dt=0.1, processes=3)
+    parallel_set = time_search(
+        *arguments, dt=0.1, set_values=[2.0, 12], processes=3
+    )
+
+    assert parallel == serial and serial[0] == 8
+    assert parallel_set[0] == 5
+
+
+def test_parallel_search_stops_its_workers(model_A, model_B):
+    community_model = CommunityModel(
+        [model_A, model_B], ["R_BM_A", "R_BM_B"], ["modelA", "modelB"]
+    )
+    before = set(multiprocessing.active_children())
+    search = _ParallelHorizonSearch(
+        community_model,
+        {"modelA": 1.0, "modelB": 2.0},
+        {"S_e": 20, "A_e": 0.0, "B_e": 0.0},
+        0.1,
+        None,
+        4,
+    )
+
+    with search:
+        high = search.find_upper_bound()
+
+    serial = find_upper_bound(
+        community_model,
+        {"modelA": 1.0, "modelB": 2.0},
+        {"S_e": 20, "A_e": 0.0, "B_e": 0.0},
+        0.1,
+    )
+    assert high >= serial
+    assert set(multiprocessing.active_children()) <= before
@@ -0,0 +1,63 @@
+import pytest
+from dcFBA import DefaultModels
+from dcFBA.Models import CommunityModel, KineticsStruct
+from dcFBA.Helpers.ParameterSweep import parameter_grid, sweep
+
+
+@pytest.fixture(scope="module")
+def community_model():
+    model_ecoli_core = DefaultModels.read_default_model("e_coli_core")
+    model_strep_therm = DefaultModels.read_default_model("strep_therm")
+    model_ecoli_core.getReaction("R_GLCpts").setUpperBound(10)
+    model_strep_therm.getReaction("R_GLCpts").setUpperBound(6)
+
+    return CommunityModel(
+        [model_ecoli_core, model_strep_therm],
+        ["R_BIOMASS_Ecoli_core_w_GAM", "R_biomass_STR"],
+        ["ecoli", "strep"],
+    )
+
+
+@pytest.fixture(scope="module")
+def grid():
+    grid = parameter_grid(
+        [[1.0, 1.0], [0.5, 1.5]],
+        [{"M_glc__D_e": 10, "M_lcts_e": 10}],
+    )
+    # The limiting substrate is not external, this run should fail
+    grid.append(
+        {
+            "biomasses": [1.0, 1.0],
+            "kinetics": KineticsStruct(
+                {"R_PGK_ecoli": ["M_3pg_c_ecoli", 1.0, 10.0]}
+            ),
+        }
+    )
+    return grid
+
+
+def test_parameter_grid_order():
+    grid = parameter_grid([[1.0], [2.0]], [{"a": 1}, {"a": 2}])
+
+    pairs = [(g["biomasses"][0], g["initial_concentrations"]["a"]) for g in grid]
+
+    assert pairs == [(1.0, 1), (1.0, 2), (2.0, 1), (2.0, 2)]
+
+
+def test_sweep_is_deterministic_and_collects_failures(community_model, grid):
+    serial = list(sweep(community_model, grid, 0.1, processes=1))
+    parallel = sorted(
+        sweep(community_model, grid, 0.1, processes=2), key=lambda r: r.index
+    )
+
+    assert [r.index for r in serial] == [0, 1, 2]
+    assert not serial[0].failed and not serial[1].failed
+    assert serial[2].failed and "NoLimitingSubstrateFound" in serial[2].error
+
+    for s, p in zip(serial, parallel):
+        assert s.failed == p.failed
+        assert s.times == p.times
+        assert s.biomasses == p.biomasses
+
+    # Sending the model to the workers leaves the original usable
+    assert community_model.getReaction("R_GLCpts_ecoli") is not None
@@ -0,0 +1,41 @@
+import pytest
+from dcFBA import DefaultModels
+from dcFBA.Helpers.ReduceModel import scan_unused_reactions
+
+
+@pytest.fixture
+def model_ecoli_core():
+    return DefaultModels.read_default_model("e_coli_core")
+
+
+def test_scan_unused_reactions(model_ecoli_core):
+    unused = scan_unused_reactions(model_ecoli_core, {"M_glc__D_e": 10})
+
+    assert unused == [
+        "R_EX_fru_e",
+        "R_EX_fum_e",
+        "R_EX_gln__L_e",
+        "R_EX_mal__L_e",
+        "R_FRUpts2",
+        "R_FUMt2_2",
+        "R_GLNabc",
+        "R_MALt2_2",
+    ]
+    assert model_ecoli_core.getActiveObjective().getId() == "obj"
+
+
+def test_parallel_scan_equals_serial_scan(model_ecoli_core):
+    serial = scan_unused_reactions(model_ecoli_core.clone(), {})
+    parallel = scan_unused_reactions(model_ecoli_core, {}, processes=2)
+
+    assert parallel == serial
+
+
+def test_prescreen_does_not_change_the_result(model_ecoli_core):
+    medium = {"M_glc__D_e": 10}
+    exact = scan_unused_reactions(model_ecoli_core.clone(), medium, samples=0)
+    screened = scan_unused_reactions(
+        model_ecoli_core, medium, samples=20, seed=1
+    )
+
+    assert screened == exact
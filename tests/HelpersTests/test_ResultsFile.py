@@ -0,0 +1,68 @@
+import json
+
+import numpy
+import pytest
+from dcFBA.DynamicModels import DynamicJointFBA, EndPointFBA
+from dcFBA.Helpers.ResultsFile import load_results
+
+
+def test_dynamic_joint_fba_results(toy_community, tmp_path):
+    simulation = DynamicJointFBA(toy_community, [1.0, 2.0], {"S_e": 100})
+    simulation.simulate(0.1)
+    simulation.save_results(tmp_path / "results.npz")
+
+    with DynamicJointFBA.load_results(tmp_path / "results.npz") as results:
+        assert results.model == "DynamicJointFBA"
+        assert results.times == list(simulation.times)
+        assert isinstance(results.fluxes.array, numpy.memmap)
+
+        for mid in ["modelA", "modelB"]:
+            assert numpy.allclose(
+                results.biomasses[mid], simulation.biomasses[mid]
+            )
+        for sid in simulation.metabolites:
+            assert numpy.allclose(
+                results.metabolites[sid], simulation.metabolites[sid]
+            )
+        assert results.get_flux_values(
+            "R_1_modelA"
+        ) == simulation.get_flux_values("R_1_modelA")
+
+
+def test_endpoint_fba_results(toy_community, tmp_path):
+    simulation = EndPointFBA(
+        toy_community, 4, {"modelA": 1.0, "modelB": 2.0}, {"S_e": 100}, 0.1
+    )
+    simulation.simulate()
+    simulation.save_results(tmp_path / "results.npz", compress=True)
+
+    with load_results(tmp_path / "results.npz") as results:
+        assert results.times == simulation.times
+        assert not isinstance(results.fluxes.array, numpy.memmap)
+        assert results.biomasses["modelB"].tolist() == (
+            simulation.biomasses["modelB"]
+        )
+        for rid in ["R_1_modelA", "R_BM_B_modelB"]:
+            assert results.get_flux_values(
+                rid
+            ) == simulation.get_flux_values(rid)
+
+
+def test_results_file_name_without_extension(toy_community, tmp_path):
+    simulation = DynamicJointFBA(toy_community, [1.0, 2.0], {"S_e": 100})
+    simulation.simulate(0.1)
+    simulation.save_results(str(tmp_path / "run"))
+
+    assert (tmp_path / "run.npz").exists()
+    with load_results(str(tmp_path / "run")) as results:
+        assert results.times == list(simulation.times)
+    with load_results(tmp_path / "run") as results:
+        assert results.times == list(simulation.times)
+
+
+def test_unknown_results_version(tmp_path):
+    metadata = {"version": 0, "model": "", "times": []}
+    numpy.savez(tmp_path / "results.npz", metadata=json.dumps(metadata))
+
+    with pytest.raises(ValueError):
+        load_results(tmp_path / "results.npz")
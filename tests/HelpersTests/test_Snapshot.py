@@ -0,0 +1,78 @@
+import numpy
+import pytest
+from dcFBA import DefaultModels
+from dcFBA.DynamicModels import DynamicJointFBA, EndPointFBA
+from dcFBA.Helpers.SolveCache import model_fingerprint
+from dcFBA.Helpers.Snapshot import load_snapshot, save_snapshot
+from dcFBA.Models import CommunityModel
+
+
+def test_snapshot_round_trip(tmp_path):
+    model_ecoli_core = DefaultModels.read_default_model("e_coli_core")
+    community = CommunityModel(
+        [model_ecoli_core, model_ecoli_core],
+        ["R_BIOMASS_Ecoli_core_w_GAM", "R_BIOMASS_Ecoli_core_w_GAM"],
+        ["ecoli_1", "ecoli_2"],
+    )
+    community.createObjectiveFunction("R_BIOMASS_Ecoli_core_w_GAM_ecoli_1")
+
+    save_snapshot(community, tmp_path / "community.npz")
+    loaded = load_snapshot(tmp_path / "community.npz")
+
+    assert model_fingerprint(loaded) == model_fingerprint(community)
+    assert loaded.getSpeciesIds() == community.getSpeciesIds()
+    assert loaded.getReactionIds() == community.getReactionIds()
+    assert loaded.getGeneIds() == community.getGeneIds()
+    assert loaded.get_model_biomass_ids() == community.get_model_biomass_ids()
+    assert loaded.single_model_ids == community.single_model_ids
+    assert loaded.identify_model_from_reaction("R_PGK_ecoli_2") == "ecoli_2"
+    assert loaded.get_model_specific_species(
+        "ecoli_1"
+    ) == community.get_model_specific_species("ecoli_1")
+    assert [gpr.getTree() for gpr in loaded.gpr] == [
+        gpr.getTree() for gpr in community.gpr
+    ]
+    assert loaded.getActiveObjective().getId() == (
+        community.getActiveObjective().getId()
+    )
+
+
+def test_dynamic_joint_fba_on_snapshot(toy_community, tmp_path):
+    save_snapshot(toy_community, tmp_path / "community.npz")
+    loaded = load_snapshot(tmp_path / "community.npz")
+
+    results = []
+    for model in [toy_community, loaded]:
+        simulation = DynamicJointFBA(model, [1.0, 2.0], {"S_e": 100})
+        simulation.simulate(0.1)
+        results.append(simulation.get_biomasses())
+
+    for mid in ["modelA", "modelB"]:
+        assert numpy.allclose(results[0][mid], results[1][mid])
+
+
+def test_endpoint_fba_on_snapshot(toy_community, tmp_path):
+    save_snapshot(toy_community, tmp_path / "community.npz")
+    loaded = load_snapshot(tmp_path / "community.npz")
+
+    values = [
+        EndPointFBA(
+            model, 5, {"modelA": 1.0, "modelB": 2.0}, {"S_e": 100}, dt=0.1
+        ).simulate()
+        for model in [toy_community, loaded]
+    ]
+
+    assert values[0] == pytest.approx(values[1])
+
+
+def test_unknown_version_raises(toy_community, tmp_path):
+    save_snapshot(toy_community, tmp_path / "community.npz")
+    with numpy.load(tmp_path / "community.npz") as data:
+        arrays = dict(data)
+    arrays["metadata"] = numpy.array(
+        str(arrays["metadata"]).replace('"version": 1', '"version": 0')
+    )
+    numpy.savez(tmp_path / "old.npz", **arrays)
+
+    with pytest.raises(ValueError):
+        load_snapshot(tmp_path / "old.npz")
@@ -0,0 +1,50 @@
+import math
+import pytest
+from dcFBA.Helpers.SolveCache import SolveCache, model_fingerprint, solve_key
+from dcFBA.Models import CommunityModel
+from dcFBA.ToyModels import model_a, model_b
+
+
+@pytest.fixture
+def community_model():
+    return CommunityModel(
+        [model_a.build_toy_model_fba_A(), model_b.build_toy_model_fba_B()],
+        ["R_BM_A", "R_BM_B"],
+        ["modelA", "modelB"],
+    )
+
+
+def test_key_depends_on_content(community_model):
+    fingerprint = model_fingerprint(community_model)
+    key = solve_key(fingerprint, 5, 0.1, {"modelA": 1.0}, {"S_e": 10})
+
+    assert key == solve_key(fingerprint, 5, 0.1, {"modelA": 1}, {"S_e": 10})
+    assert key != solve_key(fingerprint, 5, 0.2, {"modelA": 1.0}, {"S_e": 10})
+    assert key != solve_key(fingerprint, 5, 0.1, {"modelA": 1.0}, {"S_e": 5})
+
+    community_model.getReaction("R_1_modelA").setUpperBound(3)
+    assert model_fingerprint(community_model) != fingerprint
+
+
+def test_least_recently_used_is_evicted():
+    cache = SolveCache(maxsize=2)
+    cache["a"] = 1.0
+    cache["b"] = 2.0
+    cache.get("a")
+    cache["c"] = 3.0
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
+
+
+def test_solutions_are_stored_on_disk(tmp_path):
+    cache = SolveCache(path=tmp_path)
+    cache["a"] = 1.5
+    cache["infeasible"] = math.nan
+
+    other = SolveCache(path=tmp_path)
+    assert other["a"] == 1.5
+    assert math.isnan(other["infeasible"])
+    with pytest.raises(KeyError):
+        other["b"]
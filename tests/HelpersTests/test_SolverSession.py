@@ -0,0 +1,67 @@
+import pytest
+import cbmpy
+from dcFBA import DefaultModels
+from dcFBA.Helpers.SolverSession import SolverSession, read_bounds
+
+
+@pytest.fixture
+def model_ecoli_core():
+    return DefaultModels.read_default_model("e_coli_core")
+
+
+def test_session_solution_equals_fba(model_ecoli_core):
+    session = SolverSession(model_ecoli_core)
+    value = session.solve()
+
+    assert round(value, 6) == round(cbmpy.doFBA(model_ecoli_core), 6)
+
+
+def test_bound_changes_do_not_rebuild_the_lp(model_ecoli_core):
+    session = SolverSession(model_ecoli_core)
+    session.solve()
+
+    model_ecoli_core.getReaction("R_EX_glc__D_e").setLowerBound(-5)
+    value = session.solve()
+
+    assert session.n_builds == 1 and round(value, 6) == round(
+        cbmpy.doFBA(model_ecoli_core), 6
+    )
+
+
+def test_objective_change_rebuilds_the_lp(model_ecoli_core):
+    session = SolverSession(model_ecoli_core)
+    session.solve()
+
+    model_ecoli_core.createObjectiveFunction("R_ATPM")
+    model_ecoli_core.setActiveObjective("R_ATPM_objective")
+    session.solve()
+
+    assert session.n_builds == 2
+
+
+def test_set_objective_does_not_rebuild_the_lp(model_ecoli_core):
+    session = SolverSession(model_ecoli_core)
+    session.solve()
+
+    session.set_objective({"R_ATPM": 1}, "maximize")
+    value = session.solve()
+
+    model_ecoli_core.createObjectiveFunction("R_ATPM")
+    model_ecoli_core.setActiveObjective("R_ATPM_objective")
+
+    assert session.n_builds == 1 and round(value, 6) == round(
+        cbmpy.doFBA(model_ecoli_core), 6
+    )
+
+
+def test_bounds_function_replaces_the_model_bounds(model_ecoli_core):
+    def bounds(index):
+        lb, ub = read_bounds(model_ecoli_core, index)
+        lb[index["R_EX_glc__D_e"]] = -5
+        return lb, ub
+
+    session = SolverSession(model_ecoli_core, bounds=bounds)
+    value = session.solve()
+
+    model_ecoli_core.getReaction("R_EX_glc__D_e").setLowerBound(-5)
+    assert round(value, 6) == round(cbmpy.doFBA(model_ecoli_core), 6)
@@ -0,0 +1,23 @@
+import pytest
+from dcFBA.Helpers.StepSizeController import StepSizeController
+
+
+def test_step_shrinks_when_depletion_is_too_large():
+    controller = StepSizeController(rtol=0.1, safety=1.0)
+
+    assert not controller.accept(1.0, 0.5)
+    assert controller.next_step(1.0, 0.5) == pytest.approx(0.2)
+
+
+def test_step_grows_and_is_clipped():
+    controller = StepSizeController(dt_min=0.01, dt_max=1.5, max_growth=2.0)
+
+    assert controller.accept(1.0, 0.0)
+    assert controller.next_step(1.0, 0.0) == 1.5
+    assert controller.accept(0.01, 1.0)
+    assert controller.next_step(0.01, 1.0) == 0.01
+
+
+def test_invalid_tolerance():
+    with pytest.raises(ValueError):
+        StepSizeController(rtol=0)
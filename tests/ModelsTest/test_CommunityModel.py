@@ -220,3 +220,64 @@ def test_if_single_model_is_deleted_correctly(model_ecoli_core):
             species_are_deleted_correctly,
         ]
     )
+
+
+def test_model_ids_that_are_part_of_other_ids(model_ecoli_core):
+    model = CommunityModel(
+        [model_ecoli_core.clone(), model_ecoli_core.clone()],
+        ["R_BIOMASS_Ecoli_core_w_GAM", "R_BIOMASS_Ecoli_core_w_GAM"],
+        ["coli", "e_coli"],
+    )
+
+    identified_correctly = [
+        model.identify_model_from_reaction("R_PGK_coli") == "coli",
+        model.identify_model_from_reaction("R_PGK_e_coli") == "e_coli",
+        model.identify_model_from_reaction("R_EX_glc__D_e") == "",
+        model.identify_model_from_species("M_atp_c_e_coli") == "e_coli",
+        model.identify_model_from_species("M_glc__D_e") == "",
+    ]
+
+    model.remove_model_from_community("coli")
+
+    assert all(identified_correctly) and sorted(
+        model.get_model_specific_reactions("e_coli")
+    ) == sorted(rid for rid in model.getReactionIds() if "_e_coli" in rid)
+
+
+def test_index_follows_added_and_deleted_reactions(model_ecoli_core):
+    model = CommunityModel(
+        [model_ecoli_core.clone(), model_ecoli_core.clone()],
+        ["R_BIOMASS_Ecoli_core_w_GAM", "R_BIOMASS_Ecoli_core_w_GAM"],
+        ["e_coli_1", "e_coli_2"],
+    )
+    model.deleteReactionAndBounds("R_PGK_e_coli_1")
+    model.createReaction("R_new_e_coli_1", silent=True)
+
+    reactions = model.get_model_specific_reactions("e_coli_1")
+    assert "R_PGK_e_coli_1" not in reactions
+    assert "R_new_e_coli_1" in reactions
+
+    model.remove_model_from_community("e_coli_1")
+    assert not any("e_coli_1" in rid for rid in model.getReactionIds())
+    assert "R_PGK_e_coli_1" not in model._reaction_owners
+
+
+def test_models_are_not_modified(model_ecoli_core, model_strep_therm):
+    species = [
+        (s.getId(), s.getCompartmentId()) for s in model_ecoli_core.species
+    ]
+    stoichiometry = [r.getStoichiometry() for r in model_ecoli_core.reactions]
+
+    models = [model_ecoli_core, model_strep_therm]
+    biomass_ids = ["R_BIOMASS_Ecoli_core_w_GAM", "R_biomass_STR"]
+    first = CommunityModel(models, biomass_ids, ["ecoli", "strep"])
+    second = CommunityModel(models, biomass_ids, ["ecoli", "strep"])
+
+    assert species == [
+        (s.getId(), s.getCompartmentId()) for s in model_ecoli_core.species
+    ]
+    assert stoichiometry == [
+        r.getStoichiometry() for r in model_ecoli_core.reactions
+    ]
+    assert first.getSpeciesIds() == second.getSpeciesIds()
+    assert "M_atp_c_ecoli" in first.getSpeciesIds()
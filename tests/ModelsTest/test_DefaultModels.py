@@ -0,0 +1,22 @@
+import pytest
+from dcFBA import DefaultModels
+
+
+def test_read_default_model_returns_copies():
+    model = DefaultModels.read_default_model("e_coli_core")
+    model.getReaction("R_GLCpts").setUpperBound(1)
+    model.deleteReactionAndBounds("R_PGK")
+
+    copy = DefaultModels.read_default_model("e_coli_core")
+    assert copy is not model
+    assert copy.getReaction("R_GLCpts").getUpperBound() != 1
+    assert copy.getReaction("R_PGK") is not None
+
+
+def test_default_model_sbml_string():
+    assert DefaultModels.strep_therm.startswith("<?xml")
+
+
+def test_unknown_default_model_raises():
+    with pytest.raises(Exception):
+        DefaultModels.read_default_model("b_subtilis")
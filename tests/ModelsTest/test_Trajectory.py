@@ -0,0 +1,28 @@
+import numpy
+from dcFBA.Models import Trajectory
+
+
+def test_append_and_grow():
+    trajectory = Trajectory(["a", "b"], [1.0, 2.0], capacity=2)
+    for t in range(10):
+        trajectory.append([t, 2 * t])
+
+    assert len(trajectory["a"]) == 11
+    assert trajectory["b"][-1] == 18
+    assert trajectory.last().tolist() == [9.0, 18.0]
+
+
+def test_in_place_write_last_value():
+    trajectory = Trajectory.from_dict({"a": [1.0, 2.0], "b": [3.0, 4.0]})
+    trajectory["a"][-1] = 30
+
+    assert trajectory.to_dict() == {"a": [1.0, 30.0], "b": [3.0, 4.0]}
+
+
+def test_append_with_other_ids():
+    trajectory = Trajectory(["a"], [1.0])
+    trajectory.append({"b": 2.0, "a": 3.0})
+
+    assert trajectory["a"].tolist() == [1.0, 3.0]
+    assert numpy.isnan(trajectory["b"][0])
+    assert trajectory.rows()[-1] == {"a": 3.0, "b": 2.0}
@@ -0,0 +1,20 @@
+import pytest
+from dcFBA.Models import CommunityModel
+from dcFBA.ToyModels import model_a, model_b
+
+
+@pytest.fixture
+def toy_community():
+    m_a = model_a.build_toy_model_fba_A()
+    m_a.getReaction("R_1").setUpperBound(10)
+    m_a.getReaction("R_4").setUpperBound(3)
+    m_a.getReaction("R_BM_A").deleteReagentWithSpeciesRef("BM_e_A")
+
+    m_b = model_b.build_toy_model_fba_B()
+    m_b.getReaction("R_1").setUpperBound(10)
+    m_b.getReaction("R_3").setUpperBound(1)
+    m_b.getReaction("R_BM_B").deleteReagentWithSpeciesRef("BM_e_B")
+
+    return CommunityModel(
+        [m_a, m_b], ["R_BM_A", "R_BM_B"], ["modelA", "modelB"]
+    )
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import dcFBA
+
+SOURCE = os.path.dirname(os.path.dirname(os.path.abspath(dcFBA.__file__)))
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [SOURCE, environment.get("PYTHONPATH", "")]
+    )
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=environment,
+        check=True,
+    )
+
+
+def cumulative_import_time(stderr: str, module: str) -> float:
+    """Read the cumulative import time in seconds of a module from the
+    output of python -X importtime."""
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    raise ValueError(f"{module} was not imported")
+
+
+def test_package_import_is_lazy():
+    result = run_python(
+        "import sys, dcFBA; "
+        "print(sorted(m for m in ['cbmpy', 'numpy', 'dcFBA.DynamicModels',"
+        " 'dcFBA.DefaultModels'] if m in sys.modules))"
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_lazy_attributes_are_loaded_on_access():
+    result = run_python(
+        "import dcFBA; "
+        "print(dcFBA.EndPointFBA.__name__, dcFBA.Models.__name__)"
+    )
+    assert result.stdout.split()[-2:] == ["EndPointFBA", "dcFBA.Models"]
+
+
+def test_package_import_time():
+    result = run_python("import dcFBA")
+    assert cumulative_import_time(result.stderr, "dcFBA") < 0.1